@@ -33,7 +33,7 @@ if DEBUG:
 # Application definition
 
 INSTALLED_APPS = [
-    'main',
+    'main.apps.MainConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -53,13 +53,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.middleware.AuditFlushMiddleware',
 ]
 
 ROOT_URLCONF = 'lmsite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates which report rendering time to request profile.
+        'BACKEND': 'main.profiling.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -131,3 +133,73 @@ STATIC_URL = '/static/'
 
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
+
+
+# Group membership of users is cached for this number of seconds. Other
+# processes do not invalidate per-process cache, so with it membership
+# is cached for at most 5 seconds.
+
+GROUP_CACHE_TIMEOUT = 300
+
+
+# Catalogue search on PostgreSQL: "fulltext" ranks books by full-text
+# search, "trigram" finds misspelled book and student names by pg_trgm
+# similarity. On any database "index" finds books by words starting with
+# words of query using in-process index, which is saved to
+# SEARCH_INDEX_PATH or next to SQLite database and checked for changes
+# made by other processes every SEARCH_INDEX_REFRESH seconds. Otherwise
+# case-insensitive substring search is used.
+
+SEARCH_MODE = 'index'
+
+SEARCH_INDEX_REFRESH = 60
+
+# Refresh of search index reads again books changed up to this number of
+# seconds before its watermark, so books of transactions committed later
+# than they were saved are not skipped.
+SEARCH_INDEX_WATERMARK_LAG = 60
+
+
+# Background reports generated by "manage.py run_report_worker"
+
+REPORT_ROOT = BASE_DIR / 'reports'
+
+# Identical reports requested within this number of seconds are reused.
+REPORT_CACHE_TTL = 600
+
+# Reports older than this number of seconds are deleted.
+REPORT_RETENTION = 24 * 3600
+
+# Running jobs not finished within this number of seconds are marked
+# as failed, because their worker has crashed.
+REPORT_JOB_TIMEOUT = 3600
+
+# Incremental reports include rows changed up to this number of seconds
+# ago, so rows of transactions committed later than they were saved are
+# not skipped. It must be longer than the longest write transaction.
+# Deleted rows are never included in incremental reports.
+REPORT_WATERMARK_LAG = 60
+
+
+# If AUDIT_BUFFERED is set, audit log entries written during request are
+# collected when their transaction commits and inserted by one query at
+# the end of request, or in batches of AUDIT_BUFFER_SIZE entries.
+
+AUDIT_BUFFERED = False
+
+AUDIT_BUFFER_SIZE = 100
+
+
+# If RequestProfileMiddleware is added to MIDDLEWARE, it profiles
+# REQUEST_PROFILE_SAMPLE_RATE share of requests. Profile is sent in
+# Server-Timing header to staff users if REQUEST_PROFILE_SERVER_TIMING
+# is set and logged as JSON with REQUEST_PROFILE_SLOWEST_QUERIES slowest
+# queries if request took at least REQUEST_PROFILE_LOG_THRESHOLD seconds.
+
+REQUEST_PROFILE_SAMPLE_RATE = 1.0
+
+REQUEST_PROFILE_SERVER_TIMING = True
+
+REQUEST_PROFILE_SLOWEST_QUERIES = 3
+
+REQUEST_PROFILE_LOG_THRESHOLD = 0
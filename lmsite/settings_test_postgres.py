@@ -0,0 +1,21 @@
+"""
+Django settings for running tests of lmsite project against PostgreSQL.
+Database connection is configured by the same environment variables as
+production settings.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403 pylint: disable=wildcard-import
+
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'librarymanagement'),
+        'USER': os.environ.get('DB_USER', 'librarymanagement'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'P@ssw0rd'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+    }
+}
@@ -26,3 +26,7 @@ class MainConfig(AppConfig):
     Config of main app.
     """
     name = 'main'
+
+    def ready(self):
+        # pylint: disable=import-outside-toplevel,unused-import
+        from . import signals  # noqa: F401
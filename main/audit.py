@@ -0,0 +1,171 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains audit logging of user actions in main app. Log
+entries are inserted immediately, or collected during request and
+inserted by one query at the end of request if AUDIT_BUFFERED setting
+is enabled.
+"""
+
+import logging
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.contrib.admin.models import LogEntry
+from django.contrib.contenttypes.models import ContentType
+
+
+logger = logging.getLogger(__name__)
+
+# Log entries collected during current request, None outside of request.
+current_entries = ContextVar('current_entries', default=None)
+
+
+class AuditBuffer:
+    """
+    Collects log entries written during request and inserts them with
+    bulk_create at the end of request or when AUDIT_BUFFER_SIZE entries
+    are collected. Entry is collected when transaction it is written in
+    is committed, so entries about rolled back changes are dropped.
+    Outside of request entries are inserted immediately. Entries which
+    could not be inserted are logged, nothing is kept between requests.
+    """
+
+    @property
+    def size(self):
+        """
+        Number of entries that triggers flush.
+        """
+        return getattr(settings, 'AUDIT_BUFFER_SIZE', 100)
+
+    def __len__(self):
+        return len(current_entries.get() or ())
+
+    def start(self):
+        """
+        Starts collecting entries of request. Returns token passed to
+        finish().
+        """
+        return current_entries.set([])
+
+    def finish(self, token):
+        """
+        Inserts entries collected during request and stops collecting.
+        Returns number of inserted entries.
+        """
+        try:
+            return self.flush()
+        finally:
+            current_entries.reset(token)
+
+    def add(self, entry):
+        """
+        Collects entry when current transaction is committed.
+        """
+        transaction.on_commit(lambda: self.collect(entry))
+
+    def collect(self, entry):
+        """
+        Adds entry to entries of request and flushes them if size is
+        reached. Outside of request entry is inserted immediately.
+        """
+        entries = current_entries.get()
+        if entries is None:
+            self.insert([entry])
+            return
+        entries.append(entry)
+        if len(entries) >= self.size:
+            self.flush()
+
+    def flush(self):
+        """
+        Inserts entries collected during request. Returns number of
+        inserted entries.
+        """
+        entries = current_entries.get()
+        if not entries:
+            return 0
+        batch = entries[:]
+        entries.clear()
+        return self.insert(batch)
+
+    def insert(self, entries):
+        """
+        Inserts entries by one query. Returns number of inserted entries.
+        Failed insert is logged with entries, so it does not fail
+        audited action, which is already committed.
+        """
+        try:
+            LogEntry.objects.bulk_create(entries, batch_size=self.size)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(
+                "Could not insert %d audit log entries: %s", len(entries),
+                "; ".join(
+                    "user {} action {} on {} {}: {}".format(
+                        entry.user_id, entry.action_flag,
+                        entry.content_type_id, entry.object_id,
+                        entry.change_message)
+                    for entry in entries))
+            return 0
+        return len(entries)
+
+
+audit_buffer = AuditBuffer()
+
+
+def log_entry(user, obj, action, message):
+    """
+    Returns unsaved log entry about action of user on object. Content
+    type is resolved through process-wide cache of ContentType manager,
+    so no queries are made.
+    """
+    return LogEntry(
+        user_id=user.pk,
+        content_type_id=ContentType.objects.get_for_model(obj).pk,
+        object_id=str(obj.pk),
+        object_repr=repr(obj)[:200],
+        action_flag=action,
+        change_message=message)
+
+
+def audit(user, obj, action, message):
+    """
+    Writes log entry about action of user on object. Entry is inserted
+    immediately, or added to audit buffer if AUDIT_BUFFERED is set.
+    """
+    entry = log_entry(user, obj, action, message)
+    if getattr(settings, 'AUDIT_BUFFERED', False):
+        audit_buffer.add(entry)
+    else:
+        entry.save()
+    return entry
+
+
+def audit_many(user, objects, action, message):
+    """
+    Writes log entries about the same action of user on every object.
+    Entries are inserted by one query, or added to audit buffer if
+    AUDIT_BUFFERED is set.
+    """
+    entries = [log_entry(user, obj, action, message) for obj in objects]
+    if getattr(settings, 'AUDIT_BUFFERED', False):
+        for entry in entries:
+            audit_buffer.add(entry)
+    else:
+        LogEntry.objects.bulk_create(entries)
+    return entries
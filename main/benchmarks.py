@@ -0,0 +1,469 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains performance benchmarks of main app. Benchmarks are
+run with "manage.py benchmark <name>" against configured database.
+"""
+
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from django.contrib.admin.models import LogEntry, CHANGE
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, DatabaseError
+from django.db.models import Count
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from .audit import AuditBuffer, audit, log_entry
+from .middleware import RequestProfileMiddleware
+from .models import Book, Lease
+from .search import (
+    BOOK_TRIGRAM_COLUMNS, RANK_ANNOTATION, STUDENT_TRIGRAM_COLUMNS,
+    book_filter, is_ranked, lease_filter, search_books, trigram_search)
+from .search_index import BookIndex
+from .seeding import LAST_NAMES, WORDS
+from .services import BookNotAvailableError, issue_lease
+from .utils import REPORT_DATASETS, STREAMING_FORMATS, build_xlsx
+from .views import BookListView
+
+
+BENCHMARKS = {}
+
+BENCHMARK_ISBN = '9789999999991'
+
+
+def benchmark(name):
+    """
+    Registers decorated function as benchmark with given name.
+    Benchmark function receives output stream and command options.
+    """
+
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def issue_concurrently(book, students, threads):
+    """
+    Tries to lease book to every student from given number of threads.
+    Returns dictionary with counts of issued, rejected and failed
+    attempts and elapsed time in seconds.
+    """
+    results = {'issued': 0, 'rejected': 0, 'failed': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+    expire_date = (timezone.now() + timezone.timedelta(days=30)).date()
+
+    def worker(worker_students):
+        barrier.wait()
+        try:
+            for student in worker_students:
+                try:
+                    issue_lease(student, book, expire_date)
+                    outcome = 'issued'
+                except BookNotAvailableError:
+                    outcome = 'rejected'
+                except DatabaseError:
+                    outcome = 'failed'
+                with lock:
+                    results[outcome] += 1
+        finally:
+            connection.close()
+
+    workers = [
+        threading.Thread(target=worker, args=(students[i::threads],))
+        for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    results['elapsed'] = time.perf_counter() - start
+    return results
+
+
+@benchmark('lease_issue')
+def lease_issue_benchmark(stdout, options):
+    """
+    Issues leases of one book from many threads and reports throughput
+    and whether any copy was over-issued.
+    """
+    threads = options['threads']
+    attempts = options['size']
+    copies = max(attempts // 2, 1)
+
+    book = Book.objects.create(
+        isbn=BENCHMARK_ISBN, name="Benchmark", authors="Benchmark",
+        count=min(copies, 32767))
+    get_user_model().objects.bulk_create([
+        get_user_model()(
+            username='benchmark_student_{}'.format(i),
+            email='benchmark_student_{}@example.com'.format(i))
+        for i in range(attempts)])
+    students = list(get_user_model().objects.filter(
+        username__startswith='benchmark_student_'))
+    try:
+        results = issue_concurrently(book, students, threads)
+        book.refresh_from_db()
+        issued = Lease.objects.filter(book=book).count()
+        stdout.write(
+            "threads: {}, attempts: {}, copies: {}".format(
+                threads, attempts, book.count))
+        stdout.write(
+            "issued: {issued}, rejected: {rejected}, failed: {failed}"
+            .format(**results))
+        stdout.write("leases in database: {}, leased_count: {}".format(
+            issued, book.leased_count))
+        stdout.write("over-issued: {}".format(
+            "yes" if issued > book.count else "no"))
+        stdout.write("throughput: {:.1f} attempts/s".format(
+            attempts / results['elapsed']))
+    finally:
+        Lease.objects.filter(book=book).delete()
+        Book.objects.filter(pk=book.pk).delete()
+        get_user_model().objects.filter(
+            username__startswith='benchmark_student_').delete()
+
+
+def median_time(func, repeat=5):
+    """
+    Calls func given number of times and returns median wall-clock time
+    in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def hot_queries():
+    """
+    Returns dictionary of querysets shaped like hot queries of views.
+    """
+    student_id = (
+        Lease.objects.values('student').annotate(leases=Count('pk'))
+        .order_by('-leases').values_list('student', flat=True).first())
+    return {
+        'student (active leases)': (
+            Lease.objects.filter(student=student_id)
+            .filter(return_date__isnull=True).order_by('expire_date')),
+        'lease_history': (
+            Lease.objects.filter(student=student_id)
+            .order_by('return_date', 'expire_date')[:10]),
+        'librarian (nearest leases)': (
+            Lease.objects.filter(return_date__isnull=True)
+            .order_by('expire_date')[:5]),
+        'librarian (latest books)': (
+            Book.objects.filter(count__gt=0).order_by('-added_date')[:5]),
+        'leases (active)': (
+            Lease.objects.filter(return_date__isnull=True)
+            .order_by('return_date', 'expire_date')[:10]),
+        'leases (all)': (
+            Lease.objects.order_by('return_date', 'expire_date')[:10]),
+        'books': Book.objects.order_by('-added_date')[:10],
+    }
+
+
+def report_queries(stdout, queries, repeat):
+    """
+    Writes query plan and median execution time of every query.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    for label, queryset in queries.items():
+        stdout.write("-- {}".format(label))
+        stdout.write(queryset.explain())
+        stdout.write("{:.2f} ms".format(
+            median_time(lambda qs=queryset: list(qs.all()), repeat)))
+
+
+@benchmark('indexes')
+def indexes_benchmark(stdout, options):
+    """
+    Shows plans and timings of hot queries without and with indexes of
+    Book and Lease. Indexes are dropped for the first run and recreated
+    afterwards. Database should be populated beforehand, for example
+    with "manage.py seed_library --leases 1000000".
+    """
+    repeat = max(options['size'] // 100, 1)
+    stdout.write("books: {}, leases: {}".format(
+        Book.objects.count(), Lease.objects.count()))
+    queries = hot_queries()
+    indexes = [
+        (model, index)
+        for model in (Book, Lease) for index in model._meta.indexes]
+
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+    try:
+        stdout.write("=== Without indexes")
+        report_queries(stdout, queries, repeat)
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+
+    stdout.write("=== With indexes")
+    report_queries(stdout, queries, repeat)
+
+
+def export_report(report_format):
+    """
+    Writes report in given format with all data sets to temporary file.
+    """
+    with tempfile.TemporaryFile() as report_file:
+        if report_format == 'xlsx':
+            build_xlsx().save(report_file)
+            return
+        stream = STREAMING_FORMATS[report_format][1]
+        for dataset in REPORT_DATASETS:
+            for chunk in stream(dataset):
+                report_file.write(chunk.encode())
+
+
+@benchmark('export_formats')
+def export_formats_benchmark(stdout, options):
+    """
+    Compares rows per second and peak Python memory of report formats.
+    Memory is traced in separate run, because tracing slows code down.
+    """
+    rows = Book.objects.count() + Lease.objects.count()
+    stdout.write("rows: {}".format(rows))
+    for report_format in ['xlsx'] + sorted(STREAMING_FORMATS):
+        start = time.perf_counter()
+        export_report(report_format)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        try:
+            export_report(report_format)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        stdout.write(
+            "{}: {:.2f} s, {:.0f} rows/s, peak memory {:.1f} MiB".format(
+                report_format, elapsed, rows / elapsed, peak / 2 ** 20))
+
+
+BENCHMARK_AUDIT_MESSAGE = 'Benchmark audit entry'
+
+
+@benchmark('audit')
+def audit_benchmark(stdout, options):
+    """
+    Compares throughput of per-action log_action() calls with content
+    type lookup, unbuffered audit() and buffered audit log writer.
+    """
+    user = get_user_model().objects.order_by('pk').first()
+    books = list(Book.objects.order_by('pk')[:100])
+    if user is None or not books:
+        stdout.write("Database has no users or books, seed it first")
+        return
+    count = options['size']
+    objects = [books[number % len(books)] for number in range(count)]
+
+    def log_action():
+        for obj in objects:
+            LogEntry.objects.log_action(
+                user.id,
+                ContentType.objects.get(app_label='main', model='book').id,
+                obj.pk,
+                repr(obj),
+                action_flag=CHANGE,
+                change_message=BENCHMARK_AUDIT_MESSAGE)
+
+    def unbuffered():
+        for obj in objects:
+            audit(user, obj, CHANGE, BENCHMARK_AUDIT_MESSAGE)
+
+    def buffered():
+        buffer = AuditBuffer()
+        token = buffer.start()
+        for obj in objects:
+            buffer.add(log_entry(user, obj, CHANGE, BENCHMARK_AUDIT_MESSAGE))
+        buffer.finish(token)
+
+    try:
+        for label, func in (
+                ('log_action', log_action),
+                ('audit', unbuffered),
+                ('buffered audit', buffered)):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            stdout.write("{}: {:.2f} s, {:.0f} entries/s".format(
+                label, elapsed, count / elapsed))
+    finally:
+        LogEntry.objects.filter(
+            change_message=BENCHMARK_AUDIT_MESSAGE).delete()
+
+
+def search_page(query):
+    """
+    Returns first page of catalogue search as shown by book list.
+    """
+    queryset = search_books(Book.objects.all(), query)
+    ordering = ['-added_date', '-pk']
+    if is_ranked(queryset):
+        ordering.insert(0, '-' + RANK_ANNOTATION)
+    return list(queryset.order_by(*ordering)[:10])
+
+
+def icontains_page(query):
+    """
+    Returns first page of catalogue search with icontains filter.
+    """
+    return list(
+        Book.objects.filter(book_filter(query))
+        .order_by('-added_date', '-pk')[:10])
+
+
+@benchmark('search')
+def search_benchmark(stdout, options):
+    """
+    Compares latency of catalogue search with icontains filter. Database
+    should be populated beforehand, for example with
+    "manage.py seed_library --books 1000000".
+    """
+    repeat = max(options['size'] // 100, 1)
+    stdout.write("books: {}, backend: {}".format(
+        Book.objects.count(), connection.vendor))
+    queries = [
+        WORDS[0], WORDS[-1].lower(), LAST_NAMES[0],
+        '{} {}'.format(WORDS[1], WORDS[2])]
+    for query in queries:
+        stdout.write("{!r}: search {:.2f} ms, icontains {:.2f} ms".format(
+            query,
+            median_time(lambda q=query: search_page(q), repeat),
+            median_time(lambda q=query: icontains_page(q), repeat)))
+
+
+@benchmark('trigram')
+def trigram_benchmark(stdout, options):
+    """
+    Shows plans and timings of lease list search by five icontains
+    filters and by trigram similarity with misspelled student name.
+    Requires PostgreSQL with migrations applied.
+    """
+    if connection.vendor != 'postgresql':
+        stdout.write("Trigram search requires PostgreSQL")
+        return
+    repeat = max(options['size'] // 100, 1)
+    stdout.write("leases: {}".format(Lease.objects.count()))
+    # Misspelled last name.
+    query = LAST_NAMES[0][:-2] + LAST_NAMES[0][-1]
+    ordering = ('return_date', 'expire_date', 'issue_date', 'pk')
+    report_queries(stdout, {
+        'icontains {!r}'.format(query): (
+            Lease.objects.filter(lease_filter(query))
+            .order_by(*ordering)[:10]),
+        'trigram {!r}'.format(query): (
+            trigram_search(
+                Lease.objects.select_related('student', 'book'), query,
+                STUDENT_TRIGRAM_COLUMNS + BOOK_TRIGRAM_COLUMNS)
+            .order_by('-' + RANK_ANNOTATION, *ordering)[:10]),
+    }, repeat)
+
+
+@benchmark('search_index')
+def search_index_benchmark(stdout, options):
+    """
+    Shows build time, memory footprint and file size of search index and
+    compares its search latency with icontains filter.
+    """
+    repeat = max(options['size'] // 100, 1)
+    index = BookIndex()
+    start = time.perf_counter()
+    index.build(connection.alias)
+    stdout.write("books: {}, words: {}, build {:.2f} s".format(
+        len(index), len(index.postings), time.perf_counter() - start))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index')
+        index.save(path)
+        start = time.perf_counter()
+        BookIndex().load(path)
+        elapsed = time.perf_counter() - start
+        stdout.write(
+            "memory: {:.1f} MiB, file: {:.1f} MiB, load {:.2f} s".format(
+                index.footprint() / 2 ** 20,
+                os.path.getsize(path) / 2 ** 20, elapsed))
+    queries = [
+        WORDS[0], WORDS[-1].lower(), LAST_NAMES[0], WORDS[1][:3],
+        '{} {}'.format(WORDS[1], WORDS[2])]
+    for query in queries:
+        stdout.write(
+            "{!r}: index lookup {:.3f} ms, icontains page {:.2f} ms, "
+            "{} matches".format(
+                query,
+                median_time(lambda q=query: index.search(q), repeat),
+                median_time(lambda q=query: icontains_page(q), repeat),
+                len(index.search(query))))
+
+
+@benchmark('request_profile')
+def request_profile_benchmark(stdout, options):
+    """
+    Compares time of book list page rendered without request profiling
+    middleware, with middleware which did not sample request and with
+    profiled request. Variants are interleaved, so that drift of
+    machine speed affects all of them.
+    """
+    user = get_user_model().objects.filter(is_superuser=True).first()
+    if user is None:
+        stdout.write("Database has no superuser, create one first")
+        return
+    book_list = BookListView.as_view()
+    factory = RequestFactory()
+
+    def view(request):
+        # Template response is rendered inside middleware, as by handler.
+        return book_list(request).render()
+
+    profiled = RequestProfileMiddleware(view)
+    variants = (
+        ('without middleware', 1, view),
+        ('not sampled', 0, profiled),
+        ('profiled', 1, profiled))
+    timings = {label: [] for label, _, _ in variants}
+    for number in range(options['size'] + 1):
+        for label, sample_rate, handler in variants:
+            request = factory.get('/librarian/books/')
+            request.user = user
+            with override_settings(
+                    REQUEST_PROFILE_SAMPLE_RATE=sample_rate,
+                    REQUEST_PROFILE_LOG_THRESHOLD=float('inf')):
+                start = time.perf_counter()
+                handler(request)
+                elapsed = (time.perf_counter() - start) * 1000
+            # The first round fills caches.
+            if number:
+                timings[label].append(elapsed)
+    for label, values in timings.items():
+        stdout.write("{}: {:.2f} ms".format(
+            label, statistics.median(values)))
@@ -37,12 +37,13 @@ def admin_required(view_func=None, redirect_field_name=REDIRECT_FIELD_NAME):
 def group_required(*group_names):
     """
     Decorator for views that checks that the user is a member of given
-    group, redirecting to the login page if necessary.
+    group, redirecting to the login page if necessary. Membership is
+    read from group cache, so the check makes no queries.
     """
 
     def in_group(user):
         return user.is_active and (
             user.is_superuser
-            or bool(user.groups.filter(name__in=group_names)))
+            or not user.group_names().isdisjoint(group_names))
 
     return user_passes_test(in_group)
@@ -18,17 +18,23 @@
 This module contains all forms of main app.
 """
 
+import re
+
 import stdnum.isbn
 from django_registration.forms import RegistrationForm
 
 from django import forms
+from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.translation import gettext as _, ngettext
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
+from django.db.models import Q
 
 
+from .importing import import_format
 from .models import Book, Lease
+from .utils import parse_user_id
 
 
 class RegisterForm(RegistrationForm):
@@ -122,6 +128,24 @@ class BookCreationForm(forms.ModelForm):
         return stdnum.isbn.to_isbn13(self.cleaned_data['isbn'])
 
 
+class BookImportForm(forms.Form):
+    """
+    The form which allows to upload CSV or XLSX file with books.
+    """
+    file = forms.FileField(
+        widget=forms.FileInput(attrs={'accept': '.csv,.xlsx'}),
+        label=_("CSV or XLSX file"))
+
+    def clean_file(self):
+        """
+        File must have CSV or XLSX extension.
+        """
+        file = self.cleaned_data['file']
+        if import_format(file.name) is None:
+            raise forms.ValidationError(_('Unknown file format'))
+        return file
+
+
 class BookUpdateForm(forms.ModelForm):
     """
     The form which allows to update a Book instance.
@@ -148,33 +172,100 @@ class BookUpdateForm(forms.ModelForm):
             book_isbn = self.cleaned_data['isbn']
         except KeyError:
             raise forms.ValidationError(_('No ISBN is sent')) from None
-        if Book.objects.filter(pk=book_isbn).exists():
-            book = Book.objects.get(pk=book_isbn)
-            lease_count = book.lease_set.filter(return_date__isnull=True)\
-                .count()
-            if count < lease_count:
-                raise forms.ValidationError(
-                    (ngettext(
-                        '{0} book is leased, '
-                        'so minimum allowed book count is {0}',
-                        '{0} books are leased, '
-                        'so minimum allowed book count is {0}',
-                        lease_count))
-                    .format(lease_count))
+        lease_count = Book.objects.filter(pk=book_isbn)\
+            .values_list('leased_count', flat=True).first()
+        if lease_count is not None and count < lease_count:
+            raise forms.ValidationError(
+                (ngettext(
+                    '{0} book is leased, '
+                    'so minimum allowed book count is {0}',
+                    '{0} books are leased, '
+                    'so minimum allowed book count is {0}',
+                    lease_count))
+                .format(lease_count))
         return count
 
 
-class LeaseCreationForm(forms.ModelForm):
+# Fields of autocomplete_students results shown in suggestions.
+STUDENT_LABEL_FIELDS = ('username', 'name')
+
+
+class AutocompleteInput(forms.TextInput):
+    """
+    Text input for value of object suggested by autocomplete view while
+    user types, so choices are never rendered into page. Suggestions are
+    labeled by label_fields of results.
+    """
+    template_name = 'main/widgets/autocomplete.html'
+
+    class Media:
+        js = ('main/js/autocomplete.js',)
+
+    def __init__(self, url, value_field, label_fields, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+        self.value_field = value_field
+        self.label_fields = label_fields
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs'].update({
+            'list': '{}_options'.format(context['widget']['attrs']['id']),
+            'data-autocomplete-url': self.url,
+            'data-autocomplete-value': self.value_field,
+            'data-autocomplete-label': ' '.join(self.label_fields),
+            'autocomplete': 'off',
+        })
+        return context
+
+
+class StudentChoiceField(forms.ModelChoiceField):
     """
-    The form which allows to create new Lease instance.
+    Choice of student by id, which rejects values that are not valid user
+    ids before they reach database.
+    """
+
+    def to_python(self, value):
+        if value not in self.empty_values \
+                and parse_user_id(str(value)) is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice')
+        return super().to_python(value)
+
+
+class ExpireDateMixin:
+    """
+    Validates expire date of new leases.
+    """
+
+    def clean_expire_date(self):
+        """
+        Expire date must be in future.
+        """
+        expire_date = self.cleaned_data['expire_date']
+        if expire_date <= timezone.now().date():
+            raise forms.ValidationError(_('Expire date must be in future'))
+        return expire_date
+
+
+class LeaseCreationForm(ExpireDateMixin, forms.ModelForm):
     """
-    student = forms.ModelChoiceField(
+    The form which allows to create new Lease instance. Student and book
+    are given by primary key and fetched by single query on validation.
+    """
+    student = StudentChoiceField(
         queryset=get_user_model().objects.filter(groups__name='Student'),
+        widget=AutocompleteInput(
+            reverse_lazy('main:autocomplete_students'), 'id',
+            STUDENT_LABEL_FIELDS),
         label=_("Student"))
 
     class Meta:
         model = Lease
         fields = ['student', 'book', 'expire_date']
+        widgets = {
+            'book': forms.HiddenInput,
+        }
 
     def clean_book(self):
         """
@@ -185,11 +276,103 @@ class LeaseCreationForm(forms.ModelForm):
             raise forms.ValidationError(_('Book is not available for leasing'))
         return book
 
-    def clean_expire_date(self):
+
+def split_values(text):
+    """
+    Returns list of values separated by whitespace, commas or semicolons,
+    as typed or scanned one per line.
+    """
+    return [value for value in re.split(r'[\s,;]+', text) if value]
+
+
+class BulkLeaseCreationForm(ExpireDateMixin, forms.Form):
+    """
+    The form which allows to lease one book to many students or many
+    books to one student. Students are given by id or username, books by
+    ISBN, and all of them are fetched by one query per field.
+    """
+    students = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 5}), label=_("Students"))
+    books = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 5}), label=_("Books"))
+    expire_date = forms.DateField(label=_("Expire date"))
+
+    def clean_students(self):
         """
-        Expire date must be in future.
+        All students must exist. Returns list of students without
+        duplicates.
         """
-        expire_date = self.cleaned_data['expire_date']
-        if expire_date <= timezone.now().date():
-            raise forms.ValidationError(_('Expire date must be in future'))
-        return expire_date
+        values = split_values(self.cleaned_data['students'])
+        ids = {value: parse_user_id(value) for value in values}
+        students = get_user_model().objects.filter(
+            Q(pk__in=[pk for pk in ids.values() if pk is not None])
+            | Q(username__in=values), groups__name='Student')
+        found = {}
+        for student in students:
+            found[student.pk] = found[student.username] = student
+        found = {
+            value: found.get(value, found.get(ids[value]))
+            for value in values}
+        unknown = [value for value in values if found[value] is None]
+        if unknown:
+            raise forms.ValidationError(
+                _('Students not found: {}').format(', '.join(unknown)))
+        return list({
+            found[value].pk: found[value] for value in values}.values())
+
+    def clean_books(self):
+        """
+        All ISBNs must be valid and books must exist. Returns list of
+        books without duplicates.
+        """
+        values = split_values(self.cleaned_data['books'])
+        invalid = [
+            value for value in values if not stdnum.isbn.is_valid(value)]
+        if invalid:
+            raise forms.ValidationError(
+                _('Invalid ISBN: {}').format(', '.join(invalid)))
+        isbns = [
+            stdnum.isbn.to_isbn13(stdnum.isbn.compact(value))
+            for value in values]
+        found = Book.objects.in_bulk(isbns)
+        unknown = [
+            value for value, isbn in zip(values, isbns) if isbn not in found]
+        if unknown:
+            raise forms.ValidationError(
+                _('Books not found: {}').format(', '.join(unknown)))
+        return list({isbn: found[isbn] for isbn in isbns}.values())
+
+    def clean(self):
+        """
+        Either one student or one book must be given.
+        """
+        cleaned_data = super().clean()
+        if len(cleaned_data.get('students', ())) > 1 \
+                and len(cleaned_data.get('books', ())) > 1:
+            raise forms.ValidationError(
+                _('Lease one book to many students or many books to one '
+                  'student'))
+        return cleaned_data
+
+
+class BulkReturnForm(forms.Form):
+    """
+    The form which allows to return many leases by scanned lease IDs or
+    ISBNs, optionally of one student.
+    """
+    codes = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 10, 'autofocus': True}),
+        label=_("Lease IDs or ISBNs"))
+    student = StudentChoiceField(
+        queryset=get_user_model().objects.filter(groups__name='Student'),
+        widget=AutocompleteInput(
+            reverse_lazy('main:autocomplete_students'), 'id',
+            STUDENT_LABEL_FIELDS),
+        required=False,
+        label=_("Student"))
+
+    def clean_codes(self):
+        """
+        Returns list of scanned codes.
+        """
+        return split_values(self.cleaned_data['codes'])
@@ -0,0 +1,330 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+This module contains bulk import of books from CSV or XLSX files in main
+app. Rows are read as stream and processed in batches, so memory used
+does not depend on file size. Existing books get imported count added,
+new books are inserted with bulk_create.
+"""
+
+import csv
+import io
+import re
+from collections import defaultdict, namedtuple
+
+import stdnum.ean
+import stdnum.isbn
+from openpyxl import load_workbook
+
+from django.db import IntegrityError, reset_queries, transaction
+from django.db.models import F
+from django.utils import timezone, translation
+from django.utils.translation import gettext as _
+
+from .models import Book
+
+
+IMPORT_BATCH_SIZE = 1000
+
+# Number of attempts to save batch, which fails if book with the same
+# ISBN is inserted by concurrent import.
+IMPORT_ATTEMPTS = 3
+
+IMPORT_FORMATS = ('csv', 'xlsx')
+
+# Columns read from file. ISBN and name are required, authors default to
+# empty string and count to one copy.
+IMPORT_FIELDS = ('isbn', 'name', 'authors', 'count')
+
+ISBN_SEPARATORS = str.maketrans('', '', ' -')
+ISBN10_RE = re.compile(r'[0-9]{9}[0-9X]')
+ISBN13_RE = re.compile(r'97[89][0-9]{10}')
+
+# Greatest value of Book.count column.
+MAX_COUNT = 32767
+
+ImportResult = namedtuple('ImportResult', ['created', 'updated', 'rejected'])
+
+
+class ImportFileError(Exception):
+    """
+    Raised when import file can not be read as table of books.
+    """
+
+
+def normalize_isbn(value):
+    """
+    Returns ISBN-13 without separators for valid ISBN-10 or ISBN-13, or
+    None for invalid one. Gives the same result as stdnum.isbn, but
+    ISBN-13 values, which are the most common, are checked without its
+    per-call overhead.
+    """
+    number = str(value).translate(ISBN_SEPARATORS).upper()
+    if ISBN13_RE.fullmatch(number):
+        if stdnum.ean.calc_check_digit(number[:12]) != number[12]:
+            return None
+        return number
+    if ISBN10_RE.fullmatch(number) and stdnum.isbn.is_valid(number):
+        return stdnum.isbn.to_isbn13(number)
+    return None
+
+
+def normalize_isbns(values):
+    """
+    Returns list of normalized ISBNs of batch of values. Repeated values
+    are normalized once.
+    """
+    normalized = {}
+    for value in values:
+        if value not in normalized:
+            normalized[value] = normalize_isbn(value)
+    return [normalized[value] for value in values]
+
+
+def read_csv(file):
+    """
+    Yields rows of binary CSV file. Byte order mark written by Excel is
+    skipped.
+    """
+    yield from csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig'))
+
+
+def read_xlsx(file):
+    """
+    Yields rows of active sheet of XLSX file. Workbook is opened in
+    read-only mode, so rows are parsed while they are read.
+    """
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as error:
+        raise ImportFileError(str(error)) from error
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    except Exception as error:
+        raise ImportFileError(str(error)) from error
+    finally:
+        workbook.close()
+
+
+def column_names():
+    """
+    Returns mapping of accepted column headers to imported fields.
+    Field names, as in CSV report, and verbose names in English and in
+    active language, as in XLSX report, are accepted.
+    """
+    names = {}
+    for field in IMPORT_FIELDS:
+        verbose_name = Book._meta.get_field(field).verbose_name
+        names[field] = field
+        names[str(verbose_name).casefold()] = field
+        with translation.override('en'):
+            names[str(verbose_name).casefold()] = field
+    return names
+
+
+def parse_header(header):
+    """
+    Returns mapping of imported fields to column positions. Raises
+    ImportFileError if required columns are missing.
+    """
+    names = column_names()
+    columns = {}
+    for position, title in enumerate(header or ()):
+        field = names.get(str(title or '').strip().casefold())
+        if field is not None:
+            columns.setdefault(field, position)
+    missing = [field for field in ('isbn', 'name') if field not in columns]
+    if missing:
+        raise ImportFileError(
+            _("Missing columns: {}").format(', '.join(missing)))
+    return columns
+
+
+def cell(row, columns, field):
+    """
+    Returns stripped text of field in row or empty string. Integral
+    numbers, which XLSX cells may store as floats, are written without
+    fractional part.
+    """
+    position = columns.get(field)
+    if position is None or position >= len(row) or row[position] is None:
+        return ''
+    value = row[position]
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def parse_count(value):
+    """
+    Returns number of copies in cell or None if it is invalid.
+    """
+    if value == '':
+        return 1
+    try:
+        count = int(float(value))
+    except (ValueError, OverflowError):
+        return None
+    if count != float(value) or not 0 < count <= MAX_COUNT:
+        return None
+    return count
+
+
+class BookImporter:
+    """
+    Imports rows of books in batches. Rejected rows are passed to
+    on_reject callback with row number and reason.
+    """
+
+    def __init__(self, on_reject=None, batch_size=IMPORT_BATCH_SIZE):
+        self.on_reject = on_reject
+        self.batch_size = batch_size
+        self.created = 0
+        self.updated = 0
+        self.rejected = 0
+
+    def reject(self, number, row, reason):
+        """
+        Counts rejected row and reports it.
+        """
+        self.rejected += 1
+        if self.on_reject is not None:
+            self.on_reject(number, row, reason)
+
+    def import_rows(self, rows):
+        """
+        Imports rows, the first of which is header, and returns
+        ImportResult.
+        """
+        rows = iter(rows)
+        columns = parse_header(next(rows, None))
+        batch = []
+        # Row numbers start from 1 at header, as in spreadsheet.
+        for number, row in enumerate(rows, 2):
+            if not any(value not in (None, '') for value in row):
+                continue
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, columns)
+                batch = []
+                # Queries logged if DEBUG is set would grow with file.
+                reset_queries()
+        if batch:
+            self.import_batch(batch, columns)
+        return ImportResult(self.created, self.updated, self.rejected)
+
+    def import_batch(self, batch, columns):
+        """
+        Validates batch of numbered rows, adds counts to existing books
+        and inserts new ones. Rows with the same ISBN are merged.
+        """
+        isbns = normalize_isbns([
+            cell(row, columns, 'isbn') for number, row in batch])
+        books = {}
+        sources = defaultdict(list)
+        for (number, row), isbn in zip(batch, isbns):
+            name = cell(row, columns, 'name')
+            authors = cell(row, columns, 'authors')
+            count = parse_count(cell(row, columns, 'count'))
+            if isbn is None:
+                self.reject(number, row, _("Invalid ISBN"))
+            elif not name or len(name) > 255 or len(authors) > 255:
+                self.reject(number, row, _("Invalid name or authors"))
+            elif count is None:
+                self.reject(number, row, _("Invalid count"))
+            else:
+                sources[isbn].append((number, row))
+                if isbn in books:
+                    books[isbn].count += count
+                else:
+                    books[isbn] = Book(
+                        isbn=isbn, name=name, authors=authors, count=count)
+
+        for attempt in range(1, IMPORT_ATTEMPTS + 1):
+            try:
+                too_many, created = self.save_books(books)
+                break
+            except IntegrityError:
+                # Concurrent import inserted the same new book, so it is
+                # updated on next attempt.
+                if attempt == IMPORT_ATTEMPTS:
+                    raise
+        for isbn in too_many:
+            for number, row in sources[isbn]:
+                self.reject(number, row, _("Too many copies"))
+        self.created += created
+        self.updated += len(books) - len(too_many) - created
+
+    def save_books(self, books):
+        """
+        Adds counts to existing books and inserts new ones in one
+        transaction. Returns ISBNs of books that would have too many
+        copies and number of inserted books.
+        """
+        with transaction.atomic():
+            counts = dict(Book.objects.filter(pk__in=books).values_list(
+                'pk', 'count'))
+            too_many = []
+            isbns_by_count = defaultdict(list)
+            new_books = []
+            for isbn, book in books.items():
+                if counts.get(isbn, 0) + book.count > MAX_COUNT:
+                    too_many.append(isbn)
+                elif isbn in counts:
+                    isbns_by_count[book.count].append(isbn)
+                else:
+                    new_books.append(book)
+            now = timezone.now()
+            for count, isbns in isbns_by_count.items():
+                # update() bypasses auto_now, and count is exported by
+                # incremental reports.
+                Book.objects.filter(pk__in=isbns).update(
+                    count=F('count') + count, updated_date=now)
+            Book.objects.bulk_create(new_books, batch_size=self.batch_size)
+        return too_many, len(new_books)
+
+
+def import_format(file_name):
+    """
+    Returns import format of file by its extension or None if it is not
+    supported.
+    """
+    extension = file_name.rpartition('.')[2].lower()
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def read_books(file, file_format):
+    """
+    Returns iterator of rows of CSV or XLSX file.
+    """
+    if file_format == 'xlsx':
+        return read_xlsx(file)
+    return read_csv(file)
+
+
+def import_books(file, file_format, on_reject=None,
+                 batch_size=IMPORT_BATCH_SIZE):
+    """
+    Imports books from binary CSV or XLSX file and returns ImportResult.
+    Raises ImportFileError if file can not be read.
+    """
+    importer = BookImporter(on_reject, batch_size)
+    try:
+        return importer.import_rows(read_books(file, file_format))
+    except (csv.Error, UnicodeDecodeError) as error:
+        raise ImportFileError(str(error)) from error
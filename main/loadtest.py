@@ -0,0 +1,511 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+This module contains HTTP load test of main app. Virtual librarians and
+students log in as seeded users and replay weighted scenarios against
+running server, using asyncio and small HTTP/1.1 client, so no extra
+packages are needed. Scenario choice depends only on seed, so runs with
+the same options replay the same sequence of scenarios.
+"""
+
+import asyncio
+import datetime
+import json
+import random
+import re
+import time
+from collections import defaultdict, namedtuple
+from urllib.parse import urlencode, urlsplit
+
+from .seeding import SEED_PREFIX, WORDS
+
+
+SCENARIOS = defaultdict(list)
+
+Scenario = namedtuple('Scenario', ['name', 'weight', 'func'])
+
+Response = namedtuple('Response', ['status', 'headers', 'body'])
+
+LEASE_LINK_RE = re.compile(
+    r'/librarian/leases/([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-'
+    r'[0-9a-f]{4}-[0-9a-f]{12})/')
+CURSOR_LINK_RE = re.compile(r'href="\?([^"]*cursor=[^"]*)"')
+
+# Percentiles reported for every request label.
+PERCENTILES = (50, 95, 99)
+
+
+class ScenarioError(Exception):
+    """
+    Raised when response does not allow scenario to continue.
+    """
+
+
+def scenario(role, weight):
+    """
+    Registers decorated coroutine function as scenario of users with
+    given role. Scenario receives Session and random generator.
+    """
+
+    def register(func):
+        SCENARIOS[role].append(Scenario(func.__name__, weight, func))
+        return func
+
+    return register
+
+
+class HttpClient:
+    """
+    HTTP/1.1 client keeping one connection alive and storing cookies.
+    """
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.cookies = {}
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        """
+        Closes connection if it is open.
+        """
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, data=None, headers=None):
+        """
+        Sends request and returns Response. If kept alive connection was
+        closed by server, request is sent once more over new one.
+        """
+        reused = self.writer is not None
+        try:
+            return await self.send(method, path, data, headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            if not reused:
+                raise
+        return await self.send(method, path, data, headers)
+
+    async def send(self, method, path, data, headers):
+        """
+        Writes request to connection and reads response.
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port)
+        body = b''
+        lines = [
+            '{} {} HTTP/1.1'.format(method, path),
+            'Host: {}:{}'.format(self.host, self.port),
+        ]
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(
+                '{}={}'.format(*cookie) for cookie in self.cookies.items()))
+        if data is not None:
+            body = urlencode(data).encode()
+            lines.append('Content-Type: application/x-www-form-urlencoded')
+        if method != 'GET':
+            lines.append('Content-Length: {}'.format(len(body)))
+        for name, value in (headers or {}).items():
+            lines.append('{}: {}'.format(name, value))
+        self.writer.write(
+            ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+        return await self.read_response()
+
+    async def read_response(self):
+        """
+        Reads status, headers and body of response.
+        """
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by server")
+        version, status = status_line.decode('latin-1').split()[:2]
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                self.set_cookie(value)
+            else:
+                headers[name] = value
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self.read_chunks()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(
+                int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            await self.close()
+        if (headers.get('connection', '').lower() == 'close'
+                or version == 'HTTP/1.0'):
+            await self.close()
+        return Response(int(status), headers, body)
+
+    async def read_chunks(self):
+        """
+        Reads body sent with chunked transfer encoding.
+        """
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            chunk = await self.reader.readexactly(size + 2)
+            if not size:
+                # Trailer headers are not used by the app.
+                return b''.join(chunks)
+            chunks.append(chunk[:-2])
+
+    def set_cookie(self, header):
+        """
+        Stores or deletes cookie from Set-Cookie header.
+        """
+        name, _, value = header.split(';')[0].partition('=')
+        name, value = name.strip(), value.strip().strip('"')
+        if value and 'max-age=0' not in header.lower():
+            self.cookies[name] = value
+        else:
+            self.cookies.pop(name, None)
+
+
+class Stats:
+    """
+    Collects latencies and errors of requests by label and counts of
+    run scenarios.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.scenarios = defaultdict(int)
+        self.failed_users = []
+        self.start = time.perf_counter()
+        self.finish = None
+
+    def add(self, label, latency, ok):
+        """
+        Records request with latency in seconds.
+        """
+        self.latencies[label].append(latency)
+        if not ok:
+            self.errors[label] += 1
+
+    def stop(self):
+        """
+        Marks end of load test.
+        """
+        self.finish = time.perf_counter()
+
+    def elapsed(self):
+        """
+        Returns duration of load test in seconds.
+        """
+        return (self.finish or time.perf_counter()) - self.start
+
+
+def percentile(values, percent):
+    """
+    Returns nearest-rank percentile of sorted list of values.
+    """
+    if not values:
+        return 0.0
+    rank = max(int(-(-len(values) * percent // 100)), 1)
+    return values[rank - 1]
+
+
+def write_report(stdout, stats):
+    """
+    Writes latency percentiles in milliseconds, error count and
+    throughput of every request label and of all requests.
+    """
+    elapsed = stats.elapsed()
+    header = "{:<24} {:>7} {:>6} {:>9} {:>9} {:>9} {:>8}".format(
+        'request', 'count', 'errors', *(
+            'p{} ms'.format(percent) for percent in PERCENTILES), 'req/s')
+    stdout.write(header)
+    rows = sorted(stats.latencies.items())
+    rows.append(('total', [
+        latency for latencies in stats.latencies.values()
+        for latency in latencies]))
+    for label, latencies in rows:
+        latencies = sorted(latencies)
+        errors = (
+            sum(stats.errors.values()) if label == 'total'
+            else stats.errors[label])
+        stdout.write(
+            "{:<24} {:>7} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>8.1f}".format(
+                label, len(latencies), errors, *(
+                    percentile(latencies, percent) * 1000
+                    for percent in PERCENTILES),
+                len(latencies) / elapsed))
+    for failure in stats.failed_users:
+        stdout.write("Failed user: {}".format(failure))
+    stdout.write("Elapsed {:.1f} s".format(elapsed))
+
+
+class Session:
+    """
+    Logged in virtual user. Every request is timed and recorded in stats
+    under its label.
+    """
+
+    def __init__(self, base_url, stats):
+        self.client = HttpClient(base_url)
+        self.stats = stats
+
+    async def request(self, label, method, path, params=None, data=None,
+                      redirect=False):
+        """
+        Sends request and records its latency. Responses with status 400
+        and above, or without redirect if it is expected, are counted as
+        errors and raise ScenarioError.
+        """
+        if params:
+            path = '{}?{}'.format(path, urlencode(params))
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, data)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.stats.add(label, time.perf_counter() - start, False)
+            await self.client.close()
+            raise ScenarioError(label) from None
+        ok = response.status < 400 and (
+            not redirect or response.status in (301, 302, 303))
+        self.stats.add(label, time.perf_counter() - start, ok)
+        if not ok:
+            raise ScenarioError("{} returned {}".format(
+                label, response.status))
+        return response
+
+    async def get(self, label, path, params=None):
+        """
+        Sends GET request.
+        """
+        return await self.request(label, 'GET', path, params)
+
+    async def post(self, label, path, data):
+        """
+        Sends form with CSRF token taken from cookie. Valid forms of the
+        app redirect, so response without redirect is an error.
+        """
+        data = dict(data, csrfmiddlewaretoken=self.client.cookies.get(
+            'csrftoken', ''))
+        return await self.request(
+            label, 'POST', path, data=data, redirect=True)
+
+    async def get_json(self, label, path, params=None):
+        """
+        Sends GET request and returns decoded JSON response.
+        """
+        response = await self.get(label, path, params)
+        return json.loads(response.body)
+
+    async def login(self, username, password):
+        """
+        Logs in with username and password. Raises ScenarioError if
+        credentials are not accepted.
+        """
+        await self.get('login', '/login/')
+        try:
+            await self.post('login', '/login/', {
+                'username': username, 'password': password})
+        except ScenarioError:
+            raise ScenarioError(
+                "Could not log in as {}".format(username)) from None
+
+    async def close(self):
+        """
+        Closes connection of session.
+        """
+        await self.client.close()
+
+
+async def find_book(session, rng):
+    """
+    Returns ISBN of available book found by autocomplete of random word.
+    Raises ScenarioError if no book is found.
+    """
+    results = (await session.get_json(
+        'autocomplete_books', '/librarian/autocomplete/books/',
+        {'q': rng.choice(WORDS)[:3]}))['results']
+    available = [book['isbn'] for book in results if book['available']]
+    if not available:
+        raise ScenarioError("No available books")
+    return rng.choice(available)
+
+
+@scenario('librarian', 30)
+async def browse_books(session, rng):
+    """
+    Opens book list and follows one pagination link.
+    """
+    response = await session.get('books', '/librarian/books/')
+    links = CURSOR_LINK_RE.findall(response.body.decode())
+    if links:
+        await session.get(
+            'books (page)',
+            '/librarian/books/?' + rng.choice(links).replace('&amp;', '&'))
+
+
+@scenario('librarian', 25)
+async def search_books(session, rng):
+    """
+    Searches books by random word.
+    """
+    await session.get(
+        'books (search)', '/librarian/books/', {'q': rng.choice(WORDS)})
+
+
+@scenario('librarian', 20)
+async def book_detail(session, rng):
+    """
+    Opens detail page of book found by autocomplete.
+    """
+    isbn = await find_book(session, rng)
+    await session.get('book_detail', '/librarian/books/{}/'.format(isbn))
+
+
+@scenario('librarian', 10)
+async def issue_lease(session, rng):
+    """
+    Leases available book to student found by autocomplete.
+    """
+    isbn = await find_book(session, rng)
+    students = (await session.get_json(
+        'autocomplete_students', '/librarian/autocomplete/students/',
+        {'q': '{}student_{}'.format(SEED_PREFIX, rng.randrange(10))}
+    ))['results']
+    if not students:
+        raise ScenarioError("No students")
+    path = '/librarian/books/{}/new_lease/'.format(isbn)
+    await session.get('new_lease', path)
+    expire_date = datetime.date.today() + datetime.timedelta(
+        days=rng.randint(14, 60))
+    await session.post('new_lease (post)', path, {
+        'student': rng.choice(students)['id'],
+        'book': isbn,
+        'expire_date': expire_date.isoformat(),
+    })
+
+
+@scenario('librarian', 10)
+async def return_lease(session, rng):
+    """
+    Returns active lease chosen from the first page of active leases.
+    """
+    response = await session.get(
+        'leases', '/librarian/leases/', {'active': 'yes'})
+    lease_ids = sorted(set(LEASE_LINK_RE.findall(response.body.decode())))
+    if not lease_ids:
+        raise ScenarioError("No active leases")
+    path = '/librarian/leases/{}/return/'.format(rng.choice(lease_ids))
+    await session.get('return_lease', path)
+    await session.post('return_lease (post)', path, {})
+
+
+@scenario('librarian', 5)
+async def export_report(session, rng):
+    """
+    Downloads streamed report of random data set.
+    """
+    await session.get('report', '/librarian/report/', {
+        'format': rng.choice(['csv', 'ndjson']),
+        'dataset': rng.choice(['books', 'leases'])})
+
+
+@scenario('student', 50)
+async def student_home(session, rng):
+    """
+    Opens student page with active leases.
+    """
+    await session.get('student', '/student/')
+
+
+@scenario('student', 50)
+async def lease_history(session, rng):
+    """
+    Opens lease history, filtered by random state.
+    """
+    await session.get('lease_history', '/student/lease_history/', {
+        'active': rng.choice(['all', 'yes', 'no'])})
+
+
+async def run_user(base_url, role, username, password, rng, deadline,
+                   iterations, stats):
+    """
+    Logs in and runs scenarios of role chosen by weight until deadline
+    or given number of iterations. Every scenario gets own random
+    generator, so choice of scenarios does not depend on responses.
+    """
+    scenarios = SCENARIOS[role]
+    weights = [item.weight for item in scenarios]
+    session = Session(base_url, stats)
+    try:
+        await session.login(username, password)
+        iteration = 0
+        while time.perf_counter() < deadline and (
+                iterations is None or iteration < iterations):
+            chosen = rng.choices(scenarios, weights)[0]
+            stats.scenarios[chosen.name] += 1
+            iteration += 1
+            try:
+                await chosen.func(session, random.Random(rng.random()))
+            except ScenarioError:
+                pass
+    finally:
+        await session.close()
+
+
+async def run_load_test(base_url, librarians, students, duration, seed=0,
+                        password='seedpass', iterations=None):
+    """
+    Runs given number of virtual librarians and students for duration
+    in seconds, or until every user runs given number of scenarios, and
+    returns Stats. Virtual user number N of role logs in as
+    seed_<role>_N.
+    """
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+    users = [
+        ('librarian', number) for number in range(librarians)
+    ] + [
+        ('student', number) for number in range(students)
+    ]
+    results = await asyncio.gather(*(
+        run_user(
+            base_url, role,
+            '{}{}_{}'.format(SEED_PREFIX, role, number), password,
+            random.Random('{}-{}-{}'.format(seed, role, number)),
+            deadline, iterations, stats)
+        for role, number in users), return_exceptions=True)
+    stats.stop()
+    stats.failed_users = [
+        str(result) for result in results if isinstance(result, Exception)]
+    if users and len(stats.failed_users) == len(users):
+        raise ScenarioError(stats.failed_users[0])
+    return stats
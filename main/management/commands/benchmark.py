@@ -0,0 +1,42 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains command which runs performance benchmarks.
+"""
+
+from django.core.management.base import BaseCommand
+
+from main.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    """
+    Runs benchmark registered in main.benchmarks.
+    """
+    help = "Runs performance benchmark against configured database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS))
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help="Number of concurrent workers.")
+        parser.add_argument(
+            '--size', type=int, default=1000,
+            help="Number of operations or rows to process.")
+
+    def handle(self, *args, **options):
+        BENCHMARKS[options['name']](self.stdout, options)
@@ -0,0 +1,57 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+This module contains command which builds search index of books.
+"""
+
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from main.search_index import book_index, index_path
+
+
+class Command(BaseCommand):
+    """
+    Builds search index of books and saves it to index file.
+    """
+    help = "Builds search index of books used if SEARCH_MODE is \"index\"."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help="Database to index books of.")
+
+    def handle(self, *args, **options):
+        path = index_path(options['database'])
+        if not path:
+            raise CommandError(
+                "Index file is unknown, set SEARCH_INDEX_PATH setting")
+        start = time.perf_counter()
+        book_index.build(options['database'])
+        elapsed = time.perf_counter() - start
+        book_index.save(path)
+        if options['verbosity'] >= 1:
+            self.stdout.write(
+                "Indexed {} books, {} words in {:.2f} s".format(
+                    len(book_index), len(book_index.postings), elapsed))
+            self.stdout.write("Memory: {:.1f} MiB, file {}: {:.1f} MiB".format(
+                book_index.footprint() / 2 ** 20, path,
+                os.path.getsize(path) / 2 ** 20))
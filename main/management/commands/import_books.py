@@ -0,0 +1,82 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+This module contains command which imports books from CSV or XLSX file.
+"""
+
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importing import (
+    IMPORT_BATCH_SIZE, IMPORT_FORMATS, ImportFileError, import_books,
+    import_format)
+
+
+class Command(BaseCommand):
+    """
+    Imports books from file, adding copies of existing books.
+    """
+    help = (
+        "Imports books from CSV or XLSX file with ISBN, name, authors and "
+        "count columns. Count of existing books is increased.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Path of imported file.")
+        parser.add_argument(
+            '--format', choices=IMPORT_FORMATS,
+            help="File format, guessed from file extension by default.")
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help="Number of rows processed by one batch of queries.")
+        parser.add_argument(
+            '--rejected',
+            help="Path of CSV file rejected rows are written to, with row "
+                 "number and reason. By default they are written to "
+                 "stderr.")
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or import_format(options['file'])
+        if file_format is None:
+            raise CommandError(
+                "Unknown file format, use --format option")
+
+        rejected_file = (
+            open(options['rejected'], 'w', newline='', encoding='utf-8')
+            if options['rejected'] else self.stderr)
+        writer = csv.writer(rejected_file)
+
+        def on_reject(number, row, reason):
+            writer.writerow(
+                [number, reason]
+                + ['' if value is None else value for value in row])
+
+        try:
+            with open(options['file'], 'rb') as file:
+                result = import_books(
+                    file, file_format, on_reject, options['batch_size'])
+        except (OSError, ImportFileError) as error:
+            raise CommandError(error) from error
+        finally:
+            if rejected_file is not self.stderr:
+                rejected_file.close()
+
+        if options['verbosity'] >= 1:
+            self.stdout.write(
+                "Created {} books, updated {} books, rejected {} rows".format(
+                    *result))
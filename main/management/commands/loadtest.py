@@ -0,0 +1,120 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains command which runs HTTP load test of main app.
+"""
+
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.loadtest import ScenarioError, run_load_test, write_report
+
+
+# Seconds to wait for started server to accept connections.
+SERVER_START_TIMEOUT = 30
+
+
+def wait_for_server(host, port, process):
+    """
+    Waits until server accepts connections. Raises CommandError if
+    server exits or does not start in time.
+    """
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError("Server exited with code {}".format(
+                process.returncode))
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError("Server did not start in {} s".format(
+        SERVER_START_TIMEOUT))
+
+
+class Command(BaseCommand):
+    """
+    Replays weighted librarian and student scenarios and reports
+    latency percentiles and throughput.
+    """
+    help = (
+        "Runs HTTP load test as seeded librarians and students against "
+        "running server. Fill database with seed_library first.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://127.0.0.1:8000',
+            help="Base URL of tested server.")
+        parser.add_argument(
+            '--librarians', type=int, default=2,
+            help="Number of concurrent virtual librarians.")
+        parser.add_argument(
+            '--students', type=int, default=8,
+            help="Number of concurrent virtual students.")
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help="Duration of load test in seconds.")
+        parser.add_argument(
+            '--iterations', type=int,
+            help="Number of scenarios run by every virtual user, "
+                 "limited by --duration too.")
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Random seed, same seed replays same scenarios.")
+        parser.add_argument(
+            '--password', default='seedpass',
+            help="Password of seeded users.")
+        parser.add_argument(
+            '--runserver', action='store_true',
+            help="Start development server on host and port of --url "
+                 "for the time of load test.")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError("Only http:// URLs are supported")
+
+        process = None
+        if options['runserver']:
+            process = subprocess.Popen([
+                sys.executable, str(settings.BASE_DIR / 'manage.py'),
+                'runserver', '--noreload',
+                '{}:{}'.format(url.hostname, url.port or 80)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if process is not None:
+                wait_for_server(url.hostname, url.port or 80, process)
+            stats = asyncio.run(run_load_test(
+                options['url'], options['librarians'], options['students'],
+                options['duration'], options['seed'], options['password'],
+                options['iterations']))
+        except (OSError, ScenarioError) as error:
+            raise CommandError(error) from error
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+        write_report(self.stdout, stats)
@@ -0,0 +1,82 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains command which rebuilds leased copies counters of
+books from lease table.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from main.models import Book, Lease
+
+
+def actual_leased_count():
+    """
+    Returns expression which counts active leases of outer book.
+    """
+    active_leases = (
+        Lease.objects
+        .filter(book=OuterRef('pk'), return_date__isnull=True)
+        .order_by()
+        .values('book')
+        .annotate(leased=Count('pk'))
+        .values('leased'))
+    return Coalesce(Subquery(active_leases), 0)
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds Book.leased_count from active leases.
+    """
+    help = "Rebuilds and verifies leased copies counters of books."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only verify counters and fail if any of them is wrong.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            invalid_books = (
+                Book.objects
+                .annotate(actual=actual_leased_count())
+                .exclude(leased_count=F('actual'))
+                .order_by('pk')
+                .values_list('isbn', 'leased_count', 'actual'))
+
+            invalid_count = 0
+            for isbn, leased_count, actual in invalid_books.iterator():
+                invalid_count += 1
+                if options['verbosity'] >= 2:
+                    self.stdout.write("{}: stored {}, actual {}".format(
+                        isbn, leased_count, actual))
+
+            if options['check']:
+                if invalid_count:
+                    raise CommandError(
+                        "{} book counters are invalid".format(invalid_count))
+                self.stdout.write("All book counters are valid")
+                return
+
+            if invalid_count:
+                Book.objects.update(leased_count=actual_leased_count())
+            if options['verbosity'] >= 1:
+                self.stdout.write(
+                    "{} book counters rebuilt".format(invalid_count))
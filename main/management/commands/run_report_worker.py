@@ -0,0 +1,59 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains command which generates queued reports.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from main.reports import claim_next_job, purge_reports, run_job
+
+
+class Command(BaseCommand):
+    """
+    Processes report jobs queued in database.
+    """
+    help = "Generates queued reports in background."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Process pending jobs and exit.")
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help="Seconds to wait when no jobs are pending.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                job = claim_next_job()
+                if job is not None:
+                    run_job(job)
+                    if options['verbosity'] >= 1:
+                        self.stdout.write("Report job {} {}".format(
+                            job.id, job.status))
+                    continue
+                purge_reports()
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
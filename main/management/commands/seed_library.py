@@ -0,0 +1,85 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains command which fills database with synthetic data.
+"""
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from main.models import Book
+from main.seeding import SEED_PREFIX, LibrarySeeder, isbn13
+
+
+class Command(BaseCommand):
+    """
+    Generates books, students, librarians and leases.
+    """
+    help = "Fills database with deterministic synthetic library data."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--books', type=int, default=10000,
+            help="Number of books.")
+        parser.add_argument(
+            '--students', type=int, default=5000,
+            help="Number of students.")
+        parser.add_argument(
+            '--librarians', type=int, default=5,
+            help="Number of librarians.")
+        parser.add_argument(
+            '--leases', type=int, default=100000,
+            help="Number of leases.")
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Random seed, same seed produces same data.")
+        parser.add_argument(
+            '--reference-date', type=datetime.date.fromisoformat,
+            help="Date in YYYY-MM-DD format which seeded dates are "
+                 "relative to, today by default.")
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Number of rows inserted by one query.")
+        parser.add_argument(
+            '--password', default='seedpass',
+            help="Password of generated users.")
+
+    def handle(self, *args, **options):
+        if (get_user_model().objects
+                .filter(username__startswith=SEED_PREFIX).exists()
+                or Book.objects.filter(pk=isbn13(0)).exists()):
+            raise CommandError("Database already contains seeded data")
+
+        start = time.perf_counter()
+        seeder = LibrarySeeder(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+            reference_date=options['reference_date'])
+        created = seeder.seed(
+            books=options['books'],
+            students=options['students'],
+            leases=options['leases'],
+            librarians=options['librarians'])
+        self.stdout.write(
+            "Created {books} books, {students} students, "
+            "{librarians} librarians and {leases} leases".format(**created))
+        self.stdout.write("Elapsed {:.1f} s".format(
+            time.perf_counter() - start))
@@ -0,0 +1,97 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains middleware of main app.
+"""
+
+import json
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .audit import audit_buffer
+from .profiling import RequestProfile, current_profile
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuditFlushMiddleware:
+    """
+    Collects buffered audit log entries written during request and
+    inserts them by one query at the end of request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = audit_buffer.start()
+        try:
+            return self.get_response(request)
+        finally:
+            audit_buffer.finish(token)
+
+
+class RequestProfileMiddleware:
+    """
+    Profiles sampled requests: counts SQL queries and their time with
+    execute wrapper, measures template rendering, audit log writes and
+    total time. Profile is sent in Server-Timing header to staff users
+    and logged as JSON. Share of profiled requests is
+    REQUEST_PROFILE_SAMPLE_RATE, and only requests slower than
+    REQUEST_PROFILE_LOG_THRESHOLD seconds are logged. Streamed content
+    is sent after profile is finished, so it is not measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = getattr(settings, 'REQUEST_PROFILE_SAMPLE_RATE', 1.0)
+        if sample_rate <= 0 or random.random() >= sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile(
+            getattr(settings, 'REQUEST_PROFILE_SLOWEST_QUERIES', 3))
+        token = current_profile.set(profile)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+            profile.finish()
+
+        user = getattr(request, 'user', None)
+        if getattr(settings, 'REQUEST_PROFILE_SERVER_TIMING', True) \
+                and user is not None and user.is_staff:
+            response['Server-Timing'] = profile.server_timing()
+        if profile.total >= getattr(
+                settings, 'REQUEST_PROFILE_LOG_THRESHOLD', 0):
+            data = dict(
+                profile.as_dict(), method=request.method,
+                path=request.path, status=response.status_code)
+            logger.info(
+                "Request profile %s", json.dumps(data),
+                extra={'profile': data})
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.12 on 2026-10-17 04:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_leased_books(apps, schema_editor):
+    Book = apps.get_model('main', 'Book')
+    Lease = apps.get_model('main', 'Lease')
+    active_leases = (
+        Lease.objects
+        .filter(book=OuterRef('pk'), return_date__isnull=True)
+        .order_by()
+        .values('book')
+        .annotate(leased=Count('pk'))
+        .values('leased'))
+    Book.objects.using(schema_editor.connection.alias).update(
+        leased_count=Coalesce(Subquery(active_leases), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='leased_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Leased count'),
+        ),
+        migrations.RunPython(
+            count_leased_books, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.12 on 2026-10-17 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_book_leased_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-added_date'], name='book_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(count__gt=0), fields=['-added_date'], name='book_active_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lease',
+            index=models.Index(fields=['student', 'return_date', 'expire_date'], name='lease_student_return_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lease',
+            index=models.Index(fields=['return_date', 'expire_date'], name='lease_return_expire_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lease',
+            index=models.Index(condition=models.Q(return_date__isnull=True), fields=['expire_date'], name='lease_active_expire_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lease',
+            index=models.Index(fields=['issue_date'], name='lease_issue_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.12 on 2026-10-17 04:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_lease_book_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_format', models.CharField(default='xlsx', max_length=10, verbose_name='Format')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='Created date')),
+                ('started_date', models.DateTimeField(null=True, verbose_name='Started date')),
+                ('finished_date', models.DateTimeField(null=True, verbose_name='Finished date')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='File name')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('requested_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Requested by')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reportjob',
+            index=models.Index(fields=['status', 'created_date'], name='reportjob_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.12 on 2026-10-17 05:02
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+
+def fill_updated_dates(apps, schema_editor):
+    Book = apps.get_model('main', 'Book')
+    Lease = apps.get_model('main', 'Lease')
+    alias = schema_editor.connection.alias
+    Book.objects.using(alias).update(updated_date=models.F('added_date'))
+    Lease.objects.using(alias).update(
+        updated_date=Coalesce('return_date', 'issue_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Updated date'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='lease',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Updated date'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['updated_date'], name='book_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lease',
+            index=models.Index(fields=['updated_date'], name='lease_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.1.12 on 2026-10-17 04:42
+
+from django.db import migrations
+import main.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_updated_date'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', main.models.UserManager()),
+            ],
+        ),
+    ]
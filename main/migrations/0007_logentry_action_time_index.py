@@ -0,0 +1,21 @@
+# Generated by Django 3.1.12 on 2026-10-17 06:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin', '0003_logentry_add_action_flag_choices'),
+        ('main', '0006_user_manager'),
+    ]
+
+    operations = [
+        # Keyset pagination of log list. LogEntry belongs to admin app,
+        # so index can not be declared in model Meta.
+        migrations.RunSQL(
+            'CREATE INDEX main_logentry_time_idx '
+            'ON django_admin_log (action_time DESC, id DESC)',
+            'DROP INDEX main_logentry_time_idx',
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.12 on 2026-10-17 06:40
+
+from django.db import migrations
+
+
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE main_book ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(authors, '')), 'B')"
+        ") STORED")
+    schema_editor.execute(
+        "CREATE INDEX main_book_search_idx ON main_book "
+        "USING GIN (search_vector)")
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("ALTER TABLE main_book DROP COLUMN search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_logentry_action_time_index'),
+    ]
+
+    operations = [
+        # Full-text search column exists only on PostgreSQL, so it is not
+        # declared in Book model. Generated column keeps it up to date
+        # on every insert and update, including bulk ones.
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.12 on 2026-10-17 07:05
+
+from django.db import migrations
+
+
+TRIGRAM_INDEXES = [
+    ('main_book_name_trgm_idx', 'main_book', 'name'),
+    ('main_book_authors_trgm_idx', 'main_book', 'authors'),
+    ('main_user_username_trgm_idx', 'main_user', 'username'),
+    ('main_user_first_name_trgm_idx', 'main_user', 'first_name'),
+    ('main_user_last_name_trgm_idx', 'main_user', 'last_name'),
+]
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX {} ON {} USING GIN ({} gin_trgm_ops)'.format(
+                name, table, column))
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute('DROP INDEX {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_book_search_vector'),
+    ]
+
+    operations = [
+        # Indexes for SEARCH_MODE = 'trigram'. Extension and operator
+        # classes exist only on PostgreSQL.
+        migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+    ]
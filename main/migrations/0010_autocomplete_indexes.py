@@ -0,0 +1,53 @@
+# Generated by Django 3.1.12 on 2026-10-17 09:12
+
+from django.db import migrations
+
+
+# Expressions compared by prefix in autocomplete, see main.search. On
+# PostgreSQL they are compared with "C" collation, which orders strings
+# by bytes like SQLite does, and ISBN needs separate index for it.
+AUTOCOMPLETE_INDEXES = [
+    ('main_book_name_lower_idx', 'main_book', 'lower(name)'),
+    ('main_user_username_lower_idx', 'main_user', 'lower(username)'),
+    ('main_user_last_name_lower_idx', 'main_user', 'lower(last_name)'),
+]
+
+POSTGRESQL_AUTOCOMPLETE_INDEXES = [
+    ('main_book_isbn_prefix_idx', 'main_book', 'isbn'),
+]
+
+
+def autocomplete_indexes(connection):
+    if connection.vendor == 'postgresql':
+        return [
+            (name, table, '{} COLLATE "C"'.format(expression))
+            for name, table, expression in (
+                AUTOCOMPLETE_INDEXES + POSTGRESQL_AUTOCOMPLETE_INDEXES)]
+    return AUTOCOMPLETE_INDEXES
+
+
+def add_autocomplete_indexes(apps, schema_editor):
+    for name, table, expression in autocomplete_indexes(
+            schema_editor.connection):
+        schema_editor.execute('CREATE INDEX {} ON {} (({}))'.format(
+            name, table, expression))
+
+
+def remove_autocomplete_indexes(apps, schema_editor):
+    for name, table, expression in autocomplete_indexes(
+            schema_editor.connection):
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_trigram_indexes'),
+    ]
+
+    operations = [
+        # Expression indexes are not supported by Meta.indexes before
+        # Django 3.2.
+        migrations.RunPython(
+            add_autocomplete_indexes, remove_autocomplete_indexes),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.12 on 2026-10-17 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='language',
+            field=models.CharField(blank=True, max_length=10, verbose_name='Language'),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='time_zone',
+            field=models.CharField(blank=True, max_length=63, verbose_name='Time zone'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.1.12 on 2026-10-17 06:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_reportjob_parameters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='added_date',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Added date'),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='authors',
+            field=models.CharField(max_length=255, verbose_name='Authors'),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='count',
+            field=models.PositiveSmallIntegerField(verbose_name='Count'),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='name',
+            field=models.CharField(max_length=255, verbose_name='Name'),
+        ),
+        migrations.AlterField(
+            model_name='lease',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='main.book', verbose_name='Book'),
+        ),
+        migrations.AlterField(
+            model_name='lease',
+            name='expire_date',
+            field=models.DateField(verbose_name='Expire date'),
+        ),
+        migrations.AlterField(
+            model_name='lease',
+            name='id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='lease',
+            name='issue_date',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Issue date'),
+        ),
+        migrations.AlterField(
+            model_name='lease',
+            name='return_date',
+            field=models.DateTimeField(null=True, verbose_name='Return date'),
+        ),
+        migrations.AlterField(
+            model_name='lease',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='Student'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True, verbose_name='Email'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.1.12 on 2026-10-17 11:40
+
+from importlib import import_module
+
+from django.db import migrations
+
+
+autocomplete_indexes = import_module(
+    'main.migrations.0010_autocomplete_indexes').autocomplete_indexes
+
+
+def recreate_autocomplete_indexes(apps, schema_editor):
+    # SQLite rebuilds tables on AlterField in 0012_verbose_names and
+    # drops expression indexes unknown to Django.
+    for name, table, expression in autocomplete_indexes(
+            schema_editor.connection):
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS {} ON {} (({}))'.format(
+                name, table, expression))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_verbose_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            recreate_autocomplete_indexes, migrations.RunPython.noop),
+    ]
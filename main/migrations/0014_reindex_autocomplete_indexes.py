@@ -0,0 +1,30 @@
+# Generated by Django 3.1.12 on 2026-10-17 12:25
+
+from importlib import import_module
+
+from django.db import migrations
+
+
+AUTOCOMPLETE_INDEXES = import_module(
+    'main.migrations.0010_autocomplete_indexes').AUTOCOMPLETE_INDEXES
+
+
+def reindex_autocomplete_indexes(apps, schema_editor):
+    # Indexes were built with built-in lower() of SQLite, which is
+    # replaced with Unicode-aware function by main.signals.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, table, expression in AUTOCOMPLETE_INDEXES:
+        schema_editor.execute('REINDEX {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_recreate_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            reindex_autocomplete_indexes, migrations.RunPython.noop),
+    ]
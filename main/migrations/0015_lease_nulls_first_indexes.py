@@ -0,0 +1,42 @@
+# Generated by Django 3.1.12 on 2026-10-17 13:10
+
+from django.db import migrations
+
+
+# Lease lists put active leases with NULL return date first. PostgreSQL
+# sorts NULL last in ascending indexes, so lease_student_return_idx and
+# lease_return_expire_idx serve this ordering on SQLite only.
+NULLS_FIRST_INDEXES = [
+    ('lease_student_return_nf_idx', 'main_lease',
+     'student_id, return_date NULLS FIRST, expire_date'),
+    ('lease_return_expire_nf_idx', 'main_lease',
+     'return_date NULLS FIRST, expire_date'),
+]
+
+
+def add_nulls_first_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, columns in NULLS_FIRST_INDEXES:
+        schema_editor.execute(
+            'CREATE INDEX {} ON {} ({})'.format(name, table, columns))
+
+
+def remove_nulls_first_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, columns in NULLS_FIRST_INDEXES:
+        schema_editor.execute('DROP INDEX {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_reindex_autocomplete_indexes'),
+    ]
+
+    operations = [
+        # NULLS FIRST is not supported by Meta.indexes before Django 3.2.
+        migrations.RunPython(
+            add_nulls_first_indexes, remove_nulls_first_indexes),
+    ]
@@ -22,32 +22,106 @@ import uuid
 from isbn_field import ISBNField
 from stdnum import isbn
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (
+    DEFERRED, Case, Exists, F, OuterRef, Value, When)
 from django.utils import timezone
 from django.utils.translation import gettext_lazy
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import (
+    AbstractUser, UserManager as DjangoUserManager)
+
+from .roles import cached_group_names
+
+
+class UserQuerySet(models.QuerySet):
+    """
+    Queryset of users.
+    """
+
+    def with_role(self):
+        """
+        Annotates users with role_value computed in database, so role of
+        every user is known without querying groups.
+        """
+        librarian = self.model.groups.through.objects.filter(
+            user=OuterRef('pk'), group__name='Librarian')
+        return self.annotate(role_value=Case(
+            When(is_staff=True, then=Value(User.Role.ADMINISTRATOR)),
+            When(Exists(librarian), then=Value(User.Role.LIBRARIAN)),
+            default=Value(User.Role.STUDENT),
+            output_field=models.CharField()))
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    """
+    Manager of users.
+    """
 
 
 class User(AbstractUser):
     """
     Custom user model for main app.
     """
+
+    class Role(models.TextChoices):
+        """
+        Roles of users.
+        """
+        ADMINISTRATOR = 'administrator', gettext_lazy("Administrator")
+        LIBRARIAN = 'librarian', gettext_lazy("Librarian")
+        STUDENT = 'student', gettext_lazy("Student")
+
     email = models.EmailField(unique=True, verbose_name=gettext_lazy("Email"))
 
+    objects = UserManager()
+
     def __str__(self):
         return "{} {} [{}]".format(
             self.first_name, self.last_name, self.username)
 
+    # Names of groups of user resolved during current request.
+    _group_names = None
+
+    def group_names(self):
+        """
+        Returns frozenset of names of groups of user. Names are resolved
+        once per instance and cached across requests.
+        """
+        if self.pk is None:
+            return frozenset()
+        if self._group_names is None:
+            self._group_names = cached_group_names(self)
+        return self._group_names
+
+    @property
+    def is_librarian(self):
+        """
+        Whether user is member of Librarian group.
+        """
+        return 'Librarian' in self.group_names()
+
+    @property
+    def is_student(self):
+        """
+        Whether user is member of Student group.
+        """
+        return 'Student' in self.group_names()
+
     def role(self):
         """
-        Returns role of user.
+        Returns role of user. Role annotated by UserQuerySet.with_role()
+        is used if present.
         """
-        if self.is_staff:
-            return gettext_lazy("Administrator")
-        if self.groups.filter(name='Librarian').exists():
-            return gettext_lazy("Librarian")
-        return gettext_lazy("Student")
+        role_value = self.__dict__.get('role_value')
+        if role_value is None:
+            if self.is_staff:
+                role_value = self.Role.ADMINISTRATOR
+            elif self.is_librarian:
+                role_value = self.Role.LIBRARIAN
+            else:
+                role_value = self.Role.STUDENT
+        return self.Role(role_value).label
 
 
 class Book(models.Model):
@@ -62,10 +136,49 @@ class Book(models.Model):
         auto_now_add=True, verbose_name=gettext_lazy("Added date"))
     count = models.PositiveSmallIntegerField(
         verbose_name=gettext_lazy("Count"))
+    leased_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=gettext_lazy("Leased count"))
+    updated_date = models.DateTimeField(
+        auto_now=True, verbose_name=gettext_lazy("Updated date"))
+
+    class Meta:
+        indexes = [
+            # Book list ordering.
+            models.Index(fields=['-added_date'], name='book_added_idx'),
+            # Latest active books on librarian page.
+            models.Index(
+                fields=['-added_date'], name='book_active_added_idx',
+                condition=models.Q(count__gt=0)),
+            # Incremental reports.
+            models.Index(fields=['updated_date'], name='book_updated_idx'),
+        ]
+
+    # ISBN of the row the book was loaded from or last saved to.
+    _loaded_isbn = None
 
     def __str__(self):
         return "{} [{}]".format(self.name, self.authors)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_isbn = instance.pk
+        return instance
+
+    def save(self, *args, **kwargs):  # pylint: disable=signature-differs
+        """
+        Saves book without overwriting leased_count, which is maintained
+        by Lease and may have changed since the book was loaded.
+        """
+        if (kwargs.get('update_fields') is None
+                and not self._state.adding
+                and self.pk == self._loaded_isbn):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'leased_count']
+        super().save(*args, **kwargs)
+        self._loaded_isbn = self.pk
+
     def formatted_isbn(self):
         """
         Returns ISBN in proper format woth dashes.
@@ -95,10 +208,7 @@ class Book(models.Model):
         """
         Returns count - leased books count.
         """
-        return max(
-            self.count
-            - self.lease_set.filter(return_date__isnull=True).count(),
-            0)
+        return max(self.count - self.leased_count, 0)
 
     def is_available(self):
         """
@@ -128,6 +238,109 @@ class Lease(models.Model):
     expire_date = models.DateField(verbose_name=gettext_lazy("Expire date"))
     return_date = models.DateTimeField(
         null=True, verbose_name=gettext_lazy("Return date"))
+    updated_date = models.DateTimeField(
+        auto_now=True, verbose_name=gettext_lazy("Updated date"))
+
+    class Meta:
+        indexes = [
+            # Student page and lease history of one student.
+            models.Index(
+                fields=['student', 'return_date', 'expire_date'],
+                name='lease_student_return_idx'),
+            # Lease list ordering.
+            models.Index(
+                fields=['return_date', 'expire_date'],
+                name='lease_return_expire_idx'),
+            # Nearest active leases on librarian page and active lease
+            # list.
+            models.Index(
+                fields=['expire_date'], name='lease_active_expire_idx',
+                condition=models.Q(return_date__isnull=True)),
+            # Report ordering.
+            models.Index(fields=['issue_date'], name='lease_issue_idx'),
+            # Incremental reports.
+            models.Index(fields=['updated_date'], name='lease_updated_idx'),
+        ]
+
+    # ISBN of the book whose leased_count currently includes this lease,
+    # or DEFERRED if lease was loaded without book or return date.
+    _counted_book_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'book_id' in field_names and 'return_date' in field_names:
+            instance._counted_book_id = instance._leased_book_id()
+        else:
+            instance._counted_book_id = DEFERRED
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        """
+        Reloads fields from database and syncs counted book if loaded book
+        or return date were reloaded. Loading deferred field keeps it.
+        """
+        counted_fields = {'book_id', 'return_date'}
+        reloaded = counted_fields - self.get_deferred_fields()
+        if fields is not None:
+            reloaded &= {
+                self._meta.get_field(field).attname for field in fields}
+        super().refresh_from_db(using, fields)
+        if reloaded:
+            if counted_fields & self.get_deferred_fields():
+                self._counted_book_id = DEFERRED
+            else:
+                self._counted_book_id = self._leased_book_id()
+
+    def save(self, *args, **kwargs):  # pylint: disable=signature-differs
+        """
+        Saves lease and keeps Book.leased_count of affected books in sync.
+        """
+        with transaction.atomic():
+            self._load_counted_book_id()
+            super().save(*args, **kwargs)
+            leased_book_id = self._leased_book_id()
+            if leased_book_id != self._counted_book_id:
+                self._update_leased_count(self._counted_book_id, -1)
+                self._update_leased_count(leased_book_id, 1)
+                self._counted_book_id = leased_book_id
+
+    def delete(self, *args, **kwargs):  # pylint: disable=signature-differs
+        """
+        Deletes lease and releases its book copy if lease is active.
+        """
+        with transaction.atomic():
+            self._load_counted_book_id()
+            self._update_leased_count(self._counted_book_id, -1)
+            self._counted_book_id = None
+            return super().delete(*args, **kwargs)
+
+    def _load_counted_book_id(self):
+        """
+        Reads book counted for lease from database if lease was loaded
+        without book or return date.
+        """
+        if self._counted_book_id is DEFERRED:
+            stored = Lease.objects.filter(pk=self.pk).values_list(
+                'book_id', 'return_date').first()
+            self._counted_book_id = (
+                stored[0] if stored and not stored[1] else None)
+
+    def _leased_book_id(self):
+        """
+        Returns ISBN of leased book if lease is active. Otherwise returns
+        None.
+        """
+        return self.book_id if self.is_active() else None
+
+    @staticmethod
+    def _update_leased_count(book_id, delta):
+        """
+        Atomically adds delta to leased_count of book with given ISBN.
+        """
+        if book_id is not None:
+            Book.objects.filter(pk=book_id).update(
+                leased_count=F('leased_count') + delta)
 
     def is_active(self):
         """
@@ -171,3 +384,65 @@ class Lease(models.Model):
         if self.is_expiring():
             return gettext_lazy("Expiring")
         return gettext_lazy("Active")
+
+
+class ReportJob(models.Model):
+    """
+    ReportJob model describes report generated in background by report
+    worker.
+    """
+
+    class Status(models.TextChoices):
+        """
+        Report job states.
+        """
+        PENDING = 'pending', gettext_lazy("Pending")
+        RUNNING = 'running', gettext_lazy("Running")
+        DONE = 'done', gettext_lazy("Done")
+        FAILED = 'failed', gettext_lazy("Failed")
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+        verbose_name=gettext_lazy("ID"))
+    requested_by = models.ForeignKey(
+        get_user_model(),
+        null=True,
+        on_delete=models.SET_NULL,
+        verbose_name=gettext_lazy("Requested by"))
+    report_format = models.CharField(
+        max_length=10, default='xlsx', verbose_name=gettext_lazy("Format"))
+    language = models.CharField(
+        max_length=10, blank=True, verbose_name=gettext_lazy("Language"))
+    time_zone = models.CharField(
+        max_length=63, blank=True, verbose_name=gettext_lazy("Time zone"))
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name=gettext_lazy("Status"))
+    created_date = models.DateTimeField(
+        auto_now_add=True, verbose_name=gettext_lazy("Created date"))
+    started_date = models.DateTimeField(
+        null=True, verbose_name=gettext_lazy("Started date"))
+    finished_date = models.DateTimeField(
+        null=True, verbose_name=gettext_lazy("Finished date"))
+    file_name = models.CharField(
+        max_length=255, blank=True, verbose_name=gettext_lazy("File name"))
+    error = models.TextField(blank=True, verbose_name=gettext_lazy("Error"))
+
+    class Meta:
+        indexes = [
+            # Worker queue and cached report lookup.
+            models.Index(
+                fields=['status', 'created_date'],
+                name='reportjob_status_created_idx'),
+        ]
+
+    def is_finished(self):
+        """
+        Returns True if report is generated or generation failed.
+        Otherwise returns False.
+        """
+        return self.status in (self.Status.DONE, self.Status.FAILED)
@@ -0,0 +1,385 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains keyset pagination of list views in main app.
+Pages are selected by comparing sort keys with keys of neighbouring
+page instead of OFFSET, so deep pages cost the same as the first one.
+"""
+
+import datetime
+import json
+import math
+import uuid
+from collections import namedtuple
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.functional import cached_property
+from django.utils.translation import gettext as _
+
+
+CURSOR_SALT = 'main.pagination.cursor'
+
+# Counts estimated below this number of rows are replaced with exact
+# count.
+EXACT_COUNT_THRESHOLD = 1000
+
+# Sort key of paginated queryset. NULL is less than any value, as in
+# SQLite default ordering, so active leases with NULL return date come
+# first on every database.
+Key = namedtuple('Key', ['name', 'attname', 'descending', 'field'])
+
+# Link to page. Link with number None is a gap between links.
+PageLink = namedtuple('PageLink', ['number', 'cursor', 'current'])
+
+
+class InvalidCursor(InvalidPage):
+    """
+    Raised when page cursor is malformed or tampered with.
+    """
+
+
+def estimated_count(queryset):
+    """
+    Returns number of rows of queryset. On PostgreSQL number is taken
+    from planner statistics, so large tables are not scanned. Small
+    estimates are replaced with exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            estimate = int(row[0]) if row else 0
+        else:
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+    if estimate < EXACT_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+def encode_value(value):
+    """
+    Converts key value to JSON compatible value.
+    """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+class KeysetPaginator:
+    """
+    Paginator that selects pages of queryset ordered by keys, given as
+    field names with optional "-" prefix. Keys must identify rows
+    uniquely, so primary key is usually the last one. Pages are
+    addressed with opaque signed cursors.
+    """
+
+    def __init__(self, queryset, keys, per_page, window=2):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.window = window
+        self.keys = [self.parse_key(key) for key in keys]
+
+    def parse_key(self, key):
+        """
+        Returns Key describing field name with optional "-" prefix.
+        """
+        name = key.lstrip('-')
+        meta = self.queryset.model._meta
+        try:
+            field = meta.pk if name == 'pk' else meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation.
+            field = None
+        if field is None:
+            attname = name
+        elif name == 'pk':
+            attname = 'pk'
+        else:
+            attname = field.attname
+        return Key(name, attname, key.startswith('-'), field)
+
+    @cached_property
+    def count(self):
+        """
+        Number of rows, estimated on PostgreSQL.
+        """
+        return estimated_count(self.queryset)
+
+    @cached_property
+    def num_pages(self):
+        """
+        Number of pages, estimated on PostgreSQL.
+        """
+        return max(math.ceil(self.count / self.per_page), 1)
+
+    def ordering(self, reverse=False):
+        """
+        Returns order_by() expressions of keys.
+        """
+        expressions = []
+        for key in self.keys:
+            expression = F(key.name)
+            descending = key.descending != reverse
+            if key.field is not None and key.field.null:
+                expression = (
+                    expression.desc(nulls_last=True) if descending
+                    else expression.asc(nulls_first=True))
+            else:
+                expression = (
+                    expression.desc() if descending else expression.asc())
+            expressions.append(expression)
+        return expressions
+
+    @staticmethod
+    def after(key, value, reverse):
+        """
+        Returns condition selecting rows following value of key, or None
+        if no rows follow it.
+        """
+        nullable = key.field is not None and key.field.null
+        if key.descending == reverse:
+            if value is None:
+                return Q(**{key.name + '__isnull': False})
+            return Q(**{key.name + '__gt': value})
+        if value is None:
+            return None
+        condition = Q(**{key.name + '__lt': value})
+        if nullable:
+            condition |= Q(**{key.name + '__isnull': True})
+        return condition
+
+    @staticmethod
+    def equal(key, value):
+        """
+        Returns condition selecting rows with given value of key.
+        """
+        if value is None:
+            return Q(**{key.name + '__isnull': True})
+        return Q(**{key.name: value})
+
+    def seek(self, values=None, reverse=False, inclusive=False):
+        """
+        Returns queryset ordered by keys with rows following row with
+        given key values. Row itself is included if inclusive is true.
+        """
+        queryset = self.queryset.order_by(*self.ordering(reverse))
+        if values is None:
+            return queryset
+        condition = None
+        prefix = Q()
+        for key, value in zip(self.keys, values):
+            after = self.after(key, value, reverse)
+            if after is not None:
+                term = prefix & after
+                condition = term if condition is None else condition | term
+            prefix &= self.equal(key, value)
+        if inclusive:
+            condition = prefix if condition is None else condition | prefix
+        if condition is None:
+            return queryset.none()
+        return queryset.filter(condition)
+
+    def key_rows(self, values, reverse, limit):
+        """
+        Returns list of key values of limit rows following row with given
+        key values.
+        """
+        return list(
+            self.seek(values, reverse)
+            .values_list(*[key.name for key in self.keys])[:limit])
+
+    def key_values(self, obj):
+        """
+        Returns key values of object.
+        """
+        return tuple(getattr(obj, key.attname) for key in self.keys)
+
+    def make_cursor(self, direction, values, number):
+        """
+        Returns cursor of page following ("after") or preceding
+        ("before") row with given key values.
+        """
+        return signing.dumps(
+            [direction, [encode_value(value) for value in values], number],
+            salt=CURSOR_SALT, compress=True)
+
+    def read_cursor(self, cursor):
+        """
+        Returns direction, key values and page number stored in cursor.
+        """
+        try:
+            direction, values, number = signing.loads(
+                cursor, salt=CURSOR_SALT)
+            if direction not in ('after', 'before'):
+                raise ValueError(direction)
+            if len(values) != len(self.keys):
+                raise ValueError(values)
+            number = int(number)
+            values = tuple(
+                key.field.to_python(value)
+                if key.field is not None and value is not None else value
+                for key, value in zip(self.keys, values))
+        except Exception:  # pylint: disable=broad-except
+            raise InvalidCursor(_("Invalid page cursor")) from None
+        return direction, values, number
+
+    def page(self, cursor=None):
+        """
+        Returns page addressed by cursor, or the first page.
+        """
+        direction, values, number = (
+            self.read_cursor(cursor) if cursor else ('after', None, 1))
+        if direction == 'before':
+            preceding = self.key_rows(values, True, self.per_page)
+            values = preceding[-1] if preceding else None
+            if len(preceding) < self.per_page:
+                values, number = None, 1
+            object_list = self.seek(values, inclusive=True)
+        else:
+            object_list = self.seek(values)
+        object_list = object_list[:self.per_page]
+        return KeysetPage(self, object_list, values is not None, number)
+
+
+class KeysetPage:
+    """
+    Page of KeysetPaginator with links to pages in window around it.
+    """
+
+    def __init__(self, paginator, object_list, may_have_previous, number):
+        self.paginator = paginator
+        self.object_list = object_list
+        rows = list(object_list)
+        per_page = paginator.per_page
+        limit = per_page * paginator.window + 1
+
+        following = []
+        if len(rows) == per_page:
+            following = paginator.key_rows(
+                paginator.key_values(rows[-1]), False, limit)
+        preceding = []
+        if rows and may_have_previous:
+            preceding = paginator.key_rows(
+                paginator.key_values(rows[0]), True, limit)
+        if not preceding:
+            number = 1
+        self.number = number
+
+        previous_links = []
+        boundary = paginator.key_values(rows[0]) if rows else None
+        for index in range(0, min(len(preceding), limit - 1), per_page):
+            page_number = max(number - index // per_page - 1, 1)
+            previous_links.insert(0, PageLink(
+                page_number,
+                paginator.make_cursor('before', boundary, page_number),
+                False))
+            boundary = preceding[min(index + per_page, len(preceding)) - 1]
+        next_links = []
+        boundary = paginator.key_values(rows[-1]) if rows else None
+        for index in range(0, min(len(following), limit - 1), per_page):
+            page_number = number + index // per_page + 1
+            next_links.append(PageLink(
+                page_number,
+                paginator.make_cursor('after', boundary, page_number),
+                False))
+            boundary = following[min(index + per_page, len(following)) - 1]
+
+        gap = PageLink(None, None, False)
+        self.links = (
+            ([gap] if len(preceding) >= limit else [])
+            + previous_links
+            + [PageLink(number, None, True)]
+            + next_links
+            + ([gap] if len(following) >= limit else []))
+        self.previous_cursor = (
+            previous_links[-1].cursor if previous_links else None)
+        self.next_cursor = next_links[0].cursor if next_links else None
+
+    def __repr__(self):
+        return '<Page {}>'.format(self.number)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        """
+        Whether previous page exists.
+        """
+        return self.previous_cursor is not None
+
+    def has_next(self):
+        """
+        Whether next page exists.
+        """
+        return self.next_cursor is not None
+
+    def has_other_pages(self):
+        """
+        Whether previous or next page exists.
+        """
+        return self.has_previous() or self.has_next()
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin for list views that paginates queryset with KeysetPaginator.
+    Keys are returned by get_keyset(queryset), page is addressed with "cursor"
+    GET parameter. Other GET parameters are kept in page links.
+    """
+    keyset = ('pk',)
+    page_window = 2
+
+    def get_keyset(self, queryset):
+        """
+        Returns keys queryset is ordered and paginated by.
+        """
+        return self.keyset
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset, self.get_keyset(queryset), page_size,
+            self.page_window)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor as error:
+            raise Http404(str(error)) from None
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.copy()
+        query.pop('cursor', None)
+        query.pop('page', None)
+        context['page_query'] = query.urlencode()
+        return context
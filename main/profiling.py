@@ -0,0 +1,172 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains per-request profiling used by
+RequestProfileMiddleware. Profile counts SQL queries and their time,
+keeps the slowest of them, and measures time of template rendering
+and audit log writes.
+"""
+
+import heapq
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.admin.models import LogEntry
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+
+# Profile of request handled in current thread or task, if it is
+# sampled.
+current_profile = ContextVar('current_profile', default=None)
+
+# Logged SQL is cut to this number of characters.
+MAX_SQL_LENGTH = 500
+
+# Statements writing audit log entries. Table name may be quoted.
+AUDIT_WRITE_RE = re.compile(
+    r'\s*(?:INSERT\s+INTO|UPDATE)\s+["`]?{}["`]?\s'.format(
+        re.escape(LogEntry._meta.db_table)),
+    re.IGNORECASE)
+
+
+class RequestProfile:
+    """
+    Collects timings of one request. Instance is used as execute wrapper
+    of database connections.
+    """
+
+    def __init__(self, slowest_queries=3):
+        self.start = time.perf_counter()
+        self.total = None
+        self.slowest_queries = slowest_queries
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.audit_count = 0
+        self.audit_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        # Min-heap of (duration, number, sql) of the slowest queries.
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add_query(sql, time.perf_counter() - start)
+
+    def add_query(self, sql, duration):
+        """
+        Records executed query. Inserts and updates of audit log table
+        are counted separately too.
+        """
+        self.sql_count += 1
+        self.sql_time += duration
+        if AUDIT_WRITE_RE.match(sql):
+            self.audit_count += 1
+            self.audit_time += duration
+        if self.slowest_queries > 0:
+            item = (duration, self.sql_count, sql[:MAX_SQL_LENGTH])
+            if len(self.queries) < self.slowest_queries:
+                heapq.heappush(self.queries, item)
+            else:
+                heapq.heappushpop(self.queries, item)
+
+    @contextmanager
+    def template(self):
+        """
+        Measures template rendering. Templates rendered while another
+        one is rendered are counted once.
+        """
+        self.template_depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.template_depth -= 1
+            if not self.template_depth:
+                self.template_time += time.perf_counter() - start
+
+    def finish(self):
+        """
+        Stops measuring total time of request.
+        """
+        self.total = time.perf_counter() - self.start
+
+    def server_timing(self):
+        """
+        Returns value of Server-Timing header with durations in
+        milliseconds.
+        """
+        metrics = ['sql;dur={:.1f};desc="{} queries"'.format(
+            self.sql_time * 1000, self.sql_count)]
+        if self.audit_count:
+            metrics.append('audit;dur={:.1f}'.format(self.audit_time * 1000))
+        metrics.append('template;dur={:.1f}'.format(
+            self.template_time * 1000))
+        metrics.append('total;dur={:.1f}'.format(self.total * 1000))
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        """
+        Returns profile as dictionary with durations in milliseconds,
+        the slowest queries first.
+        """
+        return {
+            'total_ms': round(self.total * 1000, 2),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'audit_count': self.audit_count,
+            'audit_ms': round(self.audit_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'slowest_queries': [
+                {'ms': round(duration * 1000, 2), 'sql': sql}
+                for duration, _, sql in sorted(self.queries, reverse=True)],
+        }
+
+
+class Template(django_backend.Template):
+    """
+    Django template which reports rendering time to profile of current
+    request.
+    """
+
+    def render(self, context=None, request=None):
+        profile = current_profile.get()
+        if profile is None:
+            return super().render(context, request)
+        with profile.template():
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    Django template backend whose templates are profiled. Without
+    RequestProfileMiddleware it behaves as the default backend.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
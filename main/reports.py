@@ -0,0 +1,198 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains background report generation in main app. Jobs
+are queued in database and processed by "manage.py run_report_worker".
+"""
+
+import logging
+import os
+
+from django.conf import settings
+from django.utils import timezone, translation
+
+from .models import ReportJob
+from .utils import build_xlsx
+
+
+logger = logging.getLogger(__name__)
+
+
+def report_root():
+    """
+    Returns directory where generated reports are stored.
+    """
+    return str(getattr(
+        settings, 'REPORT_ROOT',
+        os.path.join(str(getattr(settings, 'BASE_DIR')), 'reports')))
+
+
+def report_cache_ttl():
+    """
+    Returns time during which identical report requests reuse one job.
+    """
+    return timezone.timedelta(
+        seconds=getattr(settings, 'REPORT_CACHE_TTL', 600))
+
+
+def report_retention():
+    """
+    Returns time after which report jobs and their files are deleted.
+    """
+    return timezone.timedelta(
+        seconds=getattr(settings, 'REPORT_RETENTION', 24 * 3600))
+
+
+def report_job_timeout():
+    """
+    Returns time after which running job is considered abandoned by
+    crashed worker.
+    """
+    return timezone.timedelta(
+        seconds=getattr(settings, 'REPORT_JOB_TIMEOUT', 3600))
+
+
+def report_path(job):
+    """
+    Returns path of report file of job.
+    """
+    return os.path.join(report_root(), job.file_name)
+
+
+def report_parameters(report_format):
+    """
+    Returns all parameters report content depends on. Sheet names and
+    headers are translated and dates are written in local time, so
+    current language and time zone are included.
+    """
+    return {
+        'report_format': report_format,
+        'language': translation.get_language() or '',
+        'time_zone': timezone.get_current_timezone_name(),
+    }
+
+
+def fail_abandoned_jobs():
+    """
+    Marks jobs running longer than job timeout as failed, so that jobs
+    of crashed workers are not left running forever.
+    Returns number of failed jobs.
+    """
+    now = timezone.now()
+    return (
+        ReportJob.objects
+        .filter(
+            status=ReportJob.Status.RUNNING,
+            started_date__lt=now - report_job_timeout())
+        .update(
+            status=ReportJob.Status.FAILED,
+            finished_date=now,
+            error="Report worker did not finish job in time"))
+
+
+def request_report(user, report_format='xlsx'):
+    """
+    Returns job generating requested report. Recent job with the same
+    parameters is reused unless it failed or was abandoned by crashed
+    worker, otherwise new job is queued.
+    """
+    now = timezone.now()
+    parameters = report_parameters(report_format)
+    job = (
+        ReportJob.objects
+        .filter(created_date__gte=now - report_cache_ttl(), **parameters)
+        .exclude(status=ReportJob.Status.FAILED)
+        .exclude(
+            status=ReportJob.Status.RUNNING,
+            started_date__lt=now - report_job_timeout())
+        .order_by('-created_date')
+        .first())
+    if job is None:
+        job = ReportJob.objects.create(requested_by=user, **parameters)
+    return job
+
+
+def claim_next_job():
+    """
+    Marks oldest pending job as running and returns it. Returns None if
+    no jobs are pending. Job is claimed with conditional update, so
+    concurrent workers never process the same job. Jobs abandoned by
+    crashed workers are marked as failed first.
+    """
+    fail_abandoned_jobs()
+    while True:
+        job = (
+            ReportJob.objects.filter(status=ReportJob.Status.PENDING)
+            .order_by('created_date').first())
+        if job is None:
+            return None
+        claimed = (
+            ReportJob.objects
+            .filter(pk=job.pk, status=ReportJob.Status.PENDING)
+            .update(
+                status=ReportJob.Status.RUNNING,
+                started_date=timezone.now()))
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def write_report(report_format, path):
+    """
+    Writes report in given format to path.
+    """
+    if report_format != 'xlsx':
+        raise ValueError("Unknown report format {}".format(report_format))
+    build_xlsx().save(path)
+
+
+def run_job(job):
+    """
+    Generates report file of claimed job and stores result in job.
+    """
+    file_name = '{}.{}'.format(job.id, job.report_format)
+    path = os.path.join(report_root(), file_name)
+    os.makedirs(report_root(), exist_ok=True)
+    try:
+        with translation.override(job.language or settings.LANGUAGE_CODE), \
+                timezone.override(job.time_zone or None):
+            write_report(job.report_format, path + '.part')
+        os.replace(path + '.part', path)
+    except Exception as error:  # pylint: disable=broad-except
+        logger.exception("Report job %s failed", job.id)
+        job.status = ReportJob.Status.FAILED
+        job.error = str(error)
+    else:
+        job.status = ReportJob.Status.DONE
+        job.file_name = file_name
+    job.finished_date = timezone.now()
+    job.save()
+
+
+def purge_reports():
+    """
+    Deletes jobs older than retention period together with their files.
+    Returns number of deleted jobs.
+    """
+    expired_jobs = ReportJob.objects.filter(
+        created_date__lt=timezone.now() - report_retention())
+    for job in expired_jobs.exclude(file_name=''):
+        try:
+            os.remove(report_path(job))
+        except FileNotFoundError:
+            pass
+    return expired_jobs.delete()[0]
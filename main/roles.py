@@ -0,0 +1,96 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains cache of group membership of users. Group names
+are cached per user id, so authorization checks make no queries.
+"""
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+
+GROUP_CACHE_PREFIX = 'main:groups'
+
+# Greatest number of seconds group membership is cached for in
+# per-process cache, which is not invalidated by other processes.
+LOCAL_GROUP_CACHE_TIMEOUT = 5
+
+
+def group_cache_timeout():
+    """
+    Returns number of seconds group membership is cached for. Per-process
+    cache keeps membership changed by other processes, so its timeout is
+    limited to LOCAL_GROUP_CACHE_TIMEOUT.
+    """
+    timeout = getattr(settings, 'GROUP_CACHE_TIMEOUT', 300)
+    if isinstance(caches['default'], LocMemCache):
+        return min(timeout, LOCAL_GROUP_CACHE_TIMEOUT)
+    return timeout
+
+
+def group_cache_key(user_id):
+    """
+    Returns cache key of group names of user. Key contains current
+    version, so all keys are invalidated at once by forget_all_groups().
+    """
+    version = cache.get_or_set(
+        '{}:version'.format(GROUP_CACHE_PREFIX), 0, None)
+    return '{}:{}:{}'.format(GROUP_CACHE_PREFIX, version, user_id)
+
+
+def cached_group_names(user):
+    """
+    Returns frozenset of names of groups of user from cache, loading
+    them from database if necessary.
+    """
+    key = group_cache_key(user.pk)
+    group_names = cache.get(key)
+    if group_names is None:
+        group_names = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, group_names, group_cache_timeout())
+    return group_names
+
+
+def forget_groups(user_ids):
+    """
+    Removes cached group names of given users.
+    """
+    cache.delete_many([group_cache_key(user_id) for user_id in user_ids])
+
+
+def forget_all_groups():
+    """
+    Invalidates cached group names of all users.
+    """
+    key = '{}:version'.format(GROUP_CACHE_PREFIX)
+    cache.get_or_set(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def forget_now_and_on_commit(forget, *args, using=None):
+    """
+    Invalidates cached group names at once, so the current transaction
+    sees its changes, and again when it is committed, so names cached by
+    other requests before commit are dropped too.
+    """
+    forget(*args)
+    transaction.on_commit(lambda: forget(*args), using=using)
@@ -0,0 +1,285 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains catalogue search in main app. On PostgreSQL books
+are searched with full-text search over weighted search_vector column,
+or with pg_trgm word similarity if SEARCH_MODE setting is "trigram".
+Results are ranked by relevance. If SEARCH_MODE is "index", books are
+found by in-process inverted index on any database. Otherwise other
+databases fall back to icontains. Autocomplete finds books and students
+by prefix with expression indexes. On SQLite lower() is replaced with
+Unicode-aware function, see main.signals.
+"""
+
+import json
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Exists, FloatField, OuterRef, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Book
+from .search_index import search_book_index
+from .utils import parse_user_id
+
+
+# Text search configuration of search_vector column, see migration
+# 0008_book_search_vector.
+SEARCH_CONFIG = 'russian'
+
+# Name of relevance annotation of ranked search results.
+RANK_ANNOTATION = 'search_rank'
+
+# Columns searched by trigram similarity, see migration
+# 0009_trigram_indexes.
+BOOK_TRIGRAM_COLUMNS = (('main_book', 'name'), ('main_book', 'authors'))
+STUDENT_TRIGRAM_COLUMNS = (
+    ('main_user', 'username'), ('main_user', 'first_name'),
+    ('main_user', 'last_name'))
+
+
+# Name of extra select compared by prefix in autocomplete.
+AUTOCOMPLETE_KEY = 'autocomplete_key'
+
+# Default and maximum number of autocomplete suggestions.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Greatest code point, every string starting with prefix is less than
+# prefix followed by it in byte order.
+MAX_CHAR = '\U0010ffff'
+
+ISBN_PREFIX_RE = re.compile(r'[0-9X]+')
+
+
+def unicode_lower(value):
+    """
+    Returns value in lower case like lower() of PostgreSQL. Built-in
+    lower() of SQLite changes ASCII letters only.
+    """
+    if value is None or isinstance(value, bytes):
+        return value
+    return str(value).lower()
+
+
+def search_mode(queryset):
+    """
+    Returns search mode used for queryset: "index", "fulltext" or
+    "trigram" on PostgreSQL, "icontains" on other databases.
+    """
+    mode = getattr(settings, 'SEARCH_MODE', 'fulltext')
+    if mode == 'index' or connections[queryset.db].vendor == 'postgresql':
+        return mode
+    return 'icontains'
+
+
+def is_ranked(queryset):
+    """
+    Whether queryset is annotated with search relevance.
+    """
+    return RANK_ANNOTATION in queryset.query.annotations
+
+
+def ranked(queryset, where, rank, params):
+    """
+    Returns queryset filtered by SQL condition and annotated with rank.
+    Rank is compared exactly by keyset pagination, so it is cast to
+    double precision which survives round trip through page cursor.
+    """
+    return queryset.extra(where=[where], params=params).annotate(**{
+        RANK_ANNOTATION: RawSQL(
+            '({})::float8'.format(rank), params,
+            output_field=FloatField())})
+
+
+def full_text_search(queryset, query):
+    """
+    Returns books of queryset matching query by search_vector column
+    annotated with full-text rank. Matches use GIN index.
+    """
+    table = connections[queryset.db].ops.quote_name(
+        queryset.model._meta.db_table)
+    tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+    return ranked(
+        queryset,
+        '{}.search_vector @@ {}'.format(table, tsquery),
+        'ts_rank({}.search_vector, {})'.format(table, tsquery),
+        [SEARCH_CONFIG, query])
+
+
+def trigram_search(queryset, query, columns):
+    """
+    Returns rows of queryset with any of (table, column) pairs similar
+    to a word of query, annotated with best word similarity. Matches
+    use GIN trigram indexes, so misspelled names are found too.
+    """
+    quote_name = connections[queryset.db].ops.quote_name
+    columns = [
+        '{}.{}'.format(quote_name(table), quote_name(column))
+        for table, column in columns]
+    return ranked(
+        queryset,
+        ' OR '.join('%s <%% {}'.format(column) for column in columns),
+        'GREATEST({})'.format(', '.join(
+            'word_similarity(%s, {})'.format(column) for column in columns)),
+        [query] * len(columns))
+
+
+def index_search(queryset, query):
+    """
+    Returns books of queryset found by search index. On SQLite ISBNs
+    are passed as single JSON parameter, as number of query parameters
+    is limited.
+    """
+    isbns = sorted(search_book_index(queryset, query))
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite':
+        return queryset.filter(pk__in=isbns)
+    meta = queryset.model._meta
+    return queryset.extra(
+        where=['{}.{} IN (SELECT value FROM json_each(%s))'.format(
+            connection.ops.quote_name(meta.db_table),
+            connection.ops.quote_name(meta.pk.column))],
+        params=[json.dumps(isbns)])
+
+
+def book_filter(query):
+    """
+    Returns condition matching books with query in name or authors.
+    """
+    return Q(name__icontains=query) | Q(authors__icontains=query)
+
+
+def lease_filter(query):
+    """
+    Returns condition matching leases with query in student or book.
+    """
+    return (
+        Q(student__username__icontains=query)
+        | Q(student__first_name__icontains=query)
+        | Q(student__last_name__icontains=query)
+        | Q(book__name__icontains=query)
+        | Q(book__authors__icontains=query))
+
+
+def search_books(queryset, query):
+    """
+    Returns books of queryset with name or authors matching query.
+    """
+    mode = search_mode(queryset)
+    if mode == 'trigram':
+        return trigram_search(queryset, query, BOOK_TRIGRAM_COLUMNS)
+    if mode == 'fulltext':
+        return full_text_search(queryset, query)
+    if mode == 'index':
+        return index_search(queryset, query)
+    return queryset.filter(book_filter(query))
+
+
+def search_leases(queryset, query):
+    """
+    Returns leases of queryset with student or book matching query.
+    """
+    if search_mode(queryset) == 'trigram':
+        return trigram_search(
+            queryset.select_related('student', 'book'), query,
+            STUDENT_TRIGRAM_COLUMNS + BOOK_TRIGRAM_COLUMNS)
+    return queryset.filter(lease_filter(query))
+
+
+def prefix_search(queryset, expression, prefix):
+    """
+    Returns rows of queryset with SQL expression starting with prefix
+    ordered by expression. Prefix is compared by range in byte order,
+    so expression index from migration 0010_autocomplete_indexes is
+    used for both filtering and ordering.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        expression = '{} COLLATE "C"'.format(expression)
+    return queryset.extra(
+        select={AUTOCOMPLETE_KEY: expression},
+        where=['{0} >= %s AND {0} < %s'.format(expression)],
+        params=[prefix, prefix + MAX_CHAR],
+        order_by=[AUTOCOMPLETE_KEY])
+
+
+def autocomplete(queryset, searches, limit):
+    """
+    Returns up to limit rows of queryset found by (expression, prefix)
+    searches in order of their priority. Every search loads only rows
+    missing to the limit, so no more than limit rows are loaded.
+    """
+    results = []
+    for expression, prefix in searches:
+        missing = limit - len(results)
+        if missing <= 0:
+            break
+        results.extend(prefix_search(
+            queryset.exclude(pk__in=[row.pk for row in results]),
+            expression, prefix)[:missing])
+    return results
+
+
+def autocomplete_books(query, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Returns books with ISBN or name starting with query.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    quote_name = connections[Book.objects.db].ops.quote_name
+    searches = [('lower({}.{})'.format(
+        quote_name(Book._meta.db_table), quote_name('name')),
+        query.lower())]
+    isbn = query.replace('-', '').upper()
+    if ISBN_PREFIX_RE.fullmatch(isbn):
+        searches.insert(0, ('{}.{}'.format(
+            quote_name(Book._meta.db_table), quote_name('isbn')), isbn))
+    return autocomplete(
+        Book.objects.only('isbn', 'name', 'authors', 'count', 'leased_count'),
+        searches, limit)
+
+
+def autocomplete_students(query, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Returns students with id equal to query or username or last name
+    starting with query.
+    """
+    query = query.strip()
+    if not query:
+        return []
+    user_model = get_user_model()
+    # Membership is checked by subquery, so users are read in order of
+    # index instead of reading all members of group first.
+    students = user_model.objects.filter(Exists(
+        user_model.groups.through.objects.filter(
+            user=OuterRef('pk'), group__name='Student'))).only(
+                'username', 'first_name', 'last_name')
+    results = []
+    user_id = parse_user_id(query)
+    if user_id is not None:
+        results = list(students.filter(pk=user_id))
+    quote_name = connections[students.db].ops.quote_name
+    return results + autocomplete(
+        students.exclude(pk__in=[student.pk for student in results]),
+        [('lower({}.{})'.format(
+            quote_name(user_model._meta.db_table), quote_name(column)),
+          query.lower())
+         for column in ('username', 'last_name')],
+        limit - len(results))
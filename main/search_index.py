@@ -0,0 +1,384 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+This module contains in-process inverted index of books used for
+catalogue search if SEARCH_MODE setting is "index". Names and authors
+are split into case-folded words, and search finds books containing
+words starting with every word of query. Index is built lazily, kept
+up to date by signals of Book model and saved next to SQLite database,
+so restarted processes only load books changed since it was saved.
+"""
+
+import atexit
+import bisect
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.base.creation import TEST_DATABASE_PREFIX
+from django.db.models import Count, Max
+from django.utils.dateparse import parse_datetime
+
+from .models import Book
+
+
+logger = logging.getLogger(__name__)
+
+# Version of index file format, files of other versions are ignored.
+INDEX_FORMAT = 1
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Returns list of case-folded words of text.
+    """
+    return WORD_RE.findall(text.casefold())
+
+
+def index_path(using):
+    """
+    Returns path of index file: SEARCH_INDEX_PATH setting, or path of
+    SQLite database with ".search-index" suffix. Returns None if index
+    should not be saved, as for in-memory or test database without
+    SEARCH_INDEX_PATH.
+    """
+    path = getattr(settings, 'SEARCH_INDEX_PATH', None)
+    if path:
+        return str(path)
+    connection = connections[using]
+    name = str(connection.settings_dict['NAME'])
+    if (connection.vendor != 'sqlite' or connection.is_in_memory_db()
+            or os.path.basename(name).startswith(TEST_DATABASE_PREFIX)):
+        return None
+    return '{}.search-index'.format(name)
+
+
+class BookIndex:
+    """
+    Maps words to sets of ISBNs of books containing them. Sorted
+    vocabulary allows to find all words with given prefix by binary
+    search. Words and ISBNs are interned, so every string is stored
+    once however many books and words refer to it.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.postings = {}
+        self.documents = {}
+        self.vocabulary = []
+        self.watermark = None
+        self.using = None
+        # File index was loaded from or saved to on first use.
+        self.path = None
+        self.checked_at = None
+        self.dirty = False
+
+    @property
+    def loaded(self):
+        """
+        Whether index was built or loaded.
+        """
+        return self.checked_at is not None
+
+    @property
+    def refresh_interval(self):
+        """
+        Number of seconds after which index is checked against database.
+        """
+        return getattr(settings, 'SEARCH_INDEX_REFRESH', 60)
+
+    @property
+    def watermark_lag(self):
+        """
+        Number of seconds before watermark from which changed books are
+        read again on refresh.
+        """
+        return getattr(settings, 'SEARCH_INDEX_WATERMARK_LAG', 60)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def clear(self):
+        """
+        Removes all books from index.
+        """
+        with self.lock:
+            self.postings = {}
+            self.documents = {}
+            self.vocabulary = []
+            self.watermark = None
+            self.checked_at = None
+
+    def add(self, isbn, words):
+        """
+        Adds book with words to index, replacing its previous words.
+        """
+        isbn = sys.intern(isbn)
+        words = tuple(sorted({sys.intern(word) for word in words}))
+        with self.lock:
+            if self.documents.get(isbn) == words:
+                return
+            self.remove(isbn)
+            self.documents[isbn] = words
+            for word in words:
+                isbns = self.postings.get(word)
+                if isbns is None:
+                    isbns = self.postings[word] = set()
+                    if self.vocabulary is not None:
+                        bisect.insort(self.vocabulary, word)
+                isbns.add(isbn)
+            self.dirty = True
+
+    def add_book(self, isbn, name, authors):
+        """
+        Adds book with name and authors to index.
+        """
+        self.add(isbn, tokenize(name) + tokenize(authors))
+
+    def remove(self, isbn):
+        """
+        Removes book from index.
+        """
+        with self.lock:
+            words = self.documents.pop(isbn, ())
+            for word in words:
+                isbns = self.postings[word]
+                isbns.discard(isbn)
+                if not isbns:
+                    del self.postings[word]
+                    if self.vocabulary is not None:
+                        del self.vocabulary[
+                            bisect.bisect_left(self.vocabulary, word)]
+            if words:
+                self.dirty = True
+
+    def words(self, prefix):
+        """
+        Yields words of index starting with prefix in sorted order.
+        """
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for word in self.vocabulary[start:]:
+            if not word.startswith(prefix):
+                break
+            yield word
+
+    def prefix_matches(self, prefix):
+        """
+        Returns set of ISBNs of books with words starting with prefix.
+        """
+        matches = set()
+        for word in self.words(prefix):
+            matches |= self.postings[word]
+        return matches
+
+    def search(self, query):
+        """
+        Returns set of ISBNs of books with words starting with every
+        word of query. Longest prefixes are intersected first, as they
+        usually match fewer books.
+        """
+        prefixes = sorted(set(tokenize(query)), key=len, reverse=True)
+        if not prefixes:
+            return set()
+        with self.lock:
+            matches = self.prefix_matches(prefixes[0])
+            for prefix in prefixes[1:]:
+                if not matches:
+                    break
+                matches &= self.prefix_matches(prefix)
+        return matches
+
+    def footprint(self):
+        """
+        Returns approximate number of bytes taken by index.
+        """
+        with self.lock:
+            size = sum(map(sys.getsizeof, (
+                self.postings, self.documents, self.vocabulary)))
+            for word, isbns in self.postings.items():
+                size += sys.getsizeof(word) + sys.getsizeof(isbns)
+            for isbn, words in self.documents.items():
+                size += sys.getsizeof(isbn) + sys.getsizeof(words)
+        return size
+
+    def build(self, using):
+        """
+        Indexes all books of database.
+        """
+        with self.lock:
+            self.clear()
+            # Vocabulary is sorted once instead of on every new word.
+            self.vocabulary = None
+            stats = Book.objects.using(using).aggregate(
+                watermark=Max('updated_date'))
+            books = Book.objects.using(using).order_by().values_list(
+                'isbn', 'name', 'authors')
+            for isbn, name, authors in books.iterator():
+                self.add_book(isbn, name, authors)
+            self.vocabulary = sorted(self.postings)
+            self.watermark = stats['watermark']
+            self.using = using
+            self.checked_at = time.monotonic()
+            self.dirty = True
+
+    def refresh(self):
+        """
+        Indexes books changed since index was built, including changes
+        made by other processes. Update date is set before transaction
+        commits, so books changed within SEARCH_INDEX_WATERMARK_LAG
+        seconds before watermark are read again, and unchanged ones are
+        skipped by add(). Index is rebuilt if number of books differs
+        from database, as deleted books leave no trace.
+        """
+        with self.lock:
+            books = Book.objects.using(self.using).order_by()
+            stats = books.aggregate(
+                count=Count('pk'), watermark=Max('updated_date'))
+            if self.watermark is not None:
+                books = books.filter(updated_date__gt=(
+                    self.watermark - timedelta(seconds=self.watermark_lag)))
+            for isbn, name, authors in books.values_list(
+                    'isbn', 'name', 'authors').iterator():
+                self.add_book(isbn, name, authors)
+            if len(self) != stats['count']:
+                self.build(self.using)
+                return
+            self.watermark = stats['watermark']
+            self.checked_at = time.monotonic()
+
+    def ensure_fresh(self, using):
+        """
+        Loads or builds index on first use and refreshes it when
+        SEARCH_INDEX_REFRESH seconds passed since last check.
+        """
+        with self.lock:
+            if self.loaded and self.using == using:
+                if time.monotonic() - self.checked_at >= \
+                        self.refresh_interval:
+                    self.refresh()
+                return
+            path = self.path = index_path(using)
+            if path and self.load(path):
+                self.using = using
+                self.refresh()
+            else:
+                self.build(using)
+            if path and self.dirty:
+                self.save(path)
+
+    def save(self, path):
+        """
+        Writes words of books to compressed file, replacing it
+        atomically. Postings are derived from words when file is loaded.
+        """
+        with self.lock:
+            data = {
+                'format': INDEX_FORMAT,
+                'watermark': (
+                    self.watermark.isoformat() if self.watermark else None),
+                'books': [
+                    [isbn, ' '.join(words)]
+                    for isbn, words in self.documents.items()],
+            }
+            self.dirty = False
+        temp_path = '{}.tmp'.format(path)
+        with open(temp_path, 'wb') as file:
+            file.write(zlib.compress(
+                json.dumps(data, separators=(',', ':')).encode()))
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """
+        Reads index from file written by save(). Returns whether index
+        was loaded.
+        """
+        try:
+            with open(path, 'rb') as file:
+                data = json.loads(zlib.decompress(file.read()))
+        except (OSError, ValueError, zlib.error):
+            return False
+        if data.get('format') != INDEX_FORMAT:
+            return False
+        with self.lock:
+            self.clear()
+            self.vocabulary = None
+            for isbn, words in data['books']:
+                self.add(isbn, words.split())
+            self.vocabulary = sorted(self.postings)
+            self.watermark = (
+                parse_datetime(data['watermark'])
+                if data['watermark'] else None)
+            self.checked_at = time.monotonic()
+            self.dirty = False
+        return True
+
+
+book_index = BookIndex()
+
+
+@atexit.register
+def save_at_exit():
+    """
+    Saves index changed by signals when process shuts down. Index is
+    saved only to file it was loaded from, since settings of database may
+    have changed since then, as after tests.
+    """
+    if not book_index.dirty or not book_index.loaded:
+        return
+    path = book_index.path
+    if path:
+        try:
+            book_index.save(path)
+        except OSError:
+            logger.exception("Could not save search index to %s", path)
+
+
+def index_book(book):
+    """
+    Updates words of saved book in index if index is loaded. Unloaded
+    index reads book from database when it is built.
+    """
+    if book_index.loaded:
+        book_index.add_book(book.isbn, book.name, book.authors)
+
+
+def unindex_book(book):
+    """
+    Removes deleted book from index.
+    """
+    if book_index.loaded:
+        book_index.remove(book.isbn)
+
+
+def search_book_index(queryset, query):
+    """
+    Returns set of ISBNs of books matching query, loading index from
+    database of queryset if necessary.
+    """
+    book_index.ensure_fresh(queryset.db)
+    return book_index.search(query)
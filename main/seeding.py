@@ -0,0 +1,267 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains generator of synthetic library data used for
+performance testing.
+"""
+
+import random
+import uuid
+from contextlib import contextmanager
+
+import stdnum.ean
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Book, Lease
+from .roles import forget_all_groups, forget_now_and_on_commit
+
+
+SEED_PREFIX = 'seed_'
+
+# Share of leases which are already returned.
+RETURNED_SHARE = 0.85
+
+# Share of active leases which are expired.
+EXPIRED_SHARE = 0.25
+
+WORDS = [
+    'Ancient', 'Art', 'Basics', 'City', 'Dark', 'Data', 'Design', 'Dream',
+    'Empire', 'Energy', 'Garden', 'Guide', 'History', 'House', 'Islands',
+    'Journey', 'Language', 'Light', 'Machine', 'Modern', 'Mountain',
+    'Music', 'Night', 'Ocean', 'Origins', 'Physics', 'Poems', 'River',
+    'Secret', 'Silent', 'Stars', 'Stories', 'Systems', 'Theory', 'Time',
+    'War', 'Winter', 'World',
+]
+
+FIRST_NAMES = [
+    'Alexander', 'Anna', 'Boris', 'Daria', 'Dmitry', 'Elena', 'Ivan',
+    'Irina', 'Maria', 'Mikhail', 'Natalia', 'Nikolai', 'Olga', 'Pavel',
+    'Sergey', 'Sofia', 'Tatiana', 'Timur', 'Vera', 'Yuri',
+]
+
+LAST_NAMES = [
+    'Allayarov', 'Belov', 'Egorova', 'Fedorov', 'Ivanova', 'Kozlov',
+    'Lebedeva', 'Morozov', 'Novikova', 'Orlov', 'Pavlova', 'Petrov',
+    'Shmaykhel', 'Smirnova', 'Sokolov', 'Solovyov', 'Volkova', 'Zaitsev',
+]
+
+
+def isbn13(number):
+    """
+    Returns valid ISBN-13 with 978 prefix for given number.
+    """
+    digits = '9781{:08d}'.format(number)
+    return digits + stdnum.ean.calc_check_digit(digits)
+
+
+def reference_time(date=None):
+    """
+    Returns midnight of given date, or of current date, which seeded
+    dates are relative to.
+    """
+    date = date or timezone.localdate()
+    return timezone.make_aware(
+        timezone.datetime(date.year, date.month, date.day))
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """
+    Allows to set values of auto_now and auto_now_add fields explicitly.
+    """
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def batched(objects, batch_size):
+    """
+    Splits iterable into lists of batch_size objects.
+    """
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class LibrarySeeder:
+    """
+    Generates books, students, librarians and leases. Generated data
+    depends only on seed, requested sizes and reference date, except for
+    user ids assigned by database. Leases refer to the same seeded users
+    whatever their ids are.
+    """
+
+    def __init__(self, seed=0, batch_size=5000, password='seedpass',
+                 reference_date=None):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.password_hash = make_password(password, salt='seed')
+        self.now = reference_time(reference_date)
+
+    def seed(self, books, students, leases, librarians=1):
+        """
+        Generates data and inserts it with bulk_create in one
+        transaction. Returns dictionary with counts of created objects.
+        """
+        with transaction.atomic():
+            book_stock = self.create_books(books)
+            student_ids = self.create_users('student', 'Student', students)
+            self.create_users('librarian', 'Librarian', librarians)
+            created_leases = self.create_leases(
+                book_stock, student_ids, leases)
+            call_command('rebuild_leased_counts', verbosity=0)
+        return {
+            'books': len(book_stock),
+            'students': len(student_ids),
+            'librarians': librarians,
+            'leases': created_leases,
+        }
+
+    def random_date(self, max_days):
+        """
+        Returns random datetime within max_days before now.
+        """
+        return self.now - timezone.timedelta(
+            seconds=self.random.randrange(max_days * 24 * 3600))
+
+    def create_books(self, count):
+        """
+        Creates books and returns list of (isbn, count) pairs.
+        """
+        def generate():
+            for number in range(count):
+                added_date = self.random_date(5 * 365)
+                yield Book(
+                    isbn=isbn13(number),
+                    name=' '.join(self.random.sample(
+                        WORDS, self.random.randint(1, 4))),
+                    authors='{} {}'.format(
+                        self.random.choice(FIRST_NAMES),
+                        self.random.choice(LAST_NAMES)),
+                    added_date=added_date,
+                    updated_date=added_date,
+                    count=self.random.randint(1, 10))
+
+        stock = []
+        with explicit_dates(Book._meta.get_field('added_date'),
+                            Book._meta.get_field('updated_date')):
+            for batch in batched(generate(), self.batch_size):
+                Book.objects.bulk_create(batch)
+                stock.extend((book.isbn, book.count) for book in batch)
+        return stock
+
+    def create_users(self, role, group_name, count):
+        """
+        Creates users named seed_<role>_<number> in given group and
+        returns their ids ordered by number.
+        """
+        user_model = get_user_model()
+        prefix = '{}{}_'.format(SEED_PREFIX, role)
+
+        def generate():
+            for number in range(count):
+                username = '{}{}'.format(prefix, number)
+                yield user_model(
+                    username=username,
+                    email='{}@example.com'.format(username),
+                    first_name=self.random.choice(FIRST_NAMES),
+                    last_name=self.random.choice(LAST_NAMES),
+                    password=self.password_hash,
+                    date_joined=self.random_date(5 * 365))
+
+        for batch in batched(generate(), self.batch_size):
+            user_model.objects.bulk_create(batch)
+
+        users = (
+            user_model.objects.filter(username__startswith=prefix)
+            .values_list('username', 'pk'))
+        user_ids = [pk for username, pk in sorted(
+            users, key=lambda user: int(user[0][len(prefix):]))]
+        group = Group.objects.get_or_create(name=group_name)[0]
+        membership = user_model.groups.through
+        for batch in batched(user_ids, self.batch_size):
+            membership.objects.bulk_create([
+                membership(user_id=user_id, group_id=group.pk)
+                for user_id in batch])
+        # Bulk inserts send no signals, so cached membership is stale.
+        forget_now_and_on_commit(forget_all_groups)
+        return user_ids
+
+    def create_leases(self, book_stock, student_ids, count):
+        """
+        Creates leases with realistic share of returned, active and
+        expired leases. Books never get more active leases than copies.
+        Returns number of created leases.
+        """
+        if not book_stock or not student_ids:
+            return 0
+        active = [0] * len(book_stock)
+
+        def generate():
+            for _ in range(count):
+                book_index = self.random.randrange(len(book_stock))
+                isbn, copies = book_stock[book_index]
+                returned = (
+                    self.random.random() < RETURNED_SHARE
+                    or active[book_index] >= copies)
+                term = timezone.timedelta(days=self.random.randint(14, 60))
+                if returned:
+                    issue_date = self.random_date(3 * 365)
+                    return_date = min(
+                        issue_date + term * self.random.uniform(0.1, 1.3),
+                        self.now)
+                else:
+                    active[book_index] += 1
+                    if self.random.random() < EXPIRED_SHARE:
+                        issue_date = self.now - term - timezone.timedelta(
+                            days=self.random.randint(1, 90))
+                    else:
+                        issue_date = self.now - term * self.random.random()
+                    return_date = None
+                yield Lease(
+                    id=uuid.UUID(int=self.random.getrandbits(128), version=4),
+                    student_id=self.random.choice(student_ids),
+                    book_id=isbn,
+                    issue_date=issue_date,
+                    expire_date=(issue_date + term).date(),
+                    return_date=return_date,
+                    updated_date=return_date or issue_date)
+
+        created = 0
+        with explicit_dates(Lease._meta.get_field('issue_date'),
+                            Lease._meta.get_field('updated_date')):
+            for batch in batched(generate(), self.batch_size):
+                Lease.objects.bulk_create(batch)
+                created += len(batch)
+        return created
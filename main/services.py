@@ -0,0 +1,189 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains services which change library state in main app.
+"""
+
+import uuid
+from collections import Counter, defaultdict, namedtuple
+
+import stdnum.isbn
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Book, Lease
+
+
+# Statuses of codes passed to return_leases().
+RETURNED = 'returned'
+ALREADY_RETURNED = 'already_returned'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+ReturnResult = namedtuple('ReturnResult', ['code', 'status', 'lease'])
+
+
+class BookNotAvailableError(Exception):
+    """
+    Raised when book has no copies available for leasing. Arguments are
+    ISBNs of unavailable books.
+    """
+
+
+def issue_lease(student, book, expire_date):
+    """
+    Leases book to student and returns new lease. Availability check and
+    lease insert run in one transaction with book row locked, so the
+    last copy can not be issued twice. Raises BookNotAvailableError if
+    no copies are available.
+    """
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(pk=book.pk)
+        if not book.is_available():
+            raise BookNotAvailableError(book.pk)
+        return Lease.objects.create(
+            student=student, book=book, expire_date=expire_date)
+
+
+def change_leased_counts(deltas):
+    """
+    Adds deltas mapped by ISBN to leased counters of books. Books with
+    equal deltas are updated by one query.
+    """
+    isbns_by_delta = defaultdict(list)
+    for isbn, delta in deltas.items():
+        isbns_by_delta[delta].append(isbn)
+    for delta, isbns in isbns_by_delta.items():
+        Book.objects.filter(pk__in=isbns).update(
+            leased_count=F('leased_count') + delta)
+
+
+def issue_leases(students, books, expire_date):
+    """
+    Leases every book to every student and returns new leases. Either
+    students or books must contain one item: class set is one book for
+    many students, or many books for one student. Books are locked and
+    their availability is checked once, leases are inserted by one query
+    and leased counters are updated by one query per number of copies.
+    Raises BookNotAvailableError with ISBNs of books without enough
+    copies, and nothing is issued then.
+    """
+    if len(students) != 1 and len(books) != 1:
+        raise ValueError("Either one student or one book is expected")
+    leases = [
+        Lease(student=student, book=book, expire_date=expire_date)
+        for student in students for book in books]
+    requested = Counter(lease.book_id for lease in leases)
+    with transaction.atomic():
+        # Rows are locked in the same order, so concurrent batches can
+        # not deadlock.
+        locked = (
+            Book.objects.select_for_update()
+            .filter(pk__in=requested).order_by('pk'))
+        available = {book.pk: book.available_count() for book in locked}
+        unavailable = sorted(
+            isbn for isbn, copies in requested.items()
+            if available.get(isbn, 0) < copies)
+        if unavailable:
+            raise BookNotAvailableError(*unavailable)
+
+        Lease.objects.bulk_create(leases)
+        change_leased_counts(requested)
+    for lease in leases:
+        # bulk_create() bypasses Lease.save() which counts leases, so
+        # counters were updated above.
+        # pylint: disable=protected-access
+        lease._counted_book_id = lease.book_id
+    return leases
+
+
+def parse_return_code(code):
+    """
+    Returns ("id", UUID) for lease ID, ("isbn", ISBN-13) for valid ISBN,
+    or (None, None) for anything else.
+    """
+    try:
+        return 'id', uuid.UUID(code)
+    except ValueError:
+        pass
+    if stdnum.isbn.is_valid(code):
+        return 'isbn', stdnum.isbn.to_isbn13(stdnum.isbn.compact(code))
+    return None, None
+
+
+def return_leases(codes, student=None):
+    """
+    Returns leases given by scanned lease IDs or ISBNs and returns list
+    of ReturnResult in order of codes. ISBN returns the active lease of
+    the book which expires first, of given student if any. Leases are
+    found by one query, returned by one update, and leased counters are
+    updated by one query per number of returned copies.
+    """
+    parsed = [(code,) + parse_return_code(code) for code in codes]
+    lease_ids = {value for code, kind, value in parsed if kind == 'id'}
+    isbns = {value for code, kind, value in parsed if kind == 'isbn'}
+    by_isbn = Q(book__in=isbns, return_date__isnull=True)
+    if student is not None:
+        by_isbn &= Q(student=student)
+
+    results = []
+    returned = []
+    with transaction.atomic():
+        leases = list(
+            Lease.objects.select_for_update()
+            .filter(Q(pk__in=lease_ids) | by_isbn)
+            .order_by('expire_date', 'issue_date'))
+        leases_by_id = {lease.pk: lease for lease in leases}
+        leases_by_isbn = defaultdict(list)
+        for lease in leases:
+            if lease.book_id in isbns and lease.is_active():
+                leases_by_isbn[lease.book_id].append(lease)
+
+        now = timezone.now()
+        for code, kind, value in parsed:
+            if kind == 'id':
+                lease = leases_by_id.get(value)
+            elif kind == 'isbn':
+                lease = next(
+                    (lease for lease in leases_by_isbn[value]
+                     if lease.is_active()), None)
+            else:
+                results.append(ReturnResult(code, INVALID, None))
+                continue
+            if lease is None:
+                results.append(ReturnResult(code, NOT_FOUND, None))
+            elif not lease.is_active():
+                results.append(ReturnResult(code, ALREADY_RETURNED, lease))
+            else:
+                lease.return_date = lease.updated_date = now
+                returned.append(lease)
+                results.append(ReturnResult(code, RETURNED, lease))
+
+        if returned:
+            Lease.objects.filter(
+                pk__in=[lease.pk for lease in returned]).update(
+                    return_date=now, updated_date=now)
+            change_leased_counts({
+                isbn: -copies for isbn, copies in Counter(
+                    lease.book_id for lease in returned).items()})
+    for lease in returned:
+        # update() bypasses Lease.save(), so counters were updated above.
+        # pylint: disable=protected-access
+        lease._counted_book_id = None
+    return results
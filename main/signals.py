@@ -0,0 +1,102 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains signal receivers of main app.
+"""
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from .models import Book
+from .roles import (
+    forget_all_groups, forget_groups, forget_now_and_on_commit)
+from .search import unicode_lower
+from .search_index import index_book, unindex_book
+
+
+@receiver(connection_created)
+def register_unicode_lower(sender, connection, **kwargs):
+    """
+    Replaces lower() of SQLite connection with Unicode-aware function, so
+    autocomplete matches non-ASCII names regardless of case. Function
+    is deterministic, as it is used by expression indexes.
+    """
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'lower', 1, unicode_lower, deterministic=True)
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, using,
+                        **kwargs):
+    """
+    Invalidates cached group names when group membership changes.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance._group_names = None
+        forget_now_and_on_commit(forget_groups, [instance.pk], using=using)
+    elif pk_set is None:
+        # Members of cleared group are unknown at this point.
+        forget_now_and_on_commit(forget_all_groups, using=using)
+    else:
+        forget_now_and_on_commit(forget_groups, pk_set, using=using)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, using, created=True, **kwargs):
+    """
+    Invalidates cached group names of new or deleted user, so reused id
+    does not inherit stale membership.
+    """
+    if created:
+        forget_now_and_on_commit(forget_groups, [instance.pk], using=using)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, using, created=False, **kwargs):
+    """
+    Invalidates cached group names of all users when group is renamed or
+    deleted.
+    """
+    if not created:
+        forget_now_and_on_commit(forget_all_groups, using=using)
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, using, **kwargs):
+    """
+    Updates words of saved book in search index when transaction is
+    committed, so rolled back changes do not reach the index.
+    """
+    transaction.on_commit(lambda: index_book(instance), using=using)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, using, **kwargs):
+    """
+    Removes deleted book from search index when transaction is
+    committed.
+    """
+    transaction.on_commit(lambda: unindex_book(instance), using=using)
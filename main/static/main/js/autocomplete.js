@@ -0,0 +1,38 @@
+// Fills datalist of inputs with data-autocomplete-url attribute with
+// suggestions returned by autocomplete view while user types. Option
+// value is result field named by data-autocomplete-value attribute and
+// label joins fields listed in data-autocomplete-label attribute.
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('input[data-autocomplete-url]').forEach(
+        function (input) {
+            var datalist = document.getElementById(input.getAttribute('list'));
+            var valueField = input.dataset.autocompleteValue || 'id';
+            var labelFields = (input.dataset.autocompleteLabel || '')
+                .split(' ').filter(Boolean);
+            var timer = null;
+            input.addEventListener('input', function () {
+                clearTimeout(timer);
+                timer = setTimeout(function () {
+                    var query = input.value.trim();
+                    if (!query) {
+                        return;
+                    }
+                    var url = input.dataset.autocompleteUrl + '?q=' +
+                        encodeURIComponent(query);
+                    fetch(url, {credentials: 'same-origin'})
+                        .then(function (response) { return response.json(); })
+                        .then(function (data) {
+                            datalist.innerHTML = '';
+                            data.results.forEach(function (result) {
+                                var option = document.createElement('option');
+                                option.value = result[valueField];
+                                option.label = labelFields.map(
+                                    function (field) { return result[field]; }
+                                ).join(' — ');
+                                datalist.appendChild(option);
+                            });
+                        });
+                }, 200);
+            });
+        });
+});
@@ -0,0 +1,185 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains tests of audit logging in main app.
+"""
+
+from unittest import mock
+
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.admin.models import LogEntry, ADDITION, CHANGE
+from django.contrib.contenttypes.models import ContentType
+
+from main.audit import audit, audit_buffer, audit_many, current_entries
+from main.models import Book
+
+from .utils import create_librarian_user, librarian_credentials
+
+
+class AuditTests(TestCase):
+    """
+    Tests checking audit() function.
+    """
+
+    def setUp(self):
+        self.user = create_librarian_user()
+        self.book = Book.objects.create(
+            isbn='9780000000002', name='Test Book', authors='Author',
+            count=1)
+
+    def test_audit_writes_log_entry(self):
+        """
+        Log entry describes user, object and action.
+        """
+        audit(self.user, self.book, ADDITION, "New book")
+        entry = LogEntry.objects.get()
+        self.assertEqual(entry.user, self.user)
+        self.assertEqual(
+            entry.content_type, ContentType.objects.get_for_model(Book))
+        self.assertEqual(entry.object_id, self.book.isbn)
+        self.assertEqual(entry.action_flag, ADDITION)
+        self.assertEqual(entry.change_message, "New book")
+
+    def test_audit_caches_content_type(self):
+        """
+        Content type is looked up once, later entries cost one query.
+        """
+        audit(self.user, self.book, ADDITION, "New book")
+        with self.assertNumQueries(1):
+            audit(self.user, self.book, CHANGE, "Book edited")
+
+    def test_audit_many_inserts_entries_at_once(self):
+        """
+        Entries about many objects are inserted by one query.
+        """
+        other_book = Book.objects.create(
+            isbn='9780000000019', name='Test Book 2', authors='Author',
+            count=1)
+        audit(self.user, self.book, ADDITION, "New book")
+        with self.assertNumQueries(1):
+            audit_many(self.user, [self.book, other_book], CHANGE, "Edit")
+        self.assertEqual(
+            set(LogEntry.objects.filter(change_message="Edit").values_list(
+                'object_id', flat=True)),
+            {self.book.isbn, other_book.isbn})
+
+
+def insert_count(queries):
+    """
+    Returns number of INSERT queries captured by queries context.
+    """
+    return sum(
+        query['sql'].startswith('INSERT')
+        for query in queries.captured_queries)
+
+
+@override_settings(AUDIT_BUFFERED=True, AUDIT_BUFFER_SIZE=3)
+class BufferedAuditTests(TransactionTestCase):
+    """
+    Tests checking buffered audit logging. Entries are collected when
+    transaction is committed, so changes are really committed.
+    """
+
+    def setUp(self):
+        self.user = create_librarian_user()
+        self.book = Book.objects.create(
+            isbn='9780000000002', name='Test Book', authors='Author',
+            count=1)
+        self.token = audit_buffer.start()
+        self.addCleanup(current_entries.set, None)
+
+    def audit_times(self, count):
+        """
+        Writes given number of log entries.
+        """
+        for number in range(count):
+            audit(self.user, self.book, CHANGE, "Edit {}".format(number))
+
+    def test_buffered_audit_flushes_on_size(self):
+        """
+        Entries are inserted at once when buffer size is reached.
+        """
+        self.audit_times(2)
+        self.assertEqual(LogEntry.objects.count(), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.audit_times(1)
+        self.assertEqual(insert_count(queries), 1)
+        self.assertEqual(LogEntry.objects.count(), 3)
+        self.assertEqual(len(audit_buffer), 0)
+
+    def test_buffered_audit_flushes_at_request_end(self):
+        """
+        Entries are inserted by one query at the end of request.
+        """
+        self.audit_times(2)
+        self.assertEqual(LogEntry.objects.count(), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(audit_buffer.finish(self.token), 2)
+        self.assertEqual(insert_count(queries), 1)
+        self.assertEqual(LogEntry.objects.count(), 2)
+        self.assertEqual(len(audit_buffer), 0)
+
+    def test_buffered_audit_of_request_delivered(self):
+        """
+        Entries written by view are inserted before response is
+        returned.
+        """
+        current_entries.set(None)
+        self.client.login(**librarian_credentials)
+        response = self.client.post(
+            reverse('main:edit_book', args=[self.book.isbn]), {
+                'isbn': self.book.isbn, 'name': 'New Name',
+                'authors': 'Author', 'count': 1})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(LogEntry.objects.filter(
+            object_id=self.book.isbn, action_flag=CHANGE).exists())
+
+    def test_buffered_audit_outside_request(self):
+        """
+        Outside of request entries are inserted immediately.
+        """
+        current_entries.set(None)
+        self.audit_times(1)
+        self.assertEqual(LogEntry.objects.count(), 1)
+
+    def test_buffered_audit_drops_rolled_back_entries(self):
+        """
+        Entries written in rolled back transaction are not inserted.
+        """
+        with self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                self.audit_times(1)
+                raise DatabaseError
+        self.assertEqual(audit_buffer.finish(self.token), 0)
+        self.assertEqual(LogEntry.objects.count(), 0)
+
+    def test_buffered_audit_logs_failed_insert(self):
+        """
+        If insert fails, entries are logged and audited action does not
+        fail.
+        """
+        self.audit_times(1)
+        with mock.patch.object(
+                LogEntry.objects, 'bulk_create',
+                side_effect=DatabaseError):
+            with self.assertLogs('main.audit', 'ERROR') as logs:
+                self.assertEqual(audit_buffer.finish(self.token), 0)
+        self.assertIn("Edit 0", logs.output[0])
+        self.assertEqual(len(audit_buffer), 0)
@@ -0,0 +1,254 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains tests of management commands in main app.
+"""
+
+import os
+import tempfile
+from io import StringIO
+
+import stdnum.isbn
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db import connection, transaction
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from main.models import Book, Lease
+from main.search_index import BookIndex
+from main.seeding import isbn13
+
+from .utils import isbn_list_3_1, student_credentials, create_student_lease
+
+
+class RebuildLeasedCountsCommandTests(TestCase):
+    """
+    Tests checking rebuild_leased_counts command.
+    """
+
+    def setUp(self):
+        student_user = get_user_model().objects.create_user(
+            **student_credentials)
+        group = Group.objects.get_or_create(name="Student")[0]
+        student_user.groups.add(group)
+
+        for isbn in isbn_list_3_1:
+            Book.objects.create(isbn=isbn, name=isbn, count=2)
+            create_student_lease(isbn)
+
+    def test_check_passes_on_valid_counters(self):
+        """
+        If counters match leases, check succeeds.
+        """
+        out = StringIO()
+        call_command('rebuild_leased_counts', '--check', stdout=out)
+        self.assertIn("All book counters are valid", out.getvalue())
+
+    def test_check_fails_on_invalid_counters(self):
+        """
+        If counters do not match leases, check fails without fixing them.
+        """
+        Book.objects.filter(pk='9780000000002').update(leased_count=2)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_leased_counts', '--check', stdout=StringIO())
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 2)
+
+    def test_rebuild_fixes_invalid_counters(self):
+        """
+        Rebuild sets counters to number of active leases.
+        """
+        Book.objects.filter(pk='9780000000002').update(leased_count=2)
+        Book.objects.filter(pk='9780000000019').update(leased_count=0)
+        out = StringIO()
+        call_command('rebuild_leased_counts', stdout=out)
+        self.assertIn("2 book counters rebuilt", out.getvalue())
+        self.assertEqual(
+            list(Book.objects.order_by('pk')
+                 .values_list('leased_count', flat=True)),
+            [1, 1, 1])
+
+
+class SeedLibraryCommandTests(TestCase):
+    """
+    Tests checking seed_library command.
+    """
+
+    def seed(self, seed=0):
+        """
+        Seeds small library.
+        """
+        call_command(
+            'seed_library', '--books', '30', '--students', '10',
+            '--librarians', '2', '--leases', '200', '--seed', str(seed),
+            '--batch-size', '7', '--reference-date', '2021-06-01',
+            stdout=StringIO())
+
+    def snapshot(self):
+        """
+        Returns seeded data except for user ids assigned by database.
+        """
+        return (
+            list(Book.objects.order_by('pk')
+                 .values_list('isbn', 'name', 'authors', 'count',
+                              'added_date')),
+            list(Lease.objects.order_by('pk')
+                 .values_list('id', 'book', 'student__username',
+                              'issue_date', 'expire_date', 'return_date')))
+
+    def test_seed_library_creates_data(self):
+        """
+        Requested number of objects is created with valid relations.
+        """
+        self.seed()
+        self.assertEqual(Book.objects.count(), 30)
+        self.assertEqual(Lease.objects.count(), 200)
+        self.assertEqual(
+            get_user_model().objects.filter(groups__name='Student').count(),
+            10)
+        self.assertEqual(
+            get_user_model().objects.filter(groups__name='Librarian')
+            .count(),
+            2)
+        self.assertTrue(Lease.objects.filter(return_date__isnull=True)
+                        .exists())
+        self.assertTrue(Lease.objects.filter(return_date__isnull=False)
+                        .exists())
+        for book in Book.objects.all():
+            self.assertLessEqual(book.leased_count, book.count)
+        call_command('rebuild_leased_counts', '--check', stdout=StringIO())
+
+    def test_seed_library_is_deterministic(self):
+        """
+        Same seed produces same data, even if user ids differ, and other
+        seed produces other data.
+        """
+        snapshots = []
+        for number, seed in enumerate((1, 1, 2)):
+            with transaction.atomic():
+                for other in range(number):
+                    get_user_model().objects.create_user(
+                        username='other{}'.format(other),
+                        email='other{}@example.com'.format(other))
+                self.seed(seed)
+                snapshots.append(self.snapshot())
+                transaction.set_rollback(True)
+        self.assertEqual(snapshots[0], snapshots[1])
+        self.assertNotEqual(snapshots[0], snapshots[2])
+
+    def test_seed_library_refuses_seeded_database(self):
+        """
+        Seeding twice fails instead of creating duplicates.
+        """
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_isbn13_generates_valid_isbn(self):
+        """
+        Generated ISBNs have valid check digit.
+        """
+        self.assertEqual(isbn13(0), '9781000000009')
+        for number in (1, 42, 99999999):
+            self.assertTrue(stdnum.isbn.is_valid(isbn13(number)))
+
+
+class BuildSearchIndexCommandTests(TestCase):
+    """
+    Tests checking build_search_index command.
+    """
+
+    def test_build_search_index_saves_index(self):
+        """
+        Command indexes all books and saves index to index file.
+        """
+        Book.objects.create(isbn=isbn_list_3_1[0], name='Ocean', count=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index')
+            out = StringIO()
+            with override_settings(SEARCH_INDEX_PATH=path):
+                call_command('build_search_index', stdout=out)
+            index = BookIndex()
+            self.assertTrue(index.load(path))
+        self.assertIn("Indexed 1 books", out.getvalue())
+        self.assertEqual(index.search('ocean'), {isbn_list_3_1[0]})
+
+    def test_build_search_index_requires_path(self):
+        """
+        If index file is unknown, command fails.
+        """
+        with self.assertRaises(CommandError):
+            call_command('build_search_index', stdout=StringIO())
+
+
+class ImportBooksCommandTests(TestCase):
+    """
+    Tests checking import_books command.
+    """
+
+    def test_import_books_imports_file(self):
+        """
+        Command imports books and writes rejected rows to given file.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'books.csv')
+            rejected_path = os.path.join(directory, 'rejected.csv')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('isbn,name,count\n{},Book,2\nbad,Book,1\n'.format(
+                    isbn_list_3_1[0]))
+            out = StringIO()
+            call_command(
+                'import_books', path, rejected=rejected_path, stdout=out)
+            with open(rejected_path, encoding='utf-8') as file:
+                rejected = file.read()
+        self.assertIn(
+            "Created 1 books, updated 0 books, rejected 1 rows",
+            out.getvalue())
+        self.assertEqual(rejected.splitlines(), ['3,Invalid ISBN,bad,Book,1'])
+        self.assertEqual(Book.objects.get().count, 2)
+
+    def test_import_books_invalid_files(self):
+        """
+        If file format is unknown or file does not exist, command fails.
+        """
+        with self.assertRaises(CommandError):
+            call_command('import_books', 'books.txt', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('import_books', '/nonexistent/books.csv',
+                         stdout=StringIO())
+
+
+class BenchmarkCommandTests(TransactionTestCase):
+    """
+    Tests checking benchmark command.
+    """
+
+    def test_indexes_benchmark_restores_indexes(self):
+        """
+        Indexes benchmark reports both runs and leaves indexes in place.
+        """
+        out = StringIO()
+        call_command('benchmark', 'indexes', '--size', '100', stdout=out)
+        self.assertIn("=== Without indexes", out.getvalue())
+        self.assertIn("=== With indexes", out.getvalue())
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Lease._meta.db_table)
+        self.assertIn('lease_active_expire_idx', constraints)
@@ -23,7 +23,8 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.utils import timezone
 
-from main.forms import BookCreationForm, LeaseCreationForm
+from main.forms import (
+    BookCreationForm, BulkLeaseCreationForm, LeaseCreationForm)
 from main.models import Book
 
 from .utils import student_credentials, create_student_lease
@@ -158,6 +159,21 @@ class LeaseCreationFormTests(TestCase):
         })
         self.assertTrue(form.is_valid())
 
+    def test_lease_creation_form_not_student(self):
+        """
+        If id of user who is not a student is sent, form is invalid.
+        """
+        user = get_user_model().objects.create_user(
+            username='librarian', email='librarian@example.com')
+        form = LeaseCreationForm(data={
+            'student': user.id,
+            'book': '9780000000002',
+            'expire_date': str(
+                (timezone.now()+timezone.timedelta(days=30)).date())
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('student', form.errors)
+
     def test_lease_creation_form_no_data(self):
         """
         If no data is sent, form is invalid.
@@ -189,6 +205,21 @@ class LeaseCreationFormTests(TestCase):
         })
         self.assertFalse(form.is_valid())
 
+    def test_lease_creation_form_invalid_student_id(self):
+        """
+        If student id has non-ASCII digits or is out of range, form is
+        invalid.
+        """
+        for value in ('²', '99999999999999999999999'):
+            form = LeaseCreationForm(data={
+                'student': value,
+                'book': '9780000000002',
+                'expire_date': str(
+                    (timezone.now()+timezone.timedelta(days=30)).date())
+            })
+            self.assertFalse(form.is_valid())
+            self.assertIn('student', form.errors)
+
     def test_lease_creation_form_no_book(self):
         """
         If no book is sent, form is invalid.
@@ -259,3 +290,84 @@ class LeaseCreationFormTests(TestCase):
                 (timezone.now()-timezone.timedelta(days=30)).date())
         })
         self.assertFalse(form.is_valid())
+
+
+class BulkLeaseCreationFormTests(TestCase):
+    """
+    Tests checking bulk lease creation form validation.
+    """
+
+    def setUp(self):
+        Book.objects.create(
+            isbn='9780000000002',
+            name='Test Book',
+            count=2)
+        Book.objects.create(
+            isbn='9780000000019',
+            name='Test Book 2',
+            count=2)
+
+        self.student_user = get_user_model().objects.create_user(
+            **student_credentials)
+        group = Group.objects.get_or_create(name="Student")[0]
+        self.student_user.groups.add(group)
+
+        self.expire_date = str(
+            (timezone.now() + timezone.timedelta(days=30)).date())
+
+    def test_bulk_lease_creation_form_valid_data(self):
+        """
+        If known student and books are sent, form is valid and returns
+        them without duplicates.
+        """
+        form = BulkLeaseCreationForm(data={
+            'students': '{0} {0}'.format(self.student_user.id),
+            'books': '9780000000002;0000000019\n9780000000002',
+            'expire_date': self.expire_date,
+        })
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['students'], [self.student_user])
+        self.assertEqual(
+            [book.isbn for book in form.cleaned_data['books']],
+            ['9780000000002', '9780000000019'])
+
+    def test_bulk_lease_creation_form_invalid_isbn(self):
+        """
+        If invalid ISBN is sent, form is invalid.
+        """
+        form = BulkLeaseCreationForm(data={
+            'students': self.student_user.username,
+            'books': '9780000000003',
+            'expire_date': self.expire_date,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('books', form.errors)
+
+    def test_bulk_lease_creation_form_invalid_student_id(self):
+        """
+        If student id has non-ASCII digits or is out of range, form is
+        invalid.
+        """
+        for value in ('²', '99999999999999999999999'):
+            form = BulkLeaseCreationForm(data={
+                'students': value,
+                'books': '9780000000002',
+                'expire_date': self.expire_date,
+            })
+            self.assertFalse(form.is_valid())
+            self.assertIn('students', form.errors)
+
+    def test_bulk_lease_creation_form_many_students_and_books(self):
+        """
+        If many students and many books are sent, form is invalid.
+        """
+        user = get_user_model().objects.create_user(
+            username='reader', email='reader@example.com')
+        user.groups.add(Group.objects.get(name="Student"))
+        form = BulkLeaseCreationForm(data={
+            'students': '{} reader'.format(self.student_user.username),
+            'books': '9780000000002 9780000000019',
+            'expire_date': self.expire_date,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('__all__', form.errors)
@@ -0,0 +1,243 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+This module contains tests of bulk import of books in main app.
+"""
+
+from io import BytesIO
+from unittest import mock
+
+import stdnum.isbn
+from openpyxl import Workbook
+
+from django.db import IntegrityError
+from django.test import TestCase
+
+from main.importing import (
+    BookImporter, ImportFileError, import_books, import_format,
+    normalize_isbn)
+from main.models import Book
+
+from .utils import isbn_list_3_1
+
+
+def csv_file(*lines):
+    """
+    Returns binary CSV file with given lines.
+    """
+    return BytesIO('\n'.join(lines).encode('utf-8'))
+
+
+class NormalizeIsbnTests(TestCase):
+    """
+    Tests checking normalize_isbn function.
+    """
+
+    def test_normalize_isbn_matches_stdnum(self):
+        """
+        If ISBN is valid, it is converted to ISBN-13 as by stdnum,
+        otherwise None is returned.
+        """
+        for value in ('0-306-40615-2', '080442957X', '080442957x',
+                      '978-0-306-40615-7', '9780306406157 '):
+            self.assertEqual(
+                normalize_isbn(value),
+                stdnum.isbn.to_isbn13(stdnum.isbn.compact(value)))
+        for value in ('0306406153', '9780306406158', '979030640615',
+                      '1234567890123', 'isbn', ''):
+            self.assertFalse(stdnum.isbn.is_valid(value))
+            self.assertIsNone(normalize_isbn(value))
+
+    def test_import_format(self):
+        """
+        Import format is taken from file extension.
+        """
+        self.assertEqual(import_format('books.CSV'), 'csv')
+        self.assertEqual(import_format('books.xlsx'), 'xlsx')
+        self.assertIsNone(import_format('books.txt'))
+        self.assertIsNone(import_format('books'))
+
+
+class ImportBooksTests(TestCase):
+    """
+    Tests checking import_books function.
+    """
+
+    def setUp(self):
+        self.rejected = []
+
+    def on_reject(self, number, row, reason):
+        self.rejected.append((number, reason))
+
+    def test_import_csv_creates_and_updates_books(self):
+        """
+        If books are new, they are created, otherwise imported count is
+        added to existing one and update date is changed.
+        """
+        book = Book.objects.create(isbn=isbn_list_3_1[0], name='Old', count=2)
+        result = import_books(csv_file(
+            '\ufeffisbn,name,authors,count',
+            '{},New name,,3'.format(isbn_list_3_1[0]),
+            '{},Second,Author,'.format(isbn_list_3_1[1]),
+            ',,,',
+            '{},Third,Author,4'.format(isbn_list_3_1[2]),
+        ), 'csv', self.on_reject, batch_size=2)
+        self.assertEqual(result, (2, 1, 0))
+        updated_book = Book.objects.get(pk=isbn_list_3_1[0])
+        self.assertEqual(updated_book.count, 5)
+        self.assertEqual(updated_book.name, 'Old')
+        self.assertGreater(updated_book.updated_date, book.updated_date)
+        self.assertEqual(Book.objects.get(pk=isbn_list_3_1[1]).count, 1)
+        self.assertEqual(Book.objects.get(pk=isbn_list_3_1[2]).count, 4)
+
+    def test_import_csv_merges_same_isbn(self):
+        """
+        If rows have the same ISBN in different forms, one book with sum
+        of counts is created.
+        """
+        result = import_books(csv_file(
+            'ISBN,Name,Count',
+            '0-306-40615-2,Book,1',
+            '978-0-306-40615-7,Book,2',
+        ), 'csv', self.on_reject)
+        self.assertEqual(result, (1, 0, 0))
+        self.assertEqual(Book.objects.get(pk='9780306406157').count, 3)
+
+    def test_import_csv_rejects_invalid_rows(self):
+        """
+        If rows are invalid, they are reported with row number and
+        reason, and other rows are imported.
+        """
+        result = import_books(csv_file(
+            'isbn,name,count',
+            '0306406153,Bad ISBN,1',
+            '{},,1'.format(isbn_list_3_1[0]),
+            '{},Book,-1'.format(isbn_list_3_1[1]),
+            '{},Book,40000'.format(isbn_list_3_1[2]),
+            '0306406152,Good,1.0',
+        ), 'csv', self.on_reject)
+        self.assertEqual(result, (1, 0, 4))
+        self.assertEqual(self.rejected, [
+            (2, "Invalid ISBN"),
+            (3, "Invalid name or authors"),
+            (4, "Invalid count"),
+            (5, "Invalid count"),
+        ])
+        self.assertEqual(list(Book.objects.values_list('pk', flat=True)),
+                         ['9780306406157'])
+
+    def test_import_rejects_too_many_copies(self):
+        """
+        If imported count makes count of book too large, rows are
+        rejected.
+        """
+        Book.objects.create(isbn=isbn_list_3_1[0], name='Old', count=32000)
+        result = import_books(csv_file(
+            'isbn,name,count',
+            '{},Book,500'.format(isbn_list_3_1[0]),
+            '{},Book,500'.format(isbn_list_3_1[0]),
+        ), 'csv', self.on_reject)
+        self.assertEqual(result, (0, 0, 2))
+        self.assertEqual(self.rejected, [
+            (2, "Too many copies"), (3, "Too many copies")])
+        self.assertEqual(Book.objects.get().count, 32000)
+
+    def test_import_xlsx(self):
+        """
+        If file is XLSX workbook with verbose column names, books are
+        imported from its active sheet.
+        """
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['ISBN', 'Name', 'Authors', 'Count'])
+        sheet.append([isbn_list_3_1[0], 'Book', 'Author', 2])
+        sheet.append([None, None, None, None])
+        sheet.append(['bad', 'Book', None, 1])
+        file = BytesIO()
+        workbook.save(file)
+        file.seek(0)
+        result = import_books(file, 'xlsx', self.on_reject)
+        self.assertEqual(result, (1, 0, 1))
+        self.assertEqual(self.rejected, [(4, "Invalid ISBN")])
+        book = Book.objects.get()
+        self.assertEqual((book.authors, book.count), ('Author', 2))
+
+    def test_import_numeric_cells(self):
+        """
+        If ISBN and count are stored in XLSX cells as floats, they are
+        read as integers.
+        """
+        result = BookImporter(self.on_reject).import_rows([
+            ('ISBN', 'Name', 'Count'),
+            (float(isbn_list_3_1[0]), 'Book', 2.0),
+        ])
+        self.assertEqual(result, (1, 0, 0))
+        self.assertEqual(Book.objects.get(pk=isbn_list_3_1[0]).count, 2)
+
+    def test_import_retries_concurrently_inserted_book(self):
+        """
+        If the same new book is inserted by concurrent import, batch is
+        saved again and imported count is added to it.
+        """
+        save_books = BookImporter.save_books
+
+        def insert_concurrently(importer, books):
+            if not Book.objects.exists():
+                Book.objects.create(
+                    isbn=isbn_list_3_1[0], name='Old', count=1)
+                raise IntegrityError
+            return save_books(importer, books)
+
+        with mock.patch.object(
+                BookImporter, 'save_books', autospec=True,
+                side_effect=insert_concurrently):
+            result = import_books(csv_file(
+                'isbn,name,count',
+                '{},Book,2'.format(isbn_list_3_1[0]),
+            ), 'csv', self.on_reject)
+        self.assertEqual(result, (0, 1, 0))
+        self.assertEqual(Book.objects.get().count, 3)
+
+    def test_import_missing_columns(self):
+        """
+        If header has no ISBN or name column, ImportFileError is raised.
+        """
+        with self.assertRaisesMessage(ImportFileError, 'name'):
+            import_books(csv_file('isbn,count', '0306406152,1'), 'csv')
+        with self.assertRaises(ImportFileError):
+            import_books(csv_file(), 'csv')
+
+    def test_import_invalid_files(self):
+        """
+        If file is not valid CSV or XLSX, ImportFileError is raised.
+        """
+        with self.assertRaises(ImportFileError):
+            import_books(BytesIO(b'isbn,name\n\xff\xfe'), 'csv')
+        with self.assertRaises(ImportFileError):
+            import_books(BytesIO(b'not a workbook'), 'xlsx')
+
+    def test_import_unreadable_xlsx_rows(self):
+        """
+        If rows of XLSX file can not be parsed, ImportFileError is
+        raised.
+        """
+        with mock.patch('main.importing.load_workbook') as load_workbook:
+            load_workbook.return_value.active.iter_rows.side_effect = (
+                ValueError('Bad cell'))
+            with self.assertRaisesMessage(ImportFileError, 'Bad cell'):
+                import_books(BytesIO(), 'xlsx')
@@ -0,0 +1,110 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains tests of HTTP load test in main app.
+"""
+
+import asyncio
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, SimpleTestCase
+
+from main.loadtest import SCENARIOS, percentile, run_load_test
+from main.seeding import LibrarySeeder
+
+
+class PercentileTests(SimpleTestCase):
+    """
+    Tests checking percentile function.
+    """
+
+    def test_percentile_nearest_rank(self):
+        """
+        Percentile is the smallest value not less than given share of
+        values.
+        """
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+class LoadTestTests(LiveServerTestCase):
+    """
+    Tests checking load test against live server. Test database in
+    memory locks tables of concurrent writers, so every run has one
+    virtual user.
+    """
+
+    def setUp(self):
+        LibrarySeeder(seed=0).seed(
+            books=50, students=10, leases=100, librarians=1)
+
+    def test_run_load_test_replays_scenarios(self):
+        """
+        Virtual librarian and student log in and run scenarios of their
+        role without errors.
+        """
+        for librarians, students in ((1, 0), (0, 1)):
+            role = 'librarian' if librarians else 'student'
+            stats = asyncio.run(run_load_test(
+                self.live_server_url, librarians, students, duration=60,
+                iterations=20))
+            self.assertEqual(dict(stats.errors), {})
+            self.assertEqual(stats.failed_users, [])
+            self.assertEqual(sum(stats.scenarios.values()), 20)
+            self.assertLessEqual(
+                set(stats.scenarios),
+                {item.name for item in SCENARIOS[role]})
+            self.assertEqual(len(stats.latencies['login']), 2)
+
+    def test_run_load_test_is_reproducible(self):
+        """
+        Runs with the same seed and iterations run the same scenarios.
+        """
+        runs = [
+            asyncio.run(run_load_test(
+                self.live_server_url, librarians=1, students=0,
+                duration=60, seed=5, iterations=10)).scenarios
+            for _ in range(2)]
+        self.assertEqual(runs[0], runs[1])
+
+    def test_loadtest_command_reports_percentiles(self):
+        """
+        Command writes percentiles of every request and reports users
+        which could not log in.
+        """
+        out = StringIO()
+        call_command(
+            'loadtest', url=self.live_server_url, librarians=2,
+            students=0, duration=60, iterations=5, stdout=out)
+        output = out.getvalue()
+        self.assertIn('p95 ms', output)
+        self.assertIn('total', output)
+        self.assertIn("Could not log in as seed_librarian_1", output)
+
+    def test_loadtest_command_fails_without_users(self):
+        """
+        If no virtual user can log in, command fails.
+        """
+        with self.assertRaises(CommandError):
+            call_command(
+                'loadtest', url=self.live_server_url, librarians=0,
+                students=1, duration=1, password='wrong', stdout=StringIO())
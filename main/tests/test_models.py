@@ -18,16 +18,120 @@
 This module contains tests of models in main app.
 """
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 
-from main.models import Book
+from main.models import Book, Lease
+from main.roles import (
+    LOCAL_GROUP_CACHE_TIMEOUT, group_cache_key, group_cache_timeout)
 
 from .utils import student_credentials, create_student_lease
 
 
+class UserModelTests(TestCase):
+    """
+    Tests checking user model.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            **student_credentials)
+        self.group = Group.objects.get_or_create(name="Librarian")[0]
+
+    def load_user(self):
+        """
+        Returns fresh instance of user as loaded by new request.
+        """
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_user_is_librarian(self):
+        """
+        If user is in Librarian group, is_librarian is true.
+        """
+        self.assertFalse(self.load_user().is_librarian)
+        self.user.groups.add(self.group)
+        self.assertTrue(self.load_user().is_librarian)
+        self.assertFalse(self.load_user().is_student)
+
+    def test_user_group_names_cached_across_requests(self):
+        """
+        Group names are queried once and then read from cache.
+        """
+        self.user.groups.add(self.group)
+        user = self.load_user()
+        with self.assertNumQueries(1):
+            self.assertTrue(user.is_librarian)
+            self.assertEqual(user.role(), "Librarian")
+        user = self.load_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_librarian)
+
+    def test_user_group_names_invalidated_on_removal(self):
+        """
+        If user is removed from group, cached membership is dropped.
+        """
+        self.user.groups.add(self.group)
+        self.assertTrue(self.load_user().is_librarian)
+        self.group.user_set.remove(self.user)
+        self.assertFalse(self.load_user().is_librarian)
+
+    def test_user_group_names_invalidated_on_clear(self):
+        """
+        If group members are cleared, cached membership is dropped.
+        """
+        self.user.groups.add(self.group)
+        self.assertTrue(self.load_user().is_librarian)
+        self.group.user_set.clear()
+        self.assertFalse(self.load_user().is_librarian)
+
+    def test_user_group_names_invalidated_on_rename(self):
+        """
+        If group is renamed, cached membership is dropped.
+        """
+        self.user.groups.add(self.group)
+        self.assertTrue(self.load_user().is_librarian)
+        self.group.name = "Former Librarian"
+        self.group.save()
+        self.assertFalse(self.load_user().is_librarian)
+
+
+class UserGroupCacheTransactionTests(TransactionTestCase):
+    """
+    Tests checking invalidation of cached group names on commit.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(
+            **student_credentials)
+        self.group = Group.objects.create(name="Librarian")
+
+    def test_user_group_names_invalidated_on_commit(self):
+        """
+        Group names cached by other request before membership change is
+        committed are dropped on commit.
+        """
+        with transaction.atomic():
+            self.user.groups.add(self.group)
+            # Other request still sees membership before commit.
+            cache.set(group_cache_key(self.user.pk), frozenset())
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertTrue(user.is_librarian)
+
+    @override_settings(GROUP_CACHE_TIMEOUT=300)
+    def test_group_cache_timeout_per_process(self):
+        """
+        Per-process cache keeps group names for short time only.
+        """
+        self.assertEqual(group_cache_timeout(), LOCAL_GROUP_CACHE_TIMEOUT)
+
+
 class BookModelTests(TestCase):
     """
     Tests checking book model.
@@ -72,6 +176,7 @@ class BookModelTests(TestCase):
         If 1 book is available, 1 is returned.
         """
         create_student_lease('9780000000002')
+        self.book1.refresh_from_db()
         self.assertEqual(self.book1.available_count(), 1)
 
     def test_book_available_count_when_none_available(self):
@@ -80,6 +185,7 @@ class BookModelTests(TestCase):
         """
         for _ in range(2):
             create_student_lease('9780000000002')
+        self.book1.refresh_from_db()
         self.assertEqual(self.book1.available_count(), 0)
 
     def test_book_is_available_when_two_available(self):
@@ -93,6 +199,7 @@ class BookModelTests(TestCase):
         If 1 book is available, true is returned.
         """
         create_student_lease('9780000000002')
+        self.book1.refresh_from_db()
         self.assertTrue(self.book1.is_available())
 
     def test_book_is_available_when_none_available(self):
@@ -101,8 +208,40 @@ class BookModelTests(TestCase):
         """
         for _ in range(2):
             create_student_lease('9780000000002')
+        self.book1.refresh_from_db()
         self.assertFalse(self.book1.is_available())
 
+    def test_book_available_count_makes_no_queries(self):
+        """
+        Available count is read from book row without querying leases.
+        """
+        create_student_lease('9780000000002')
+        book = Book.objects.get(pk='9780000000002')
+        with self.assertNumQueries(0):
+            self.assertEqual(book.available_count(), 1)
+            self.assertTrue(book.is_available())
+
+    def test_book_save_keeps_leased_count(self):
+        """
+        Saving stale book instance does not overwrite leased count.
+        """
+        create_student_lease('9780000000002')
+        self.book1.name = 'Renamed Book'
+        self.book1.save()
+        self.book1.refresh_from_db()
+        self.assertEqual(self.book1.name, 'Renamed Book')
+        self.assertEqual(self.book1.leased_count, 1)
+
+    def test_book_save_sets_updated_date(self):
+        """
+        Saving book sets its updated date.
+        """
+        updated_date = self.book1.updated_date
+        self.book1.name = 'Renamed Book'
+        self.book1.save()
+        self.book1.refresh_from_db()
+        self.assertGreater(self.book1.updated_date, updated_date)
+
 
 class LeaseModelTests(TestCase):
     """
@@ -135,3 +274,86 @@ class LeaseModelTests(TestCase):
         self.lease.return_date = timezone.now()
         self.lease.save()
         self.assertFalse(self.lease.is_active())
+
+    def test_lease_creation_increments_leased_count(self):
+        """
+        Creating active lease increments leased count of book.
+        """
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 1)
+
+    def test_lease_return_decrements_leased_count(self):
+        """
+        Returning lease decrements leased count of book once.
+        """
+        self.lease.return_date = timezone.now()
+        self.lease.save()
+        self.lease.save()
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 0)
+
+    def test_loaded_lease_return_decrements_leased_count(self):
+        """
+        Returning lease loaded from database decrements leased count.
+        """
+        lease = Lease.objects.get(pk=self.lease.pk)
+        lease.return_date = timezone.now()
+        lease.save()
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 0)
+
+    def test_partially_loaded_lease_keeps_leased_count(self):
+        """
+        Saving lease loaded without book or return date changes leased
+        count only if lease is returned.
+        """
+        lease = Lease.objects.only('id', 'expire_date').get(pk=self.lease.pk)
+        lease.expire_date += timezone.timedelta(days=1)
+        lease.save()
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 1)
+        lease = Lease.objects.defer('book').get(pk=self.lease.pk)
+        lease.return_date = timezone.now()
+        lease.save()
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 0)
+        lease = Lease.objects.defer('return_date').get(pk=self.lease.pk)
+        lease.delete()
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 0)
+
+    def test_refreshed_lease_keeps_leased_count(self):
+        """
+        Saving lease refreshed after it was returned elsewhere does not
+        decrement leased count again.
+        """
+        other = Lease.objects.get(pk=self.lease.pk)
+        other.return_date = timezone.now()
+        other.save()
+        self.lease.refresh_from_db()
+        self.lease.save()
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 0)
+        other.refresh_from_db(fields=['return_date'])
+        other.return_date = None
+        other.save()
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 1)
+
+    def test_lease_delete_decrements_leased_count(self):
+        """
+        Deleting active lease decrements leased count of book.
+        """
+        Lease.objects.get(pk=self.lease.pk).delete()
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 0)
+
+    def test_lease_return_sets_updated_date(self):
+        """
+        Returning lease sets its updated date.
+        """
+        self.lease.return_date = timezone.now()
+        self.lease.save()
+        self.lease.refresh_from_db()
+        self.assertGreaterEqual(
+            self.lease.updated_date, self.lease.return_date)
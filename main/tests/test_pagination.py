@@ -0,0 +1,204 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains tests of keyset pagination in main app.
+"""
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from main.models import Book, Lease
+from main.pagination import InvalidCursor, KeysetPaginator
+from main.search_index import book_index
+from main.seeding import isbn13
+
+from .utils import (
+    create_librarian_user, librarian_credentials, student_credentials)
+
+
+class KeysetPaginatorTests(TestCase):
+    """
+    Tests checking KeysetPaginator.
+    """
+
+    def setUp(self):
+        now = timezone.now()
+        for number in range(23):
+            Book.objects.create(isbn=isbn13(number), name='Book', count=1)
+        # Pairs of books share added date, so ties are broken by ISBN.
+        for number in range(23):
+            Book.objects.filter(isbn=isbn13(number)).update(
+                added_date=now - timezone.timedelta(days=number // 2))
+        self.expected = list(
+            Book.objects.order_by('-added_date', '-isbn')
+            .values_list('isbn', flat=True))
+        self.paginator = KeysetPaginator(
+            Book.objects.all(), ('-added_date', '-pk'), 5, window=2)
+
+    def walk(self, paginator, cursor=None, backwards=False):
+        """
+        Returns list of pages visited by following next or previous
+        links.
+        """
+        pages = []
+        while True:
+            page = paginator.page(cursor)
+            pages.append(page)
+            cursor = page.previous_cursor if backwards else page.next_cursor
+            if cursor is None:
+                return pages
+
+    def test_first_page(self):
+        """
+        First page contains first rows and links to next pages.
+        """
+        page = self.paginator.page()
+        self.assertEqual(
+            [book.isbn for book in page.object_list], self.expected[:5])
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+        self.assertEqual(
+            [link.number for link in page.links], [1, 2, 3, None])
+
+    def test_walk_forward(self):
+        """
+        Following next links visits every row once in order.
+        """
+        pages = self.walk(self.paginator)
+        self.assertEqual([page.number for page in pages], [1, 2, 3, 4, 5])
+        self.assertEqual(
+            [book.isbn for page in pages for book in page.object_list],
+            self.expected)
+
+    def test_walk_backwards(self):
+        """
+        Following previous links from last page visits every row once.
+        """
+        last_page = self.walk(self.paginator)[-1]
+        pages = self.walk(
+            self.paginator, last_page.previous_cursor, backwards=True)
+        self.assertEqual([page.number for page in pages], [4, 3, 2, 1])
+        self.assertEqual(
+            [book.isbn for page in reversed(pages)
+             for book in page.object_list],
+            self.expected[:20])
+
+    def test_window_links(self):
+        """
+        Middle page links to pages around it with gaps on both sides.
+        """
+        page = self.walk(self.paginator)[2]
+        self.assertEqual(
+            [link.number for link in page.links], [1, 2, 3, 4, 5])
+        page = KeysetPaginator(
+            Book.objects.all(), ('-added_date', '-pk'), 2, window=1)
+        page = self.walk(page)[5]
+        self.assertEqual(
+            [link.number for link in page.links], [None, 5, 6, 7, None])
+        self.assertEqual(
+            [book.isbn for book in page.paginator.page(
+                page.links[1].cursor).object_list],
+            self.expected[8:10])
+
+    def test_nullable_keys(self):
+        """
+        Rows with NULL keys precede rows with values in both directions.
+        """
+        create_librarian_user()
+        student = get_user_model().objects.create_user(
+            **student_credentials, email='student@example.com')
+        for number in range(7):
+            lease = Lease.objects.create(
+                student=student, book_id=isbn13(number),
+                expire_date=timezone.now().date())
+            if number % 2:
+                lease.return_date = timezone.now()
+                lease.save()
+        paginator = KeysetPaginator(
+            Lease.objects.all(),
+            ('return_date', 'expire_date', 'issue_date', 'pk'), 2)
+        leases = [
+            lease for page in self.walk(paginator)
+            for lease in page.object_list]
+        self.assertEqual(len(leases), 7)
+        self.assertEqual(
+            [lease.return_date is None for lease in leases],
+            [True] * 4 + [False] * 3)
+        pages = self.walk(
+            paginator, self.walk(paginator)[-1].previous_cursor,
+            backwards=True)
+        self.assertEqual(
+            [lease.pk for page in reversed(pages)
+             for lease in page.object_list],
+            [lease.pk for lease in leases[:6]])
+
+    def test_invalid_cursor(self):
+        """
+        If cursor is tampered with, InvalidCursor is raised.
+        """
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page('invalid')
+        cursor = KeysetPaginator(
+            Book.objects.all(), ('pk',), 5).page().next_cursor
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(cursor)
+
+    def test_count(self):
+        """
+        Number of pages is computed from row count.
+        """
+        self.assertEqual(self.paginator.count, 23)
+        self.assertEqual(self.paginator.num_pages, 5)
+
+
+class KeysetPaginationViewTests(TestCase):
+    """
+    Tests checking keyset pagination in list views.
+    """
+
+    def setUp(self):
+        # Index follows committed changes only, so it is rebuilt from
+        # books of this test.
+        book_index.clear()
+        create_librarian_user()
+        for number in range(12):
+            Book.objects.create(
+                isbn=isbn13(number), name='Book {}'.format(number), count=1)
+        self.url = reverse('main:books')
+
+    def test_page_links_keep_query(self):
+        """
+        Page links keep search query.
+        """
+        self.client.login(**librarian_credentials)
+        response = self.client.get(self.url, {'q': 'Book'})
+        self.assertContains(response, '?q=Book&amp;cursor=')
+        response = self.client.get(self.url, {
+            'q': 'Book',
+            'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(len(response.context['book_list']), 2)
+
+    def test_invalid_cursor_not_found(self):
+        """
+        If cursor is invalid, 404 is returned.
+        """
+        self.client.login(**librarian_credentials)
+        response = self.client.get(self.url, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
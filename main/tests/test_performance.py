@@ -0,0 +1,281 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+This module contains performance regression tests of views in main app.
+Every URL of main app is requested against seeded library. Number of
+queries must stay within view budget, and median response time is
+compared with baseline saved in performance_baseline.json.
+
+Timings depend on machine and load, so they are checked only if
+PERFORMANCE_TIMINGS=1 is set, and are scaled by calibration loop timed
+on the same run. Set PERFORMANCE_TOLERANCE to change allowed slowdown
+and PERFORMANCE_BASELINE_UPDATE=1 to save new baseline instead of
+comparing with it.
+"""
+
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from collections import namedtuple
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from main import urls
+from main.models import Book, Lease, ReportJob
+from main.seeding import LibrarySeeder
+
+
+# Response times are measured only on request, because they are slow to
+# measure and flaky on shared machines.
+PERFORMANCE_TIMINGS = bool(
+    os.environ.get('PERFORMANCE_TIMINGS')
+    or os.environ.get('PERFORMANCE_BASELINE_UPDATE'))
+
+PERFORMANCE_BASELINE = os.path.join(
+    os.path.dirname(__file__), 'performance_baseline.json')
+
+# Allowed slowdown of view compared with scaled baseline time.
+PERFORMANCE_TOLERANCE = float(os.environ.get('PERFORMANCE_TOLERANCE', 2.0))
+
+# Absolute slack in seconds, so that timer noise of fast views is not
+# reported as regression.
+PERFORMANCE_SLACK = 0.005
+
+PERFORMANCE_REPEAT = 5
+
+SEED_SIZES = {'books': 500, 'students': 100, 'leases': 2000}
+
+
+ViewRequest = namedtuple(
+    'ViewRequest', ['name', 'user', 'budget', 'args', 'data', 'method'],
+    defaults=[(), None, 'get'])
+
+
+def calibrate():
+    """
+    Returns median time of fixed pure Python loop used to scale
+    baseline timings to speed of current machine.
+    """
+    timings = []
+    for _ in range(PERFORMANCE_REPEAT):
+        start = time.perf_counter()
+        sorted(str(number) for number in range(100000))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def url_names(patterns, namespace='main'):
+    """
+    Yields namespaced names of all named URL patterns.
+    """
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_names(pattern.url_patterns, namespace)
+        elif pattern.name:
+            yield '{}:{}'.format(namespace, pattern.name)
+
+
+class ViewPerformanceTests(TestCase):
+    """
+    Tests checking query budgets and response times of views.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        LibrarySeeder(seed=0).seed(**SEED_SIZES)
+        user_model = get_user_model()
+        cls.librarian = user_model.objects.get(username='seed_librarian_0')
+        cls.admin = user_model.objects.create_user(
+            username='seed_admin', email='seed_admin@example.com',
+            is_staff=True)
+        # Student with the longest lease history.
+        cls.student = user_model.objects.get(pk=Lease.objects.values(
+            'student').annotate(leases=Count('pk')).order_by(
+                '-leases').values('student')[:1])
+        cls.book = Book.objects.order_by('isbn').first()
+        cls.lease = Lease.objects.filter(
+            return_date__isnull=True).order_by('pk').first()
+        cls.job = ReportJob.objects.create(
+            requested_by=cls.librarian, status=ReportJob.Status.DONE,
+            file_name='report.xlsx')
+
+    def setUp(self):
+        report_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, report_root)
+        settings_override = override_settings(REPORT_ROOT=report_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        with open(os.path.join(report_root, 'report.xlsx'), 'wb') as file:
+            file.write(b'report')
+
+    def view_requests(self):
+        """
+        Returns list of ViewRequest of every URL of main app. Query budget
+        includes session and user queries made by middleware.
+        """
+        student = self.student
+        librarian = self.librarian
+        admin = self.admin
+        uid = urlsafe_base64_encode(force_bytes(student.pk))
+        token = default_token_generator.make_token(student)
+        return [
+            ViewRequest('main:index', student, 2),
+            ViewRequest('main:login', None, 0),
+            ViewRequest('main:logout', student, 4),
+            ViewRequest('main:password_change', student, 2),
+            ViewRequest('main:password_change_done', student, 2),
+            ViewRequest('main:password_reset', None, 0),
+            ViewRequest('main:password_reset_done', None, 0),
+            ViewRequest(
+                'main:password_reset_confirm', None, 1, [uid, token]),
+            ViewRequest('main:password_reset_complete', None, 0),
+            ViewRequest('main:activation_complete', None, 0),
+            ViewRequest('main:activate', None, 0, ['invalid']),
+            ViewRequest('main:register', None, 0),
+            ViewRequest('main:registration_complete', None, 0),
+            ViewRequest('main:registration_disallowed', None, 0),
+            ViewRequest('main:profile', student, 2),
+            ViewRequest('main:edit_profile', student, 2),
+            ViewRequest('main:admin', admin, 3),
+            ViewRequest('main:log_list', admin, 4),
+            ViewRequest('main:user_list', admin, 5),
+            ViewRequest('main:admin_profile', admin, 3, [student.pk]),
+            ViewRequest('main:block_user', admin, 3, [student.pk]),
+            ViewRequest('main:unblock_user', admin, 3, [student.pk]),
+            ViewRequest('main:select_theme', admin, 2),
+            ViewRequest('main:register_librarian', admin, 2),
+            ViewRequest('main:activate_librarian', None, 0, ['invalid']),
+            ViewRequest('main:student', student, 3),
+            ViewRequest('main:lease_history', student, 5),
+            ViewRequest('main:librarian', librarian, 4),
+            ViewRequest('main:books', librarian, 5),
+            ViewRequest('main:import_books', librarian, 2),
+            ViewRequest('main:new_book', librarian, 2),
+            ViewRequest('main:book_detail', librarian, 3, [self.book.pk]),
+            ViewRequest('main:edit_book', librarian, 3, [self.book.pk]),
+            ViewRequest('main:new_lease', librarian, 3, [self.book.pk]),
+            ViewRequest('main:leases', librarian, 5),
+            ViewRequest('main:bulk_lease', librarian, 2),
+            ViewRequest('main:bulk_return', librarian, 2),
+            ViewRequest(
+                'main:autocomplete_books', librarian, 3, data={'q': 'a'}),
+            ViewRequest(
+                'main:autocomplete_students', librarian, 4,
+                data={'q': 'a'}),
+            ViewRequest('main:lease_detail', librarian, 3, [self.lease.pk]),
+            ViewRequest('main:return_lease', librarian, 4, [self.lease.pk]),
+            ViewRequest('main:xlsx_report', librarian, 4),
+            ViewRequest(
+                'main:report', librarian, 3,
+                data={'format': 'csv', 'dataset': 'leases'}),
+            ViewRequest('main:request_report', librarian, 3, method='post'),
+            ViewRequest('main:report_job', librarian, 3, [self.job.pk]),
+            ViewRequest('main:download_report', librarian, 3, [self.job.pk]),
+        ]
+
+    def request(self, view):
+        """
+        Requests view as its user and reads whole response. Login is
+        made before request, so its queries are not counted.
+        """
+        if view.user is None:
+            self.client.logout()
+        else:
+            self.client.force_login(view.user)
+        url = reverse(view.name, args=view.args)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(self.client, view.method)(url, view.data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        response.close()
+        self.assertLess(response.status_code, 400, view.name)
+        return queries, elapsed
+
+    def test_every_url_is_requested(self):
+        """
+        Every named URL of main app has query budget.
+        """
+        self.assertCountEqual(
+            [view.name for view in self.view_requests()],
+            url_names(urls.urlpatterns))
+
+    def test_view_query_budgets(self):
+        """
+        If view is requested, it makes no more queries than its budget.
+        """
+        for view in self.view_requests():
+            with self.subTest(view=view.name):
+                # The first request fills per-process caches.
+                self.request(view)
+                queries, _ = self.request(view)
+                self.assertLessEqual(
+                    len(queries), view.budget, '\n'.join(
+                        query['sql'] for query in queries.captured_queries))
+
+    @skipUnless(PERFORMANCE_TIMINGS, "Set PERFORMANCE_TIMINGS=1 to run")
+    def test_view_timings(self):
+        """
+        If view is requested, its median response time is not much
+        slower than baseline time scaled to current machine.
+        """
+        calibration = calibrate()
+        timings = {}
+        for view in self.view_requests():
+            self.request(view)
+            timings[view.name] = statistics.median(
+                self.request(view)[1] for _ in range(PERFORMANCE_REPEAT))
+
+        if os.environ.get('PERFORMANCE_BASELINE_UPDATE'):
+            with open(PERFORMANCE_BASELINE, 'w') as file:
+                json.dump({
+                    'calibration': round(calibration, 6),
+                    'timings': {
+                        name: round(timing, 6)
+                        for name, timing in sorted(timings.items())},
+                }, file, indent=4)
+                file.write('\n')
+            return
+
+        with open(PERFORMANCE_BASELINE) as file:
+            baseline = json.load(file)
+        scale = calibration / baseline['calibration']
+        for name, timing in timings.items():
+            if name not in baseline['timings']:
+                continue
+            limit = (
+                baseline['timings'][name] * scale * PERFORMANCE_TOLERANCE
+                + PERFORMANCE_SLACK)
+            with self.subTest(view=name):
+                self.assertLessEqual(
+                    timing, limit,
+                    "{} took {:.1f} ms, limit is {:.1f} ms".format(
+                        name, timing * 1000, limit * 1000))
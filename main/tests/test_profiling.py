@@ -0,0 +1,171 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains tests of request profiling in main app.
+"""
+
+import json
+
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import TestCase, modify_settings, override_settings
+from django.urls import reverse
+
+from main.models import Book
+from main.profiling import RequestProfile, current_profile
+
+from .utils import create_librarian_user, librarian_credentials
+
+
+PROFILE_MIDDLEWARE = {'prepend': 'main.middleware.RequestProfileMiddleware'}
+
+
+class RequestProfileTests(TestCase):
+    """
+    Tests checking RequestProfile class.
+    """
+
+    def test_profile_counts_queries(self):
+        """
+        If queries are executed with profile as execute wrapper, they
+        are counted and only the slowest are kept.
+        """
+        profile = RequestProfile(slowest_queries=2)
+        with connection.execute_wrapper(profile):
+            for _ in range(3):
+                Book.objects.exists()
+            list(Book.objects.all())
+        profile.finish()
+        data = profile.as_dict()
+        self.assertEqual(data['sql_count'], 4)
+        self.assertEqual(data['audit_count'], 0)
+        self.assertEqual(len(data['slowest_queries']), 2)
+        durations = [query['ms'] for query in data['slowest_queries']]
+        self.assertEqual(durations, sorted(durations, reverse=True))
+        self.assertIn('main_book', data['slowest_queries'][0]['sql'])
+
+    def test_profile_counts_audit_queries(self):
+        """
+        Inserts and updates of audit log table are counted as audit,
+        reads of it are not.
+        """
+        profile = RequestProfile()
+        profile.add_query('INSERT INTO "django_admin_log" ...', 0.002)
+        profile.add_query('update `django_admin_log` SET ...', 0.002)
+        profile.add_query('SELECT 1', 0.001)
+        profile.add_query('SELECT * FROM "django_admin_log" ...', 0.001)
+        profile.finish()
+        self.assertEqual(profile.sql_count, 4)
+        self.assertEqual(profile.audit_count, 2)
+        self.assertIn('audit;dur=4.0', profile.server_timing())
+
+    def test_profile_measures_templates(self):
+        """
+        If template is rendered while profile is current, its rendering
+        time is measured once for nested renders.
+        """
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            with profile.template():
+                render_to_string('main/paginator.html')
+                self.assertEqual(profile.template_time, 0)
+            self.assertGreater(profile.template_time, 0)
+            rendered_time = profile.template_time
+            render_to_string('main/paginator.html')
+            self.assertGreater(profile.template_time, rendered_time)
+        finally:
+            current_profile.reset(token)
+        self.assertEqual(profile.template_depth, 0)
+
+
+@modify_settings(MIDDLEWARE=PROFILE_MIDDLEWARE)
+class RequestProfileMiddlewareTests(TestCase):
+    """
+    Tests checking RequestProfileMiddleware.
+    """
+
+    def setUp(self):
+        self.user = create_librarian_user()
+        self.client.login(**librarian_credentials)
+
+    def test_profile_header_and_log(self):
+        """
+        If request is sampled, Server-Timing header is sent to staff user
+        and profile is logged as JSON.
+        """
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertLogs('main.middleware', 'INFO') as logs:
+            response = self.client.get(reverse('main:books'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^sql;dur=[0-9.]+;desc="[1-9][0-9]* queries", '
+            r'template;dur=[0-9.]+, total;dur=[0-9.]+$')
+        data = json.loads(logs.records[0].getMessage().split(' ', 2)[2])
+        self.assertEqual(data, logs.records[0].profile)
+        self.assertEqual(data['path'], reverse('main:books'))
+        self.assertEqual(data['status'], 200)
+        self.assertGreater(data['sql_count'], 0)
+        self.assertGreater(data['template_ms'], 0)
+        self.assertGreaterEqual(data['total_ms'], data['template_ms'])
+
+    def test_profile_header_not_sent_to_non_staff(self):
+        """
+        If user is not staff, Server-Timing header is not sent, but
+        profile is logged.
+        """
+        with self.assertLogs('main.middleware', 'INFO'):
+            response = self.client.get(reverse('main:books'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_profile_counts_audit_writes(self):
+        """
+        If view writes audit log entry, its query is reported as audit.
+        """
+        with self.assertLogs('main.middleware', 'INFO') as logs:
+            self.client.post(reverse('main:new_book'), {
+                'isbn': '9780000000002',
+                'name': 'Test Book',
+                'authors': 'Author',
+                'count': 1
+            })
+        self.assertEqual(logs.records[0].profile['audit_count'], 1)
+
+    @override_settings(REQUEST_PROFILE_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_profiled(self):
+        """
+        If request is not sampled, it has no header and is not logged.
+        """
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('main.middleware', 'INFO'):
+                response = self.client.get(reverse('main:books'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(
+        REQUEST_PROFILE_LOG_THRESHOLD=60,
+        REQUEST_PROFILE_SERVER_TIMING=False)
+    def test_fast_request_is_not_logged(self):
+        """
+        If request is faster than log threshold, it is not logged, and
+        header is not sent if it is disabled.
+        """
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('main.middleware', 'INFO'):
+                response = self.client.get(reverse('main:books'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -0,0 +1,267 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains tests of background report generation in main app.
+"""
+
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+
+from main.models import ReportJob
+from main.reports import (
+    claim_next_job, purge_reports, report_path, request_report, run_job)
+
+from .utils import create_librarian_user, librarian_credentials
+
+
+class ReportTestCase(TestCase):
+    """
+    Test case storing reports in temporary directory.
+    """
+
+    def setUp(self):
+        self.report_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.report_root)
+        settings_override = override_settings(REPORT_ROOT=self.report_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.librarian_user = create_librarian_user()
+
+
+class RequestReportFuncTests(ReportTestCase):
+    """
+    Tests checking request_report() function.
+    """
+
+    def test_request_report_queues_job(self):
+        """
+        If no jobs exist, pending job is created.
+        """
+        job = request_report(self.librarian_user)
+        self.assertEqual(job.status, ReportJob.Status.PENDING)
+        self.assertEqual(job.requested_by, self.librarian_user)
+
+    def test_request_report_reuses_recent_job(self):
+        """
+        Identical report requested within TTL reuses existing job.
+        """
+        job = request_report(self.librarian_user)
+        self.assertEqual(request_report(self.librarian_user), job)
+        self.assertEqual(ReportJob.objects.count(), 1)
+
+    def test_request_report_does_not_reuse_expired_job(self):
+        """
+        Job older than TTL is not reused.
+        """
+        job = request_report(self.librarian_user)
+        ReportJob.objects.filter(pk=job.pk).update(
+            created_date=timezone.now() - timezone.timedelta(hours=1))
+        self.assertNotEqual(request_report(self.librarian_user), job)
+
+    def test_request_report_does_not_reuse_failed_job(self):
+        """
+        Failed job is not reused.
+        """
+        job = request_report(self.librarian_user)
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.Status.FAILED)
+        self.assertNotEqual(request_report(self.librarian_user), job)
+
+    def test_request_report_does_not_reuse_job_with_other_parameters(self):
+        """
+        Job of report in other language or time zone is not reused.
+        """
+        job = request_report(self.librarian_user)
+        with translation.override('en'):
+            self.assertNotEqual(request_report(self.librarian_user), job)
+        with timezone.override('Asia/Tokyo'):
+            self.assertNotEqual(request_report(self.librarian_user), job)
+        self.assertEqual(request_report(self.librarian_user), job)
+
+    def test_request_report_does_not_reuse_abandoned_job(self):
+        """
+        Job running longer than job timeout is not reused.
+        """
+        job = request_report(self.librarian_user)
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.Status.RUNNING,
+            started_date=timezone.now() - timezone.timedelta(hours=2))
+        self.assertNotEqual(request_report(self.librarian_user), job)
+
+
+class ReportWorkerTests(ReportTestCase):
+    """
+    Tests checking report job processing.
+    """
+
+    def test_claim_next_job_claims_oldest_pending_job(self):
+        """
+        Oldest pending job is marked as running and claimed once.
+        """
+        job = request_report(self.librarian_user)
+        claimed = claim_next_job()
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.status, ReportJob.Status.RUNNING)
+        self.assertIsNone(claim_next_job())
+
+    def test_claim_next_job_fails_abandoned_job(self):
+        """
+        Job left running by crashed worker is marked as failed.
+        """
+        job = request_report(self.librarian_user)
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.Status.RUNNING,
+            started_date=timezone.now() - timezone.timedelta(hours=2))
+        self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.FAILED)
+        self.assertIsNotNone(job.finished_date)
+
+    def test_run_job_writes_report(self):
+        """
+        Running job writes report file and marks job as done.
+        """
+        request_report(self.librarian_user)
+        job = claim_next_job()
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.DONE)
+        self.assertTrue(os.path.exists(report_path(job)))
+
+    def test_run_job_marks_failed_job(self):
+        """
+        If report can not be generated, job is marked as failed.
+        """
+        request_report(self.librarian_user, report_format='pdf')
+        job = claim_next_job()
+        with self.assertLogs('main.reports', 'ERROR'):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.FAILED)
+        self.assertNotEqual(job.error, '')
+
+    def test_worker_command_processes_pending_jobs(self):
+        """
+        Worker started with --once processes all pending jobs and exits.
+        """
+        job = request_report(self.librarian_user)
+        call_command('run_report_worker', '--once', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.DONE)
+
+    def test_purge_reports_deletes_old_jobs_and_files(self):
+        """
+        Jobs older than retention period are deleted with their files.
+        """
+        request_report(self.librarian_user)
+        job = claim_next_job()
+        run_job(job)
+        ReportJob.objects.filter(pk=job.pk).update(
+            created_date=timezone.now() - timezone.timedelta(days=2))
+        self.assertEqual(purge_reports(), 1)
+        self.assertFalse(os.path.exists(report_path(job)))
+
+
+class ReportViewsTests(ReportTestCase):
+    """
+    Tests checking report request, status and download views.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.credentials = {
+            'username': 'testuser',
+            'password': 'testpass'
+        }
+        get_user_model().objects.create_user(
+            **self.credentials,
+            email='test@example.com')
+
+    def test_request_report_view_post_no_librarian(self):
+        """
+        If user is not librarian, he is redirected to login page.
+        """
+        self.client.login(**self.credentials)
+        url = reverse('main:request_report')
+        response = self.client.post(url)
+        self.assertRedirects(
+            response,
+            reverse('main:login') + '?next=' + url)
+
+    def test_request_report_view_get_not_allowed(self):
+        """
+        Reports are requested only with POST.
+        """
+        self.client.login(**librarian_credentials)
+        response = self.client.get(reverse('main:request_report'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_request_report_view_post_redirects_to_job(self):
+        """
+        If librarian requests report, job is queued and status page is
+        shown.
+        """
+        self.client.login(**librarian_credentials)
+        response = self.client.post(reverse('main:request_report'))
+        job = ReportJob.objects.get()
+        self.assertRedirects(
+            response, reverse('main:report_job', args=[job.id]))
+
+    def test_report_job_view_polls_pending_job(self):
+        """
+        Pending job page refreshes itself.
+        """
+        job = request_report(self.librarian_user)
+        self.client.login(**librarian_credentials)
+        response = self.client.get(reverse('main:report_job', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'main/report_job.html')
+        self.assertContains(response, 'http-equiv="refresh"')
+
+    def test_download_report_view_returns_file(self):
+        """
+        Finished report is returned as attachment.
+        """
+        request_report(self.librarian_user)
+        job = claim_next_job()
+        run_job(job)
+        self.client.login(**librarian_credentials)
+        response = self.client.get(
+            reverse('main:download_report', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="Report.xlsx"')
+        self.assertGreater(len(b''.join(response.streaming_content)), 0)
+
+    def test_download_report_view_pending_job_not_found(self):
+        """
+        Unfinished report can not be downloaded.
+        """
+        job = request_report(self.librarian_user)
+        self.client.login(**librarian_credentials)
+        response = self.client.get(
+            reverse('main:download_report', args=[job.id]))
+        self.assertEqual(response.status_code, 404)
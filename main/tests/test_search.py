@@ -0,0 +1,154 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains tests of catalogue search in main app.
+"""
+
+import unittest
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from main.models import Book, Lease
+from main.search import is_ranked, search_books, search_leases
+from main.search_index import book_index
+from main.tests.utils import create_student_lease, create_student_user
+
+
+class SearchBooksTests(TestCase):
+    """
+    Tests checking search_books() function.
+    """
+
+    def setUp(self):
+        # Index follows committed changes only, so it is rebuilt from
+        # books of this test.
+        book_index.clear()
+        Book.objects.create(
+            isbn='9780000000002', name='Ocean Stories',
+            authors='Ivan Petrov', count=1)
+        Book.objects.create(
+            isbn='9780000000019', name='Dark River',
+            authors='Anna Ocean', count=1)
+        Book.objects.create(
+            isbn='9780000000026', name='Modern Physics',
+            authors='Boris Smirnov', count=1)
+
+    def search(self, query):
+        """
+        Returns ISBNs of books matching query.
+        """
+        return set(search_books(Book.objects.all(), query).values_list(
+            'isbn', flat=True))
+
+    def test_search_books_name_and_authors(self):
+        """
+        Books are matched by name and authors regardless of case.
+        """
+        self.assertEqual(
+            self.search('ocean'), {'9780000000002', '9780000000019'})
+        self.assertEqual(self.search('SMIRNOV'), {'9780000000026'})
+
+    def test_search_books_no_match(self):
+        """
+        If nothing matches, no books are returned.
+        """
+        self.assertEqual(self.search('Garden'), set())
+
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', "Full-text search requires "
+        "PostgreSQL")
+    def test_search_books_ranked(self):
+        """
+        Books matching by name rank above books matching by authors.
+        """
+        queryset = search_books(Book.objects.all(), 'ocean')
+        self.assertTrue(is_ranked(queryset))
+        self.assertEqual(
+            list(queryset.order_by('-search_rank').values_list(
+                'isbn', flat=True)),
+            ['9780000000002', '9780000000019'])
+
+
+class SearchLeasesTests(TestCase):
+    """
+    Tests checking search_leases() function.
+    """
+
+    def setUp(self):
+        create_student_user()
+        Book.objects.create(
+            isbn='9780000000002', name='Ocean Stories',
+            authors='Ivan Petrov', count=1)
+        Book.objects.create(
+            isbn='9780000000019', name='Dark River',
+            authors='Anna Ocean', count=1)
+        self.lease = create_student_lease('9780000000002')
+
+    def search(self, query):
+        """
+        Returns ids of leases matching query.
+        """
+        return set(search_leases(Lease.objects.all(), query).values_list(
+            'id', flat=True))
+
+    def test_search_leases_student_and_book(self):
+        """
+        Leases are matched by student and book regardless of case.
+        """
+        self.assertEqual(self.search('studentsurname'), {self.lease.id})
+        self.assertEqual(self.search('PETROV'), {self.lease.id})
+
+    def test_search_leases_no_match(self):
+        """
+        If nothing matches, no leases are returned.
+        """
+        self.assertEqual(self.search('River'), set())
+
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', "Trigram search requires "
+        "PostgreSQL")
+    @override_settings(SEARCH_MODE='trigram')
+    def test_search_leases_misspelled(self):
+        """
+        If trigram search is enabled, misspelled names still match.
+        """
+        queryset = search_leases(Lease.objects.all(), 'StudentSurnme')
+        self.assertTrue(is_ranked(queryset))
+        self.assertEqual(
+            set(queryset.values_list('id', flat=True)), {self.lease.id})
+
+
+class AutocompleteIndexTests(TestCase):
+    """
+    Tests checking expression indexes used by autocomplete.
+    """
+
+    def test_autocomplete_indexes_exist(self):
+        """
+        Indexes from migration 0010_autocomplete_indexes exist after all
+        migrations are applied.
+        """
+        with connection.cursor() as cursor:
+            indexes = set(connection.introspection.get_constraints(
+                cursor, 'main_book')) | set(
+                    connection.introspection.get_constraints(
+                        cursor, 'main_user'))
+        self.assertLessEqual(
+            {'main_book_name_lower_idx', 'main_user_username_lower_idx',
+             'main_user_last_name_lower_idx'},
+            indexes)
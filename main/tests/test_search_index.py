@@ -0,0 +1,237 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+This module contains tests of search index of books in main app.
+"""
+
+import os
+import tempfile
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from main.models import Book
+from main.search_index import (
+    BookIndex, book_index, index_path, save_at_exit, tokenize)
+
+from .utils import create_librarian_user, librarian_credentials
+
+
+class BookIndexTests(TestCase):
+    """
+    Tests checking BookIndex class.
+    """
+
+    def setUp(self):
+        Book.objects.create(
+            isbn='9780000000002', name='Ocean Stories',
+            authors='Ivan Petrov', count=1)
+        Book.objects.create(
+            isbn='9780000000019', name='Dark River',
+            authors='Anna Ocean', count=1)
+        Book.objects.create(
+            isbn='9780000000026', name='Modern Physics',
+            authors='Boris Smirnov', count=1)
+        self.index = BookIndex()
+        self.index.build('default')
+
+    def test_tokenize(self):
+        """
+        Text is split into case-folded words without punctuation.
+        """
+        self.assertEqual(
+            tokenize('Petrov, I. «ОКЕАН»'), ['petrov', 'i', 'океан'])
+
+    def test_search_words_and_prefixes(self):
+        """
+        Books are found by words and word prefixes regardless of case.
+        """
+        self.assertEqual(
+            self.index.search('OCEAN'), {'9780000000002', '9780000000019'})
+        self.assertEqual(self.index.search('smir'), {'9780000000026'})
+        self.assertEqual(self.index.search('cean'), set())
+        self.assertEqual(self.index.search('!!'), set())
+
+    def test_search_intersects_words(self):
+        """
+        Books are found only if they match every word of query.
+        """
+        self.assertEqual(
+            self.index.search('ocean ann'), {'9780000000019'})
+        self.assertEqual(self.index.search('ocean physics'), set())
+
+    def test_add_and_remove(self):
+        """
+        Changed books replace their words, removed books are not found.
+        """
+        self.index.add_book('9780000000002', 'Forest Stories', 'Ivan Petrov')
+        self.assertEqual(self.index.search('ocean'), {'9780000000019'})
+        self.assertEqual(self.index.search('forest'), {'9780000000002'})
+        self.index.remove('9780000000019')
+        self.assertEqual(self.index.search('ocean'), set())
+        self.assertNotIn('ocean', self.index.vocabulary)
+        self.assertEqual(self.index.vocabulary, sorted(self.index.postings))
+
+    def test_refresh_reads_changes_of_other_processes(self):
+        """
+        Refresh indexes changed books and rebuilds index if books were
+        deleted.
+        """
+        Book.objects.filter(pk='9780000000026').update(
+            name='Ocean Physics',
+            updated_date=self.index.watermark + timedelta(seconds=1))
+        self.index.refresh()
+        self.assertEqual(len(self.index.search('ocean')), 3)
+        Book.objects.filter(pk='9780000000002').delete()
+        self.index.refresh()
+        self.assertEqual(
+            self.index.search('ocean'), {'9780000000019', '9780000000026'})
+
+    def test_refresh_reads_late_commits(self):
+        """
+        Refresh indexes books saved before watermark but committed after
+        it, and books read again do not change index.
+        """
+        Book.objects.filter(pk='9780000000026').update(
+            name='Ocean Physics',
+            updated_date=self.index.watermark - timedelta(seconds=30))
+        self.index.dirty = False
+        self.index.refresh()
+        self.assertEqual(len(self.index.search('ocean')), 3)
+        self.index.dirty = False
+        self.index.refresh()
+        self.assertFalse(self.index.dirty)
+
+    def test_save_and_load(self):
+        """
+        Loaded index finds the same books as saved one.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index')
+            self.index.save(path)
+            index = BookIndex()
+            self.assertTrue(index.load(path))
+        self.assertEqual(index.documents, self.index.documents)
+        self.assertEqual(index.vocabulary, self.index.vocabulary)
+        self.assertEqual(index.watermark, self.index.watermark)
+        self.assertEqual(index.search('ocean'), self.index.search('ocean'))
+
+    def test_load_invalid_file(self):
+        """
+        If index file is missing or damaged, it is not loaded.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index')
+            self.assertFalse(BookIndex().load(path))
+            with open(path, 'wb') as file:
+                file.write(b'garbage')
+            self.assertFalse(BookIndex().load(path))
+
+    def test_index_path_of_test_database(self):
+        """
+        Index of in-memory or test database is not saved unless
+        SEARCH_INDEX_PATH is set.
+        """
+        self.assertIsNone(index_path('default'))
+        with override_settings(SEARCH_INDEX_PATH='/tmp/index'):
+            self.assertEqual(index_path('default'), '/tmp/index')
+
+    def test_save_at_exit_uses_loaded_path(self):
+        """
+        Changed index is saved at exit only to file it was loaded from.
+        """
+        state = book_index.path, book_index.dirty, book_index.checked_at
+        self.addCleanup(setattr, book_index, 'path', state[0])
+        self.addCleanup(setattr, book_index, 'dirty', state[1])
+        self.addCleanup(setattr, book_index, 'checked_at', state[2])
+        book_index.dirty = True
+        book_index.checked_at = 0
+        with tempfile.TemporaryDirectory() as directory:
+            book_index.path = None
+            save_at_exit()
+            self.assertEqual(os.listdir(directory), [])
+            book_index.path = os.path.join(directory, 'index')
+            save_at_exit()
+            self.assertEqual(os.listdir(directory), ['index'])
+        self.assertFalse(book_index.dirty)
+
+    def test_footprint(self):
+        """
+        Footprint grows with number of indexed books.
+        """
+        footprint = self.index.footprint()
+        self.index.add_book('9780000000033', 'Garden', 'Olga Sidorova')
+        self.assertGreater(self.index.footprint(), footprint)
+
+
+@override_settings(SEARCH_MODE='index')
+class BookIndexSearchTests(TransactionTestCase):
+    """
+    Tests checking catalogue search by search index. Index follows
+    committed changes, so transactions are committed.
+    """
+
+    def setUp(self):
+        book_index.clear()
+        self.addCleanup(book_index.clear)
+        create_librarian_user()
+        Book.objects.create(
+            isbn='9780000000002', name='Ocean Stories',
+            authors='Ivan Petrov', count=1)
+        self.client.login(**librarian_credentials)
+
+    def search(self, query):
+        """
+        Returns ISBNs of books shown by book list for query.
+        """
+        response = self.client.get(reverse('main:books'), {'q': query})
+        return {book.isbn for book in response.context['object_list']}
+
+    def test_search_follows_book_changes(self):
+        """
+        Created, changed and deleted books are reflected in search.
+        """
+        self.assertEqual(self.search('ocean'), {'9780000000002'})
+        book = Book.objects.create(
+            isbn='9780000000019', name='Dark River',
+            authors='Anna Ocean', count=1)
+        self.assertTrue(book_index.loaded)
+        self.assertEqual(
+            self.search('ocean'), {'9780000000002', '9780000000019'})
+        book.name = 'Dark Ocean'
+        book.authors = 'Anna Petrova'
+        book.save()
+        self.assertEqual(self.search('ocean dark'), {'9780000000019'})
+        book.delete()
+        self.assertEqual(self.search('ocean'), {'9780000000002'})
+
+    def test_rolled_back_changes_are_not_indexed(self):
+        """
+        If transaction is rolled back, its changes do not reach index.
+        """
+        self.assertEqual(self.search('ocean'), {'9780000000002'})
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Book.objects.create(
+                    isbn='9780000000019', name='Dark River',
+                    authors='Anna Ocean', count=1)
+                raise ValueError
+        self.assertNotIn('9780000000019', book_index.documents)
+        self.assertEqual(book_index.search('river'), set())
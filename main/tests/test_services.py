@@ -0,0 +1,276 @@
+# Library Management System
+# Copyright (C) 2020 Andrey Shmaykhel, Alexander Solovyov, Timur Allayarov
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+This module contains tests of services in main app.
+"""
+
+from unittest import mock
+
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from main.benchmarks import issue_concurrently
+from main.models import Book, Lease
+from main.services import (
+    ALREADY_RETURNED, INVALID, NOT_FOUND, RETURNED, BookNotAvailableError,
+    issue_lease, issue_leases, return_leases)
+
+from .utils import student_credentials
+
+
+class IssueLeaseTests(TestCase):
+    """
+    Tests checking issue_lease() service.
+    """
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            isbn='9780000000002',
+            name='Test Book',
+            count=1)
+
+        self.student_user = get_user_model().objects.create_user(
+            **student_credentials)
+        group = Group.objects.get_or_create(name="Student")[0]
+        self.student_user.groups.add(group)
+
+        self.expire_date = (
+            timezone.now() + timezone.timedelta(days=30)).date()
+
+    def test_issue_lease_creates_lease(self):
+        """
+        If book is available, lease is created and counted.
+        """
+        lease = issue_lease(self.student_user, self.book, self.expire_date)
+        self.assertEqual(lease.student, self.student_user)
+        self.assertEqual(lease.book, self.book)
+        self.assertEqual(
+            Book.objects.get(pk=self.book.pk).leased_count, 1)
+
+    def test_issue_lease_uses_current_availability(self):
+        """
+        Stale book instance does not allow issuing unavailable book.
+        """
+        issue_lease(self.student_user, self.book, self.expire_date)
+        with self.assertRaises(BookNotAvailableError):
+            issue_lease(self.student_user, self.book, self.expire_date)
+        self.assertEqual(Lease.objects.count(), 1)
+
+    def test_issue_lease_locks_book(self):
+        """
+        Book row is locked while lease is issued. SQLite has
+        no row locks, so locking is checked on queryset, and concurrency
+        tests check it on databases that support it.
+        """
+        with mock.patch.object(
+                QuerySet, 'select_for_update', autospec=True,
+                side_effect=QuerySet.select_for_update) as select_for_update:
+            issue_lease(self.student_user, self.book, self.expire_date)
+        select_for_update.assert_called_once()
+        queryset = select_for_update.call_args[0][0]
+        self.assertIs(queryset.model, Book)
+
+
+class IssueLeasesTests(TestCase):
+    """
+    Tests checking issue_leases() service.
+    """
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            isbn='9780000000002',
+            name='Test Book',
+            count=3)
+        self.other_book = Book.objects.create(
+            isbn='9780000000019',
+            name='Test Book 2',
+            count=1)
+
+        group = Group.objects.get_or_create(name="Student")[0]
+        self.students = []
+        for number in range(3):
+            student = get_user_model().objects.create_user(
+                username='student{}'.format(number),
+                email='student{}@example.com'.format(number))
+            student.groups.add(group)
+            self.students.append(student)
+
+        self.expire_date = (
+            timezone.now() + timezone.timedelta(days=30)).date()
+
+    def test_issue_leases_class_set(self):
+        """
+        If book has enough copies, it is leased to every student with
+        constant number of queries.
+        """
+        with self.assertNumQueries(5):
+            leases = issue_leases(
+                self.students, [self.book], self.expire_date)
+        self.assertEqual(len(leases), 3)
+        self.assertEqual(
+            set(Lease.objects.values_list('student', flat=True)),
+            {student.pk for student in self.students})
+        self.assertEqual(Book.objects.get(pk=self.book.pk).leased_count, 3)
+
+    def test_issue_leases_many_books(self):
+        """
+        Many books are leased to one student.
+        """
+        issue_leases(
+            self.students[:1], [self.book, self.other_book],
+            self.expire_date)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).leased_count, 1)
+        self.assertEqual(
+            Book.objects.get(pk=self.other_book.pk).leased_count, 1)
+
+    def test_issue_leases_not_enough_copies(self):
+        """
+        If any book has not enough copies, nothing is issued.
+        """
+        with self.assertRaises(BookNotAvailableError) as context:
+            issue_leases(
+                self.students, [self.other_book], self.expire_date)
+        self.assertEqual(context.exception.args, (self.other_book.pk,))
+        self.assertEqual(Lease.objects.count(), 0)
+        self.assertEqual(
+            Book.objects.get(pk=self.other_book.pk).leased_count, 0)
+
+    def test_issue_leases_returned_lease_releases_copy(self):
+        """
+        Returning lease issued in batch releases exactly one copy.
+        """
+        lease = issue_leases(
+            self.students, [self.book], self.expire_date)[0]
+        lease.return_date = timezone.now()
+        lease.save()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).leased_count, 2)
+
+    def test_issue_leases_many_students_and_books(self):
+        """
+        Many books can not be leased to many students at once.
+        """
+        with self.assertRaises(ValueError):
+            issue_leases(
+                self.students, [self.book, self.other_book],
+                self.expire_date)
+
+
+class ReturnLeasesTests(TestCase):
+    """
+    Tests checking return_leases() service.
+    """
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            isbn='9780000000002',
+            name='Test Book',
+            count=3)
+        self.other_book = Book.objects.create(
+            isbn='9780000000019',
+            name='Test Book 2',
+            count=1)
+
+        group = Group.objects.get_or_create(name="Student")[0]
+        self.students = []
+        for number in range(2):
+            student = get_user_model().objects.create_user(
+                username='student{}'.format(number),
+                email='student{}@example.com'.format(number))
+            student.groups.add(group)
+            self.students.append(student)
+
+        today = timezone.now().date()
+        self.late_lease, self.early_lease = issue_leases(
+            self.students, [self.book], today + timezone.timedelta(days=30))
+        Lease.objects.filter(pk=self.early_lease.pk).update(
+            expire_date=today + timezone.timedelta(days=10))
+        self.other_lease = issue_lease(
+            self.students[0], self.other_book,
+            today + timezone.timedelta(days=30))
+
+    def test_return_leases_by_id_and_isbn(self):
+        """
+        Leases are returned by ID and by ISBN with constant number of
+        queries, and results follow order of codes.
+        """
+        with self.assertNumQueries(5):
+            results = return_leases([
+                str(self.other_lease.pk), '978-0-00-000000-2', 'garbage',
+                str(self.other_lease.pk), '9780000000026'])
+        self.assertEqual(
+            [(result.status, result.lease and result.lease.pk)
+             for result in results],
+            [(RETURNED, self.other_lease.pk),
+             (RETURNED, self.early_lease.pk),
+             (INVALID, None),
+             (ALREADY_RETURNED, self.other_lease.pk),
+             (NOT_FOUND, None)])
+        self.assertFalse(Lease.objects.get(pk=self.other_lease.pk).is_active())
+        self.assertTrue(Lease.objects.get(pk=self.late_lease.pk).is_active())
+        self.assertEqual(Book.objects.get(pk=self.book.pk).leased_count, 1)
+        self.assertEqual(
+            Book.objects.get(pk=self.other_book.pk).leased_count, 0)
+
+    def test_return_leases_same_isbn_many_times(self):
+        """
+        Every scan of ISBN returns another lease of the book.
+        """
+        results = return_leases(['9780000000002'] * 3)
+        self.assertEqual(
+            [result.status for result in results],
+            [RETURNED, RETURNED, NOT_FOUND])
+        self.assertEqual(Book.objects.get(pk=self.book.pk).leased_count, 0)
+
+    def test_return_leases_of_student(self):
+        """
+        If student is given, ISBN returns lease of that student.
+        """
+        results = return_leases(['9780000000002'], self.students[0])
+        self.assertEqual(results[0].lease.pk, self.late_lease.pk)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class IssueLeaseConcurrencyTests(TransactionTestCase):
+    """
+    Stress tests checking issue_lease() service under concurrent load.
+    """
+
+    def test_concurrent_issues_do_not_over_issue(self):
+        """
+        If many threads lease the same book, no more leases than copies
+        are created.
+        """
+        book = Book.objects.create(
+            isbn='9780000000002',
+            name='Test Book',
+            count=5)
+        get_user_model().objects.bulk_create([
+            get_user_model()(
+                username='student{}'.format(i),
+                email='student{}@example.com'.format(i))
+            for i in range(40)])
+        students = list(get_user_model().objects.all())
+
+        results = issue_concurrently(book, students, threads=8)
+
+        self.assertEqual(results['issued'], 5)
+        self.assertEqual(results['rejected'], 35)
+        self.assertEqual(Lease.objects.filter(book=book).count(), 5)
+        self.assertEqual(Book.objects.get(pk=book.pk).leased_count, 5)
@@ -27,6 +27,9 @@ from django.contrib.auth import views as auth_views
 from main import views
 
 
+REPORT_JOB_ID = '2a1e4bb6-2d1f-4a4a-9b5c-6b7f0e1d2c3b'
+
+
 class UrlsTests(SimpleTestCase):
     """
     Tests checking URL to view resolution.
@@ -108,6 +111,13 @@ class UrlsTests(SimpleTestCase):
         url = reverse('main:book_detail', args=['9780000000002'])
         self.assertEqual(resolve(url).func.view_class, views.BookDetailView)
 
+    def test_import_books_view_resolves(self):
+        """
+        main:import_books URL resolves to BookImportView view.
+        """
+        url = reverse('main:import_books')
+        self.assertEqual(resolve(url).func.view_class, views.BookImportView)
+
     def test_new_lease_view_resolves(self):
         """
         main:new_lease URL resolves to new_lease view.
@@ -147,6 +157,49 @@ class UrlsTests(SimpleTestCase):
         url = reverse('main:xlsx_report')
         self.assertEqual(resolve(url).func, views.xlsx_report)
 
+    def test_report_view_resolves(self):
+        """
+        main:report URL resolves to report view.
+        """
+        url = reverse('main:report')
+        self.assertEqual(resolve(url).func, views.report)
+
+    def test_request_report_view_resolves(self):
+        """
+        main:request_report URL resolves to request_report_job view.
+        """
+        url = reverse('main:request_report')
+        self.assertEqual(resolve(url).func, views.request_report_job)
+
+    def test_report_job_view_resolves(self):
+        """
+        main:report_job URL resolves to report job view.
+        """
+        url = reverse('main:report_job', args=[REPORT_JOB_ID])
+        self.assertEqual(resolve(url).func.view_class, views.ReportJobView)
+
+    def test_download_report_view_resolves(self):
+        """
+        main:download_report URL resolves to download_report view.
+        """
+        url = reverse('main:download_report', args=[REPORT_JOB_ID])
+        self.assertEqual(resolve(url).func, views.download_report)
+
+    def test_autocomplete_books_view_resolves(self):
+        """
+        main:autocomplete_books URL resolves to autocomplete_book view.
+        """
+        url = reverse('main:autocomplete_books')
+        self.assertEqual(resolve(url).func, views.autocomplete_book)
+
+    def test_autocomplete_students_view_resolves(self):
+        """
+        main:autocomplete_students URL resolves to autocomplete_student
+        view.
+        """
+        url = reverse('main:autocomplete_students')
+        self.assertEqual(resolve(url).func, views.autocomplete_student)
+
 
 class AuthUrlsTests(SimpleTestCase):
     """
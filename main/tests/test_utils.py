@@ -18,7 +18,9 @@
 This module contains tests of utility functions in main app.
 """
 
-from openpyxl import Workbook
+from io import BytesIO
+
+from openpyxl import Workbook, load_workbook
 
 from django.test import TestCase
 from django.utils import timezone
@@ -26,7 +28,9 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.utils.translation import gettext as _
 
-from main.utils import build_xlsx, build_books_sheet, build_leases_sheet
+from main.utils import (
+    build_xlsx, build_books_sheet, build_leases_sheet, format_isbn,
+    make_report_cursor, parse_report_since, parse_user_id)
 from main.models import Book
 
 from .utils import isbn_list_6, student_credentials, create_student_lease
@@ -37,12 +41,15 @@ class BuildXlsxFuncTests(TestCase):
     Tests checking build_xlsx() function.
     """
 
-    def test_build_xlsx_returnes_valid_workbook(self):
+    def test_build_xlsx_returns_valid_workbook(self):
         """
-        build_xlsx() returnes workbook with 2 worksheets: Books and
-        Leases.
+        build_xlsx() returns workbook which is saved and loaded back with
+        2 worksheets: Books and Leases.
         """
-        workbook = build_xlsx()
+        file = BytesIO()
+        build_xlsx().save(file)
+        file.seek(0)
+        workbook = load_workbook(file)
         self.assertEqual(len(workbook.sheetnames), 2)
         self.assertEqual(workbook.sheetnames[0], _("Books"))
         self.assertEqual(workbook.sheetnames[1], _("Leases"))
@@ -88,7 +95,8 @@ class BuildBooksSheetFuncTests(TestCase):
         self.assertEqual(worksheet['C4'].value, "9780000000026")
         self.assertGreater(
             worksheet['D5'].value,
-            timezone.now() - timezone.timedelta(minutes=1))
+            timezone.localtime().replace(tzinfo=None)
+            - timezone.timedelta(minutes=1))
         self.assertEqual(worksheet['E6'].value, 5)
 
 
@@ -147,8 +155,96 @@ class BuildLeasesSheetFuncTests(TestCase):
         self.assertEqual(worksheet['C4'].value, "978-0-00-000002-6")
         self.assertGreater(
             worksheet['D5'].value,
-            timezone.now() - timezone.timedelta(minutes=1))
+            timezone.localtime().replace(tzinfo=None)
+            - timezone.timedelta(minutes=1))
         self.assertEqual(
             worksheet['E6'].value,
             (timezone.now() + timezone.timedelta(days=30)).date())
         self.assertIsNone(worksheet['F7'].value)
+
+    def test_build_leases_sheet_query_count_is_constant(self):
+        """
+        Leases sheet is built with one query regardless of lease count.
+        """
+        student_user = get_user_model().objects.create_user(
+            **student_credentials)
+        student_group = Group.objects.get_or_create(name="Student")[0]
+        student_user.groups.add(student_group)
+
+        for count, isbn in enumerate(isbn_list_6, start=1):
+            Book.objects.create(isbn=isbn, name=isbn, count=count)
+            create_student_lease(isbn)
+            worksheet = Workbook().active
+            with self.assertNumQueries(1):
+                build_leases_sheet(worksheet)
+            self.assertEqual(worksheet.max_row, count + 1)
+
+
+class FormatIsbnFuncTests(TestCase):
+    """
+    Tests checking format_isbn() function.
+    """
+
+    def test_format_isbn_is_memoized(self):
+        """
+        Repeated ISBN is formatted once.
+        """
+        format_isbn.cache_clear()
+        self.assertEqual(
+            [format_isbn(isbn) for isbn in ['9780000000002'] * 3],
+            ['978-0-00-000000-2'] * 3)
+        self.assertEqual(format_isbn.cache_info().misses, 1)
+        self.assertEqual(format_isbn.cache_info().hits, 2)
+
+
+class ParseUserIdFuncTests(TestCase):
+    """
+    Tests checking parse_user_id() function.
+    """
+
+    def test_parse_user_id(self):
+        """
+        Only ASCII digits within range of primary key are user ids.
+        """
+        self.assertEqual(parse_user_id(' 42 '), 42)
+        self.assertEqual(parse_user_id('2147483647'), 2147483647)
+        for value in ('', '0', '-1', '4.2', '²', '٤٢', '2147483648',
+                      '99999999999999999999999', 'student'):
+            self.assertIsNone(parse_user_id(value))
+
+
+class ParseReportSinceFuncTests(TestCase):
+    """
+    Tests checking parse_report_since() function.
+    """
+
+    def test_parse_report_since_empty(self):
+        """
+        If neither since nor cursor is given, None is returned.
+        """
+        self.assertIsNone(parse_report_since())
+
+    def test_parse_report_since_naive_timestamp(self):
+        """
+        If timestamp has no time zone, current time zone is assumed.
+        """
+        since = parse_report_since('2021-01-01T10:00:00')
+        self.assertEqual(since, timezone.make_aware(
+            timezone.datetime(2021, 1, 1, 10)))
+
+    def test_parse_report_since_cursor(self):
+        """
+        If cursor is given, its watermark is returned.
+        """
+        until = timezone.now()
+        self.assertEqual(
+            parse_report_since(cursor=make_report_cursor(until)), until)
+
+    def test_parse_report_since_invalid(self):
+        """
+        If timestamp or cursor is malformed, ValueError is raised.
+        """
+        with self.assertRaises(ValueError):
+            parse_report_since('yesterday')
+        with self.assertRaises(ValueError):
+            parse_report_since(cursor='invalid')
@@ -20,7 +20,11 @@ This module contains tests checking common views in main app.
 
 import os
 
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from main.tests.utils import (
@@ -147,6 +151,75 @@ class UserListViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'main/user_list.html')
 
+    def create_users(self, count, group_name, is_active=True):
+        """
+        Creates users in given group.
+        """
+        group = Group.objects.get_or_create(name=group_name)[0]
+        start = get_user_model().objects.count()
+        for number in range(start, start + count):
+            user = get_user_model().objects.create_user(
+                username='user{}'.format(number),
+                email='user{}@example.com'.format(number),
+                password='testpass', is_active=is_active)
+            user.groups.add(group)
+
+    def get_page(self, data=None):
+        """
+        Returns response and number of queries executed.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, data)
+        return response, len(queries)
+
+    def test_user_list_view_get_constant_queries(self):
+        """
+        Number of queries does not depend on number of users.
+        """
+        self.client.login(**admin_credentials)
+        self.create_users(12, 'Librarian')
+        response, few_queries = self.get_page()
+        self.assertContains(response, 'Librarian')
+        self.create_users(20, 'Librarian')
+        self.create_users(20, 'Student')
+        response, many_queries = self.get_page()
+        self.assertEqual(few_queries, many_queries)
+
+    def test_user_list_view_get_filter_role(self):
+        """
+        If role is given, only users with this role are listed.
+        """
+        self.client.login(**admin_credentials)
+        self.create_users(2, 'Librarian')
+        self.create_users(3, 'Student')
+        response = self.client.get(self.url, {'role': 'librarian'})
+        self.assertEqual(len(response.context['user_list']), 2)
+        self.assertTrue(all(
+            user.role() == 'Librarian'
+            for user in response.context['user_list']))
+
+    def test_user_list_view_get_filter_active(self):
+        """
+        If active status is given, only users with this status are
+        listed.
+        """
+        self.client.login(**admin_credentials)
+        self.create_users(2, 'Student', is_active=False)
+        response = self.client.get(self.url, {'active': 'no'})
+        self.assertEqual(len(response.context['user_list']), 2)
+
+    def test_user_list_view_get_sort_role(self):
+        """
+        If users are sorted by role, administrators go first.
+        """
+        self.client.login(**admin_credentials)
+        self.create_users(2, 'Librarian')
+        response = self.client.get(self.url, {'sort': 'role'})
+        roles = [user.role() for user in response.context['user_list']]
+        self.assertEqual(
+            roles,
+            ['Administrator', 'Librarian', 'Librarian', 'Student'])
+
 
 class AdminProfileViewTests(TestCase):
     """
@@ -18,13 +18,23 @@
 This module contains tests checking views in main app.
 """
 
-from django.test import TestCase
+import csv
+import json
+from io import BytesIO, StringIO
+
+from openpyxl import load_workbook
+
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
+from django.contrib.admin.models import LogEntry
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from django.utils.translation import gettext as _
 
 from main.models import Book, Lease
+from main.search_index import book_index
 
 from .utils import (
     isbn_list_6, isbn_list_3_1, isbn_list_3_2, student_credentials,
@@ -521,6 +531,68 @@ class NewBookViewTests(TestCase):
         self.assertGreater(len(response.context['form'].errors), 0)
 
 
+class BookImportViewTests(TestCase):
+    """
+    Tests checking book import view functionality.
+    """
+
+    def setUp(self):
+        self.librarian_credentials = {
+            'username': 'librarian',
+            'password': 'testpass'
+        }
+        librarian_user = get_user_model().objects.create_user(
+            **self.librarian_credentials,
+            email='librarian@example.com')
+        group = Group.objects.get_or_create(name="Librarian")[0]
+        librarian_user.groups.add(group)
+
+        self.url = reverse('main:import_books')
+
+    def test_import_books_view_get_no_login(self):
+        """
+        If user is not authenticated, he is redirected to login page.
+        """
+        response = self.client.get(self.url)
+        self.assertRedirects(
+            response,
+            reverse('main:login') + '?next=' + self.url)
+
+    def test_import_books_view_post_imports_books(self):
+        """
+        If CSV file is uploaded, books are imported and result with
+        rejected rows is shown.
+        """
+        self.client.login(**self.librarian_credentials)
+        content = 'isbn,name,count\n{},Book,2\nbad,Book,1\n'.format(
+            isbn_list_3_1[0])
+        response = self.client.post(self.url, {
+            'file': SimpleUploadedFile('books.csv', content.encode()),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'], (1, 0, 1))
+        self.assertEqual(
+            response.context['rejected_rows'],
+            [(3, _("Invalid ISBN"), ['bad', 'Book', '1'])])
+        self.assertEqual(Book.objects.get(pk=isbn_list_3_1[0]).count, 2)
+
+    def test_import_books_view_post_invalid_file(self):
+        """
+        If file has unknown extension or no required columns, error is
+        shown and nothing is imported.
+        """
+        self.client.login(**self.librarian_credentials)
+        for name, content in (('books.txt', b'isbn,name\n'),
+                              ('books.csv', b'title\nBook\n')):
+            response = self.client.post(self.url, {
+                'file': SimpleUploadedFile(name, content),
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['form'].errors)
+            self.assertNotIn('result', response.context)
+        self.assertFalse(Book.objects.exists())
+
+
 class BookListViewTests(TestCase):
     """
     Tests checking book list view functionality.
@@ -575,6 +647,17 @@ class BookListViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'main/book_list.html')
 
+    def test_book_list_view_search_autocomplete(self):
+        """
+        Search field suggests book names by autocomplete view.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.url)
+        self.assertContains(
+            response, 'data-autocomplete-url="{}"'.format(
+                reverse('main:autocomplete_books')))
+        self.assertContains(response, 'main/js/autocomplete.js')
+
     def test_book_list_view_get_no_books(self):
         """
         If no books exist, no books are shown.
@@ -748,6 +831,27 @@ class NewLeaseViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'main/new_lease.html')
 
+    def test_new_lease_view_get_does_not_list_students(self):
+        """
+        Students are not rendered into page, so number of queries does
+        not depend on number of students.
+        """
+        self.client.login(**self.librarian_credentials)
+        student_group = Group.objects.get(name="Student")
+        self.client.get(self.url)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        for number in range(20):
+            get_user_model().objects.create_user(
+                username='reader{}'.format(number),
+                email='reader{}@example.com'.format(number),
+            ).groups.add(student_group)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertNotContains(response, '<option')
+        self.assertContains(
+            response, reverse('main:autocomplete_students'))
+
     def test_new_lease_view_post_adds_new_lease(self):
         """
         If valid POST request is sent, new lease is added.
@@ -776,6 +880,116 @@ class NewLeaseViewTests(TestCase):
         self.assertGreater(len(response.context['form'].errors), 0)
 
 
+class BulkLeaseViewTests(TestCase):
+    """
+    Tests checking bulk lease view functionality.
+    """
+
+    def setUp(self):
+        self.librarian_credentials = {
+            'username': 'librarian',
+            'password': 'testpass'
+        }
+        librarian_user = get_user_model().objects.create_user(
+            **self.librarian_credentials,
+            email='librarian@example.com')
+        librarian_group = Group.objects.get_or_create(name="Librarian")[0]
+        librarian_user.groups.add(librarian_group)
+
+        student_group = Group.objects.get_or_create(name="Student")[0]
+        self.students = []
+        for number in range(3):
+            student = get_user_model().objects.create_user(
+                username='reader{}'.format(number),
+                email='reader{}@example.com'.format(number))
+            student.groups.add(student_group)
+            self.students.append(student)
+
+        Book.objects.create(
+            isbn='9780000000002',
+            name='Test Book',
+            authors='Author',
+            count=3)
+        Book.objects.create(
+            isbn='9780000000019',
+            name='Test Book 2',
+            authors='Author',
+            count=1)
+
+        self.url = reverse('main:bulk_lease')
+        self.expire_date = str(
+            (timezone.now() + timezone.timedelta(days=30)).date())
+
+    def test_bulk_lease_view_get_no_login(self):
+        """
+        If user is not authenticated, he is redirected to login page.
+        """
+        response = self.client.get(self.url)
+        self.assertRedirects(
+            response,
+            reverse('main:login') + '?next=' + self.url)
+
+    def test_bulk_lease_view_get_prefills_book(self):
+        """
+        Book given in query string is filled in.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.url, {'book': '9780000000002'})
+        self.assertTemplateUsed(response, 'main/bulk_lease.html')
+        self.assertEqual(
+            response.context['form'].initial['books'], '9780000000002')
+
+    def test_bulk_lease_view_post_class_set(self):
+        """
+        If book has enough copies, it is leased to every student and one
+        audit log entry is written.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.post(self.url, {
+            'students': '{}\nreader1, reader2'.format(self.students[0].pk),
+            'books': '978-0-00-000000-2',
+            'expire_date': self.expire_date,
+        })
+        self.assertRedirects(response, reverse('main:leases'))
+        self.assertEqual(
+            Lease.objects.filter(book='9780000000002').count(), 3)
+        self.assertEqual(
+            Book.objects.get(pk='9780000000002').leased_count, 3)
+        entry = LogEntry.objects.get()
+        self.assertEqual(entry.object_id, '9780000000002')
+        self.assertEqual(entry.change_message, '3 new leases')
+
+    def test_bulk_lease_view_post_not_enough_copies(self):
+        """
+        If book has not enough copies, form is shown with error and
+        nothing is leased.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.post(self.url, {
+            'students': 'reader0 reader1',
+            'books': '9780000000019',
+            'expire_date': self.expire_date,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('books', response.context['form'].errors)
+        self.assertEqual(Lease.objects.count(), 0)
+
+    def test_bulk_lease_view_post_unknown_values(self):
+        """
+        If students or books are not found, form is shown with errors.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.post(self.url, {
+            'students': 'reader0 librarian',
+            'books': '9780000000026 123',
+            'expire_date': self.expire_date,
+        })
+        errors = response.context['form'].errors
+        self.assertIn('librarian', errors['students'][0])
+        self.assertIn('123', errors['books'][0])
+        self.assertEqual(Lease.objects.count(), 0)
+
+
 class LeaseListViewTests(TestCase):
     """
     Tests checking lease list view functionality.
@@ -1052,6 +1266,97 @@ class ReturnLeaseViewTests(TestCase):
         self.assertFalse(Lease.objects.get(pk=self.lease.id).is_active())
 
 
+class BulkReturnViewTests(TestCase):
+    """
+    Tests checking bulk return view functionality.
+    """
+
+    def setUp(self):
+        self.librarian_credentials = {
+            'username': 'librarian',
+            'password': 'testpass'
+        }
+        librarian_user = get_user_model().objects.create_user(
+            **self.librarian_credentials,
+            email='librarian@example.com')
+        librarian_group = Group.objects.get_or_create(name="Librarian")[0]
+        librarian_user.groups.add(librarian_group)
+
+        self.student_user = get_user_model().objects.create_user(
+            **student_credentials,
+            email='student@example.com')
+        student_group = Group.objects.get_or_create(name="Student")[0]
+        self.student_user.groups.add(student_group)
+
+        for isbn in isbn_list_3_1:
+            Book.objects.create(isbn=isbn, name=isbn, count=1)
+            create_student_lease(isbn)
+        self.lease = Lease.objects.get(book=isbn_list_3_1[0])
+
+        self.url = reverse('main:bulk_return')
+
+    def test_bulk_return_view_get_no_login(self):
+        """
+        If user is not authenticated, he is redirected to login page.
+        """
+        response = self.client.get(self.url)
+        self.assertRedirects(
+            response,
+            reverse('main:login') + '?next=' + self.url)
+
+    def test_bulk_return_view_post_returns_leases(self):
+        """
+        If codes are sent, leases are returned, results are shown and
+        every return is audited.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.post(self.url, {
+            'codes': '{}\n{}\n{}\nunknown'.format(
+                self.lease.pk, isbn_list_3_1[1], isbn_list_3_1[2]),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'main/bulk_return.html')
+        self.assertEqual(
+            [result.status for result in response.context['results']],
+            ['returned', 'returned', 'returned', 'invalid'])
+        self.assertFalse(Lease.objects.filter(return_date=None).exists())
+        self.assertEqual(
+            LogEntry.objects.filter(
+                change_message='Lease returned').count(), 3)
+
+    def test_bulk_return_view_post_json(self):
+        """
+        If JSON request is sent, results are returned as JSON.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.post(
+            self.url, json.dumps({
+                'codes': [str(self.lease.pk), str(self.lease.pk)],
+                'student': self.student_user.pk,
+            }), content_type='application/json')
+        self.assertEqual(response.json(), {'results': [
+            {'code': str(self.lease.pk), 'status': 'returned',
+             'lease': str(self.lease.pk)},
+            {'code': str(self.lease.pk), 'status': 'already_returned',
+             'lease': str(self.lease.pk)},
+        ]})
+
+    def test_bulk_return_view_post_json_invalid(self):
+        """
+        If JSON request is malformed or has no codes, bad request is
+        returned.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.post(
+            self.url, 'codes', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            self.url, json.dumps({'codes': []}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('codes', response.json()['errors'])
+
+
 class XlsxReportViewTests(TestCase):
     """
     Tests checking XLSX report view functionality.
@@ -1108,3 +1413,375 @@ class XlsxReportViewTests(TestCase):
         self.assertEqual(
             response['Content-Disposition'],
             'attachment; filename = "Report.xlsx"')
+
+    def test_xlsx_report_view_get_streams_valid_workbook(self):
+        """
+        If data exists, report is streamed as readable workbook.
+        """
+        student_user = get_user_model().objects.create_user(
+            **student_credentials,
+            email='student@example.com')
+        Book.objects.create(
+            isbn='9780000000002', name='Test Book', authors='Author',
+            count=1)
+        lease = create_student_lease('9780000000002')
+
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        workbook = load_workbook(
+            BytesIO(b''.join(response.streaming_content)), read_only=True)
+        books = list(workbook[_("Books")].values)
+        leases = list(workbook[_("Leases")].values)
+        self.assertEqual(len(books), 2)
+        self.assertEqual(books[1][1], 'Test Book')
+        self.assertEqual(len(leases), 2)
+        self.assertEqual(leases[1][0], str(lease.id))
+        self.assertEqual(leases[1][1], str(student_user))
+
+
+class ReportViewTests(TestCase):
+    """
+    Tests checking report view functionality.
+    """
+
+    def setUp(self):
+        self.librarian_credentials = {
+            'username': 'librarian',
+            'password': 'testpass'
+        }
+        librarian_user = get_user_model().objects.create_user(
+            **self.librarian_credentials,
+            email='librarian@example.com')
+        group = Group.objects.get_or_create(name="Librarian")[0]
+        librarian_user.groups.add(group)
+
+        self.student_user = get_user_model().objects.create_user(
+            **student_credentials,
+            email='student@example.com')
+        Book.objects.create(
+            isbn='9780000000002', name='Test Book', authors='Author',
+            count=1)
+        self.lease = create_student_lease('9780000000002')
+        self.lease.refresh_from_db()
+
+        self.url = reverse('main:report')
+
+    def test_report_view_get_no_login(self):
+        """
+        If user is not authenticated, he is redirected to login page.
+        """
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_report_view_get_xlsx(self):
+        """
+        If format is not given, xlsx report is returned.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.url)
+        self.assertEqual(response['content-type'], 'application/vnd.ms-excel')
+
+    def test_report_view_get_csv_books(self):
+        """
+        If csv format is requested, books data set is streamed as CSV.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['content-type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename = "Books.csv"')
+        rows = list(csv.reader(StringIO(
+            b''.join(response.streaming_content).decode())))
+        self.assertEqual(
+            rows[0], ['isbn', 'name', 'authors', 'added_date', 'count'])
+        self.assertEqual(rows[1][:3], ['978-0-00-000000-2', 'Test Book',
+                                       'Author'])
+        self.assertEqual(rows[1][4], '1')
+        self.assertEqual(len(rows), 2)
+
+    def test_report_view_get_csv_leases(self):
+        """
+        If csv format and leases data set are requested, leases are
+        streamed as CSV.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(
+            self.url, {'format': 'csv', 'dataset': 'leases'})
+        rows = list(csv.reader(StringIO(
+            b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], str(self.lease.id))
+        self.assertEqual(rows[1][1], str(self.student_user))
+        self.assertEqual(rows[1][3], self.lease.issue_date.isoformat())
+        self.assertEqual(rows[1][5], '')
+
+    def test_report_view_get_ndjson_leases(self):
+        """
+        If ndjson format is requested, every row is streamed as separate
+        JSON object.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(
+            self.url, {'format': 'ndjson', 'dataset': 'leases'})
+        self.assertEqual(
+            response['content-type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), {
+            'id': str(self.lease.id),
+            'student': str(self.student_user),
+            'book_isbn': '978-0-00-000000-2',
+            'issue_date': self.lease.issue_date.isoformat(),
+            'expire_date': self.lease.expire_date.isoformat(),
+            'return_date': None,
+        })
+
+    def test_report_view_get_unknown_format(self):
+        """
+        If format is unknown, bad request is returned.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.url, {'format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_report_view_get_unknown_dataset(self):
+        """
+        If data set is unknown, bad request is returned.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(
+            self.url, {'format': 'csv', 'dataset': 'users'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(REPORT_WATERMARK_LAG=0)
+    def test_report_view_get_since(self):
+        """
+        If since timestamp is given, only rows changed since then are
+        returned.
+        """
+        Book.objects.create(
+            isbn='9780000000019', name='Old Book', authors='Author',
+            count=1)
+        Book.objects.filter(isbn='9780000000019').update(
+            updated_date=timezone.now() - timezone.timedelta(days=2))
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.url, {
+            'format': 'ndjson',
+            'since': (timezone.now() - timezone.timedelta(days=1)).isoformat()
+        })
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['name'], 'Test Book')
+
+    @override_settings(REPORT_WATERMARK_LAG=0)
+    def test_report_view_get_cursor(self):
+        """
+        If cursor of previous report is given, only rows changed after
+        previous report are returned.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(
+            self.url, {'format': 'ndjson', 'dataset': 'leases'})
+        cursor = response['X-Report-Cursor']
+        b''.join(response.streaming_content)
+
+        response = self.client.get(
+            self.url, {'format': 'ndjson', 'dataset': 'leases',
+                       'cursor': cursor})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+        self.lease.return_date = timezone.now()
+        self.lease.save()
+        response = self.client.get(
+            self.url, {'format': 'ndjson', 'dataset': 'leases',
+                       'cursor': cursor})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(
+            json.loads(lines[0])['return_date'],
+            self.lease.return_date.isoformat())
+
+    def test_report_view_get_cursor_lag(self):
+        """
+        Rows changed within watermark lag are not returned, but are
+        returned by next report from cursor.
+        """
+        Lease.objects.filter(pk=self.lease.pk).update(
+            updated_date=timezone.now() - timezone.timedelta(seconds=30))
+        self.client.login(**self.librarian_credentials)
+        with override_settings(REPORT_WATERMARK_LAG=60):
+            response = self.client.get(self.url, {
+                'format': 'ndjson', 'dataset': 'leases',
+                'since': (
+                    timezone.now() - timezone.timedelta(days=1)).isoformat()
+            })
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+        with override_settings(REPORT_WATERMARK_LAG=0):
+            response = self.client.get(
+                self.url, {'format': 'ndjson', 'dataset': 'leases',
+                           'cursor': response['X-Report-Cursor']})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['id'], str(self.lease.id))
+
+    def test_report_view_get_invalid_cursor(self):
+        """
+        If cursor is tampered with, bad request is returned.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(
+            self.url, {'format': 'csv', 'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AutocompleteViewTests(TestCase):
+    """
+    Tests checking autocomplete views functionality.
+    """
+
+    def setUp(self):
+        # Index follows committed changes only, so it is rebuilt from
+        # books of this test.
+        book_index.clear()
+        self.librarian_credentials = {
+            'username': 'librarian',
+            'password': 'testpass'
+        }
+        librarian_user = get_user_model().objects.create_user(
+            **self.librarian_credentials,
+            email='librarian@example.com',
+            last_name='Ocean')
+        group = Group.objects.get_or_create(name="Librarian")[0]
+        librarian_user.groups.add(group)
+
+        group = Group.objects.get_or_create(name="Student")[0]
+        for number in range(5):
+            student = get_user_model().objects.create_user(
+                username='student{}'.format(number), password='testpass',
+                email='student{}@example.com'.format(number),
+                first_name='Ivan', last_name='Oceanov')
+            student.groups.add(group)
+        self.student = student
+
+        Book.objects.create(
+            isbn='9780000000002', name='Ocean Stories',
+            authors='Ivan Petrov', count=2, leased_count=1)
+        Book.objects.create(
+            isbn='9780000000019', name='Dark Ocean',
+            authors='Anna Ocean', count=1)
+
+        self.books_url = reverse('main:autocomplete_books')
+        self.students_url = reverse('main:autocomplete_students')
+
+    def test_autocomplete_no_login(self):
+        """
+        If user is not authenticated, he is redirected to login page.
+        """
+        response = self.client.get(self.books_url, {'q': 'ocean'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_autocomplete_books_by_name_prefix(self):
+        """
+        Books with name starting with query are returned regardless of
+        case.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.books_url, {'q': 'OCE'})
+        self.assertEqual(response.json(), {'results': [{
+            'isbn': '9780000000002',
+            'name': 'Ocean Stories',
+            'authors': 'Ivan Petrov',
+            'available': 1,
+        }]})
+        self.assertIn('max-age=30', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_autocomplete_non_ascii_prefix(self):
+        """
+        Books and students with non-ASCII names are found regardless of
+        case.
+        """
+        Book.objects.create(
+            isbn='9780000000026', name='Пушкин стихи',
+            authors='Александр Пушкин', count=1)
+        student = get_user_model().objects.create_user(
+            username='pushkin', email='pushkin@example.com',
+            first_name='Александр', last_name='Пушкин')
+        student.groups.add(Group.objects.get(name='Student'))
+        self.client.login(**self.librarian_credentials)
+        for query in ('пуш', 'Пуш', 'ПУШКИН С'):
+            response = self.client.get(self.books_url, {'q': query})
+            self.assertEqual(
+                [book['isbn'] for book in response.json()['results']],
+                ['9780000000026'])
+        response = self.client.get(self.students_url, {'q': 'пушк'})
+        self.assertEqual(
+            [result['id'] for result in response.json()['results']],
+            [student.pk])
+
+    def test_autocomplete_books_by_isbn_prefix(self):
+        """
+        Books with ISBN starting with query are returned before books
+        with matching name.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.books_url, {'q': '978-000000001'})
+        self.assertEqual(
+            [book['isbn'] for book in response.json()['results']],
+            ['9780000000019'])
+
+    def test_autocomplete_students(self):
+        """
+        Only students are returned by id, username or last name, and no
+        more than limit of them.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.students_url, {'q': 'ocean'})
+        self.assertEqual(len(response.json()['results']), 5)
+        self.assertEqual(response.json()['results'][0]['name'], 'Ivan Oceanov')
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                self.students_url, {'q': 'Student', 'limit': 2})
+        self.assertEqual(
+            [student['username'] for student in response.json()['results']],
+            ['student0', 'student1'])
+
+        response = self.client.get(
+            self.students_url, {'q': str(self.student.pk), 'limit': 1})
+        self.assertEqual(
+            response.json()['results'][0]['id'], self.student.pk)
+
+    def test_autocomplete_students_invalid_id(self):
+        """
+        If query has non-ASCII digits or is out of range of ids, it is
+        searched as name.
+        """
+        self.client.login(**self.librarian_credentials)
+        for query in ('²', '99999999999999999999999'):
+            response = self.client.get(self.students_url, {'q': query})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], [])
+
+    def test_autocomplete_invalid_limit(self):
+        """
+        If limit is not a number or too big, bad request is returned.
+        """
+        self.client.login(**self.librarian_credentials)
+        for limit in ('many', '0', '1000'):
+            response = self.client.get(
+                self.students_url, {'q': 'student', 'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+    def test_autocomplete_empty_query(self):
+        """
+        If query is empty, no results are returned.
+        """
+        self.client.login(**self.librarian_credentials)
+        response = self.client.get(self.books_url, {'q': ' '})
+        self.assertEqual(response.json(), {'results': []})
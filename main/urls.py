@@ -141,6 +141,9 @@ urlpatterns = [
         name='lease_history'),
     path('librarian/', views.librarian, name='librarian'),
     path('librarian/books/', views.BookListView.as_view(), name='books'),
+    path(
+        'librarian/books/import/', views.BookImportView.as_view(),
+        name='import_books'),
     path(
         'librarian/new_book/',
         views.BookCreateView.as_view(),
@@ -156,11 +159,32 @@ urlpatterns = [
         views.LeaseCreateView.as_view(),
         name='new_lease'),
     path('librarian/leases/', views.LeaseListView.as_view(), name='leases'),
+    path(
+        'librarian/leases/new/', views.BulkLeaseCreateView.as_view(),
+        name='bulk_lease'),
+    path(
+        'librarian/leases/return/', views.bulk_return, name='bulk_return'),
+    path(
+        'librarian/autocomplete/books/', views.autocomplete_book,
+        name='autocomplete_books'),
+    path(
+        'librarian/autocomplete/students/', views.autocomplete_student,
+        name='autocomplete_students'),
     path(
         'librarian/leases/<slug:pk>/', views.LeaseDetailView.as_view(),
         name='lease_detail'),
     path(
         'librarian/leases/<slug:lease_id>/return/', views.return_lease,
         name='return_lease'),
-    path('librarian/xlsx_report/', views.xlsx_report, name='xlsx_report')
+    path('librarian/xlsx_report/', views.xlsx_report, name='xlsx_report'),
+    path('librarian/report/', views.report, name='report'),
+    path(
+        'librarian/reports/', views.request_report_job,
+        name='request_report'),
+    path(
+        'librarian/reports/<uuid:pk>/', views.ReportJobView.as_view(),
+        name='report_job'),
+    path(
+        'librarian/reports/<uuid:pk>/download/', views.download_report,
+        name='download_report'),
 ]
@@ -18,73 +18,293 @@
 This module contains utility functions in main app.
 """
 
+import csv
+import datetime
+import functools
+import json
+
 from openpyxl import Workbook
+from stdnum import isbn
 
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext as _
 
 from .models import Book, Lease
 
 
-def build_xlsx():
+# Number of rows fetched from database at once while building reports.
+REPORT_CHUNK_SIZE = 2000
+
+# Salt of signed cursors of incremental reports.
+REPORT_CURSOR_SALT = 'main.report.cursor'
+
+# Column names of books and leases data sets in CSV and NDJSON reports.
+BOOK_FIELDS = ('isbn', 'name', 'authors', 'added_date', 'count')
+LEASE_FIELDS = (
+    'id', 'student', 'book_isbn', 'issue_date', 'expire_date',
+    'return_date')
+
+# Greatest value of integer primary key of users.
+MAX_USER_ID = 2147483647
+
+
+def parse_user_id(value):
+    """
+    Returns user id written in ASCII digits or None if value is not a
+    valid id, so that other digits and out of range numbers do not reach
+    database.
+    """
+    value = value.strip()
+    if not (value.isascii() and value.isdecimal()):
+        return None
+    user_id = int(value)
+    return user_id if 0 < user_id <= MAX_USER_ID else None
+
+
+@functools.lru_cache(maxsize=65536)
+def format_isbn(value):
+    """
+    Returns ISBN in proper format with dashes. Results are memoized,
+    because the same ISBN is repeated across many leases.
+    """
+    return isbn.format(value)
+
+
+def excel_datetime(value):
+    """
+    Converts aware datetime to naive local time, because XLSX cells can
+    not store time zones.
+    """
+    if value is None:
+        return None
+    return timezone.localtime(value).replace(tzinfo=None)
+
+
+def make_report_cursor(until):
     """
-    Generates XLSX file.
+    Returns opaque signed cursor for report of changes made after until.
     """
-    workbook = Workbook()
+    return signing.dumps(until.isoformat(), salt=REPORT_CURSOR_SALT)
 
-    books_worksheet = workbook.active
-    books_worksheet.title = _("Books")
-    build_books_sheet(books_worksheet)
+
+def report_watermark():
+    """
+    Returns upper bound of update date of rows included in incremental
+    report. It lags REPORT_WATERMARK_LAG seconds behind current time,
+    because update date is set before transaction commits, so rows which
+    are still being saved are exported by next report instead of being
+    skipped.
+    """
+    return timezone.now() - datetime.timedelta(
+        seconds=getattr(settings, 'REPORT_WATERMARK_LAG', 60))
+
+
+def parse_report_since(since=None, cursor=None):
+    """
+    Returns watermark of incremental report given as ISO 8601 timestamp
+    or as cursor of previous report. Returns None for full report.
+    Raises ValueError if value is malformed.
+    """
+    if cursor:
+        try:
+            since = signing.loads(cursor, salt=REPORT_CURSOR_SALT)
+        except signing.BadSignature:
+            raise ValueError("Invalid report cursor") from None
+    if not since:
+        return None
+    value = parse_datetime(since)
+    if value is None:
+        raise ValueError("Invalid report watermark")
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def changed_between(queryset, ordering, since, until):
+    """
+    Returns queryset ordered by ordering field. If since is given, only
+    objects updated after since and not later than until are returned
+    ordered by update date, so indexed range scan is used.
+    """
+    if since is None:
+        return queryset.order_by(ordering)
+    return queryset.filter(
+        updated_date__gt=since,
+        updated_date__lte=until).order_by('updated_date')
+
+
+def build_xlsx(since=None, until=None):
+    """
+    Generates XLSX file. Workbook is write-only, so rows are streamed to
+    disk instead of being kept in memory.
+    """
+    workbook = Workbook(write_only=True)
+
+    books_worksheet = workbook.create_sheet(_("Books"))
+    build_books_sheet(books_worksheet, since, until)
 
     lease_worksheet = workbook.create_sheet(_("Leases"))
-    build_leases_sheet(lease_worksheet)
+    build_leases_sheet(lease_worksheet, since, until)
 
     return workbook
 
 
-def build_books_sheet(worksheet):
+def book_rows(since=None, until=None):
+    """
+    Yields rows of books data set ordered by added date. If since is
+    given, only books changed since then are yielded.
+    """
+    book_list = changed_between(
+        Book.objects, 'added_date', since, until).values_list(
+        'isbn', 'name', 'authors', 'added_date', 'count')
+    for book_isbn, name, authors, added_date, count in book_list.iterator(
+            chunk_size=REPORT_CHUNK_SIZE):
+        yield (format_isbn(book_isbn), name, authors, added_date, count)
+
+
+def lease_rows(since=None, until=None):
+    """
+    Yields rows of leases data set ordered by issue date. If since is
+    given, only leases issued, returned or changed since then are
+    yielded.
+    """
+    lease_list = changed_between(
+        Lease.objects, 'issue_date', since, until).values_list(
+        'id', 'student__first_name', 'student__last_name',
+        'student__username', 'book_id', 'issue_date', 'expire_date',
+        'return_date')
+    for lease in lease_list.iterator(chunk_size=REPORT_CHUNK_SIZE):
+        (lease_id, first_name, last_name, username, book_isbn, issue_date,
+         expire_date, return_date) = lease
+        yield (
+            str(lease_id),
+            # Same format as User.__str__().
+            "{} {} [{}]".format(first_name, last_name, username),
+            format_isbn(book_isbn),
+            issue_date,
+            expire_date,
+            return_date)
+
+
+# Data sets available in CSV and NDJSON reports.
+REPORT_DATASETS = {
+    'books': (BOOK_FIELDS, book_rows),
+    'leases': (LEASE_FIELDS, lease_rows),
+}
+
+
+def build_books_sheet(worksheet, since=None, until=None):
     """
     Generates books data sheet.
     """
-    worksheet.cell(row=1, column=1, value="ISBN")
-    worksheet.cell(row=1, column=2, value=_("Name"))
-    worksheet.cell(row=1, column=3, value=_("Authors"))
-    worksheet.cell(row=1, column=4, value=_("Added date"))
-    worksheet.cell(row=1, column=5, value=_("Count"))
-    book_list = Book.objects.order_by('added_date')
-    for row, book in enumerate(book_list, start=2):
-        worksheet.cell(row=row, column=1, value=book.formatted_isbn())
-        worksheet.cell(row=row, column=2, value=book.name)
-        worksheet.cell(row=row, column=3, value=book.authors)
-        worksheet.cell(row=row, column=4, value=book.added_date)
-        worksheet.cell(row=row, column=5, value=book.count)
     worksheet.column_dimensions['A'].width = 20
     worksheet.column_dimensions['B'].width = 40
     worksheet.column_dimensions['C'].width = 40
     worksheet.column_dimensions['D'].width = 20
     worksheet.column_dimensions['E'].width = 10
+    worksheet.append(["ISBN", _("Name"), _("Authors"), _("Added date"),
+                      _("Count")])
+    for book_isbn, name, authors, added_date, count in book_rows(
+            since, until):
+        worksheet.append([
+            book_isbn, name, authors, excel_datetime(added_date), count])
 
 
-def build_leases_sheet(worksheet):
+def build_leases_sheet(worksheet, since=None, until=None):
     """
     Generates leases data sheet.
     """
-    worksheet.cell(row=1, column=1, value=_("ID"))
-    worksheet.cell(row=1, column=2, value=_("Student"))
-    worksheet.cell(row=1, column=3, value=_("Book ISBN"))
-    worksheet.cell(row=1, column=4, value=_("Issue date"))
-    worksheet.cell(row=1, column=5, value=_("Expire date"))
-    worksheet.cell(row=1, column=6, value=_("Return date"))
-    lease_list = Lease.objects.order_by('issue_date')
-    for row, lease in enumerate(lease_list, start=2):
-        worksheet.cell(row=row, column=1, value=str(lease.id))
-        worksheet.cell(row=row, column=2, value=str(lease.student))
-        worksheet.cell(row=row, column=3, value=lease.book.formatted_isbn())
-        worksheet.cell(row=row, column=4, value=lease.issue_date)
-        worksheet.cell(row=row, column=5, value=lease.expire_date)
-        worksheet.cell(row=row, column=6, value=lease.return_date)
     worksheet.column_dimensions['A'].width = 40
     worksheet.column_dimensions['B'].width = 15
     worksheet.column_dimensions['C'].width = 20
     worksheet.column_dimensions['D'].width = 20
     worksheet.column_dimensions['E'].width = 15
     worksheet.column_dimensions['F'].width = 20
+    worksheet.append([_("ID"), _("Student"), _("Book ISBN"), _("Issue date"),
+                      _("Expire date"), _("Return date")])
+    for (lease_id, student, book_isbn, issue_date, expire_date,
+         return_date) in lease_rows(since, until):
+        worksheet.append([
+            lease_id,
+            student,
+            book_isbn,
+            excel_datetime(issue_date),
+            expire_date,
+            excel_datetime(return_date)])
+
+
+def export_value(value):
+    """
+    Converts dates to ISO 8601 strings for text reports.
+    """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def chunked(lines):
+    """
+    Joins lines into chunks of REPORT_CHUNK_SIZE lines, so streamed
+    response is not written line by line.
+    """
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= REPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+class EchoBuffer:
+    """
+    File-like object that returns written value instead of storing it.
+    Lets csv.writer produce lines one by one.
+    """
+
+    def write(self, value):
+        """
+        Returns value.
+        """
+        return value
+
+
+def stream_csv(dataset, since=None, until=None):
+    """
+    Yields CSV report of data set in chunks.
+    """
+    fields, rows = REPORT_DATASETS[dataset]
+    writer = csv.writer(EchoBuffer())
+
+    def lines():
+        yield writer.writerow(fields)
+        for row in rows(since, until):
+            yield writer.writerow([export_value(value) for value in row])
+
+    return chunked(lines())
+
+
+def stream_ndjson(dataset, since=None, until=None):
+    """
+    Yields NDJSON report of data set in chunks, one object per row.
+    """
+    fields, rows = REPORT_DATASETS[dataset]
+
+    def lines():
+        for row in rows(since, until):
+            yield json.dumps(
+                dict(zip(fields, map(export_value, row))),
+                ensure_ascii=False) + '\n'
+
+    return chunked(lines())
+
+
+# Streaming report formats with their content types and generators.
+STREAMING_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', stream_csv),
+    'ndjson': ('application/x-ndjson; charset=utf-8', stream_ndjson),
+}
@@ -18,32 +18,57 @@
 This module contains all views in main app.
 """
 
+import json
 import os
+import tempfile
 
 from django_registration.backends.activation.views import (
     RegistrationView, ActivationView)
 
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import (
+    FileResponse, Http404, HttpResponseBadRequest, JsonResponse,
+    StreamingHttpResponse)
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.contrib.admin.models import LogEntry, ADDITION, CHANGE
-from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import Group
 from django.contrib.auth import get_user_model, login
 from django.views import generic
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
 from django.utils import timezone
-from django.utils.translation import gettext_lazy
+from django.utils.translation import gettext as _, gettext_lazy, ngettext
 from django.urls import reverse_lazy
 from django.conf import settings
 from django.db.models import Q
 
+from .audit import audit, audit_many
 from .decorators import admin_required, group_required
-from .models import Book, Lease
+from .models import Book, Lease, ReportJob
+from .pagination import KeysetPaginationMixin
 from .forms import (
     BookUpdateForm, RegisterForm, LibrarianRegisterForm, EditProfileForm,
-    ThemeSelectionForm, BookCreationForm, LeaseCreationForm)
-from .utils import build_xlsx
+    ThemeSelectionForm, BookCreationForm, LeaseCreationForm,
+    BulkLeaseCreationForm, BulkReturnForm, BookImportForm)
+from .importing import ImportFileError, import_books, import_format
+from .reports import report_path, request_report
+from .search import (
+    AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT, RANK_ANNOTATION,
+    autocomplete_books, autocomplete_students, is_ranked, search_books,
+    search_leases)
+from .services import (
+    RETURNED, BookNotAvailableError, issue_lease, issue_leases, return_leases)
+from .utils import (
+    REPORT_DATASETS, STREAMING_FORMATS, build_xlsx, make_report_cursor,
+    parse_report_since, report_watermark)
+
+
+# Number of seconds browser may reuse autocomplete suggestions.
+AUTOCOMPLETE_MAX_AGE = 30
+
+# Number of rejected rows shown after import.
+IMPORT_REJECTED_SHOWN = 100
 
 
 @login_required
@@ -53,7 +78,7 @@ def index(request):
     """
     if request.user.is_staff:
         return redirect('main:admin')
-    if request.user.groups.filter(name='Librarian').exists():
+    if request.user.is_librarian:
         return redirect('main:librarian')
     return redirect('main:student')
 
@@ -100,13 +125,9 @@ class LibrarianRegisterView(RegistrationView):
         group = Group.objects.get_or_create(name="Librarian")[0]
         new_user.groups.add(group)
         new_user.save()
-        LogEntry.objects.log_action(
-            self.request.user.id,
-            ContentType.objects.get(app_label='main', model='user').id,
-            new_user.id,
-            repr(new_user),
-            action_flag=ADDITION,
-            change_message=gettext_lazy("New librarian added"))
+        audit(
+            self.request.user, new_user, ADDITION,
+            gettext_lazy("New librarian added"))
 
         self.send_activation_email(new_user)
 
@@ -169,28 +190,64 @@ def admin(request):
 
 
 @method_decorator(admin_required, name='dispatch')
-class LogListView(generic.ListView):
+class LogListView(KeysetPaginationMixin, generic.ListView):
     """
     Log list view.
     """
     model = LogEntry
     paginate_by = 15
     template_name = 'main/logentry_list.html'
+    keyset = ('-action_time', '-id')
 
     def get_queryset(self):
-        return self.model.objects.order_by('-action_time')
+        return self.model.objects.select_related('user')
 
 
 @method_decorator(admin_required, name='dispatch')
-class UserListView(generic.ListView):
+class UserListView(KeysetPaginationMixin, generic.ListView):
     """
-    User list view.
+    User list view. Roles are computed in database, so page costs
+    constant number of queries.
     """
     model = get_user_model()
     paginate_by = 10
+    orderings = {
+        'last_login': ('-last_login', 'pk'),
+        'username': ('username',),
+        'role': ('role_value', 'username'),
+        'active': ('-is_active', '-last_login', 'pk'),
+    }
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'role': self.request.GET.get('role', 'all'),
+            'active': self.request.GET.get('active', 'all'),
+            'sort': self.request.GET.get('sort', 'last_login'),
+            'roles': self.model.Role.choices
+        })
+        return context
 
     def get_queryset(self):
-        return self.model.objects.order_by('-last_login')
+        queryset = self.model.objects.with_role()
+
+        role = self.request.GET.get('role', 'all')
+
+        if role in self.model.Role.values:
+            queryset = queryset.filter(role_value=role)
+
+        active = self.request.GET.get('active', 'all')
+
+        if active == 'yes':
+            queryset = queryset.filter(is_active=True)
+        elif active == 'no':
+            queryset = queryset.filter(is_active=False)
+
+        return queryset
+
+    def get_keyset(self, queryset):
+        sort = self.request.GET.get('sort', 'last_login')
+        return self.orderings.get(sort, self.orderings['last_login'])
 
 
 @method_decorator(admin_required, name='dispatch')
@@ -222,13 +279,9 @@ def block_user(request, user_id):
     if request.method == 'POST':
         user.is_active = False
         user.save()
-        LogEntry.objects.log_action(
-            request.user.id,
-            ContentType.objects.get(app_label='main', model='user').id,
-            user.id,
-            repr(user),
-            action_flag=CHANGE,
-            change_message=gettext_lazy("User blocked"))
+        audit(
+            request.user, user, CHANGE,
+            gettext_lazy("User blocked"))
         return redirect('main:admin_profile', pk=user_id)
 
     return render(request, 'main/block_user.html', {
@@ -247,13 +300,9 @@ def unblock_user(request, user_id):
     if request.method == 'POST':
         user.is_active = True
         user.save()
-        LogEntry.objects.log_action(
-            request.user.id,
-            ContentType.objects.get(app_label='main', model='user').id,
-            user.id,
-            repr(user),
-            action_flag=CHANGE,
-            change_message=gettext_lazy("User unblocked"))
+        audit(
+            request.user, user, CHANGE,
+            gettext_lazy("User unblocked"))
         return redirect('main:admin_profile', pk=user_id)
 
     return render(request, 'main/unblock_user.html', {
@@ -287,8 +336,8 @@ def student(request):
     """
     Main page of student UI.
     """
-    active_lease_list = Lease.objects\
-        .filter(student__username__exact=request.user.username)\
+    active_lease_list = Lease.objects.select_related('book')\
+        .filter(student=request.user)\
         .filter(return_date__isnull=True).order_by('expire_date')
     context = {
         'active_lease_list': active_lease_list
@@ -297,13 +346,14 @@ def student(request):
 
 
 @method_decorator(group_required('Student'), name='dispatch')
-class LeaseHistoryView(generic.ListView):
+class LeaseHistoryView(KeysetPaginationMixin, generic.ListView):
     """
     Page that shows lease history.
     """
     model = Lease
     paginate_by = 10
     template_name = 'main/lease_list_student.html'
+    keyset = ('return_date', 'expire_date', 'issue_date', 'pk')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -316,9 +366,8 @@ class LeaseHistoryView(generic.ListView):
     def get_queryset(self):
         query = self.request.GET.get('q', '')
 
-        queryset = (
-            self.model.objects
-            .filter(student__username__exact=self.request.user.username))
+        queryset = self.model.objects.select_related('book').filter(
+            student=self.request.user)
 
         if query != '':
             queryset = queryset.filter(
@@ -332,8 +381,6 @@ class LeaseHistoryView(generic.ListView):
         elif active == 'no':
             queryset = queryset.filter(return_date__isnull=False)
 
-        queryset = queryset.order_by('return_date', 'expire_date')
-
         return queryset
 
 
@@ -342,8 +389,8 @@ def librarian(request):
     """
     Main page of librarian UI.
     """
-    nearest_lease_list = Lease.objects.filter(return_date__isnull=True)\
-        .order_by('expire_date')[:5]
+    nearest_lease_list = Lease.objects.select_related('book', 'student')\
+        .filter(return_date__isnull=True).order_by('expire_date')[:5]
     latest_book_list = \
         Book.objects.filter(count__gt=0).order_by('-added_date')[:5]
     context = {
@@ -364,23 +411,49 @@ class BookCreateView(generic.edit.CreateView):
 
     def form_valid(self, form):
         form.save()
-        LogEntry.objects.log_action(
-            self.request.user.id,
-            ContentType.objects.get(app_label='main', model='book').id,
-            form.instance.isbn,
-            repr(form.instance),
-            action_flag=ADDITION,
-            change_message=gettext_lazy("New book"))
+        audit(
+            self.request.user, form.instance, ADDITION,
+            gettext_lazy("New book"))
         return redirect('main:book_detail', pk=form.instance.isbn)
 
 
 @method_decorator(group_required('Librarian'), name='dispatch')
-class BookListView(generic.ListView):
+class BookImportView(generic.edit.FormView):
+    """
+    Page that allows librarian to import books from CSV or XLSX file and
+    shows import result with rejected rows.
+    """
+    template_name = 'main/import_books.html'
+    form_class = BookImportForm
+
+    def form_valid(self, form):
+        uploaded_file = form.cleaned_data['file']
+        rejected_rows = []
+
+        def on_reject(number, row, reason):
+            if len(rejected_rows) < IMPORT_REJECTED_SHOWN:
+                rejected_rows.append((number, reason, row))
+
+        try:
+            result = import_books(
+                uploaded_file.file, import_format(uploaded_file.name),
+                on_reject)
+        except ImportFileError as error:
+            form.add_error('file', str(error))
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(), result=result,
+            rejected_rows=rejected_rows))
+
+
+@method_decorator(group_required('Librarian'), name='dispatch')
+class BookListView(KeysetPaginationMixin, generic.ListView):
     """
     Page that lists all books.
     """
     model = Book
     paginate_by = 10
+    keyset = ('-added_date', '-pk')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -395,14 +468,15 @@ class BookListView(generic.ListView):
         queryset = self.model.objects.all()
 
         if query != '':
-            queryset = queryset.filter(
-                Q(name__icontains=query)
-                | Q(authors__icontains=query))
-
-        queryset = queryset.order_by('-added_date')
+            queryset = search_books(queryset, query)
 
         return queryset
 
+    def get_keyset(self, queryset):
+        if is_ranked(queryset):
+            return ('-' + RANK_ANNOTATION,) + self.keyset
+        return self.keyset
+
 
 @method_decorator(group_required('Librarian'), name='dispatch')
 class BookDetailView(generic.DetailView):
@@ -423,13 +497,9 @@ class BookEditView(generic.edit.UpdateView):
 
     def form_valid(self, form):
         form.save()
-        LogEntry.objects.log_action(
-            self.request.user.id,
-            ContentType.objects.get(app_label='main', model='book').id,
-            form.instance.isbn,
-            repr(form.instance),
-            action_flag=CHANGE,
-            change_message=gettext_lazy("Book edited"))
+        audit(
+            self.request.user, form.instance, CHANGE,
+            gettext_lazy("Book edited"))
         return redirect('main:book_detail', pk=form.instance.isbn)
 
 
@@ -456,24 +526,63 @@ class LeaseCreateView(generic.edit.CreateView):
         return initial
 
     def form_valid(self, form):
-        form.save()
-        LogEntry.objects.log_action(
-            self.request.user.id,
-            ContentType.objects.get(app_label='main', model='lease').id,
-            form.instance.id,
-            repr(form.instance),
-            action_flag=ADDITION,
-            change_message=gettext_lazy("New lease"))
-        return redirect('main:lease_detail', pk=form.instance.id)
+        try:
+            lease = issue_lease(
+                form.cleaned_data['student'],
+                form.cleaned_data['book'],
+                form.cleaned_data['expire_date'])
+        except BookNotAvailableError:
+            form.add_error('book', _('Book is not available for leasing'))
+            return self.form_invalid(form)
+        audit(
+            self.request.user, lease, ADDITION,
+            gettext_lazy("New lease"))
+        return redirect('main:lease_detail', pk=lease.id)
+
+
+@method_decorator(group_required('Librarian'), name='dispatch')
+class BulkLeaseCreateView(generic.edit.FormView):
+    """
+    Page that allows to lease a book to a class of students or many books
+    to one student at once.
+    """
+    template_name = 'main/bulk_lease.html'
+    form_class = BulkLeaseCreationForm
+
+    def get_initial(self, **kwargs):
+        initial = super().get_initial(**kwargs)
+        initial.update({
+            'books': self.request.GET.get('book', '')
+            })
+        return initial
+
+    def form_valid(self, form):
+        students = form.cleaned_data['students']
+        books = form.cleaned_data['books']
+        try:
+            leases = issue_leases(
+                students, books, form.cleaned_data['expire_date'])
+        except BookNotAvailableError as error:
+            form.add_error('books', _(
+                'Not enough copies available: {}').format(
+                    ', '.join(error.args)))
+            return self.form_invalid(form)
+        audit(
+            self.request.user, books[0] if len(books) == 1 else students[0],
+            ADDITION, ngettext(
+                '{} new lease', '{} new leases', len(leases)).format(
+                    len(leases)))
+        return redirect('main:leases')
 
 
 @method_decorator(group_required('Librarian'), name='dispatch')
-class LeaseListView(generic.ListView):
+class LeaseListView(KeysetPaginationMixin, generic.ListView):
     """
     Page that shows list of active leases.
     """
     model = Lease
     paginate_by = 10
+    keyset = ('return_date', 'expire_date', 'issue_date', 'pk')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -486,15 +595,10 @@ class LeaseListView(generic.ListView):
     def get_queryset(self):
         query = self.request.GET.get('q', '')
 
-        queryset = self.model.objects.all()
+        queryset = self.model.objects.select_related('book', 'student')
 
         if query != '':
-            queryset = queryset.filter(
-                Q(student__username__icontains=query)
-                | Q(student__first_name__icontains=query)
-                | Q(student__last_name__icontains=query)
-                | Q(book__name__icontains=query)
-                | Q(book__authors__icontains=query))
+            queryset = search_leases(queryset, query)
 
         active = self.request.GET.get('active', 'all')
 
@@ -503,17 +607,20 @@ class LeaseListView(generic.ListView):
         elif active == 'no':
             queryset = queryset.filter(return_date__isnull=False)
 
-        queryset = queryset.order_by('return_date', 'expire_date')
-
         return queryset
 
+    def get_keyset(self, queryset):
+        if is_ranked(queryset):
+            return ('-' + RANK_ANNOTATION,) + self.keyset
+        return self.keyset
+
 
 @method_decorator(group_required('Librarian'), name='dispatch')
 class LeaseDetailView(generic.DetailView):
     """
     Page that shows lease details.
     """
-    model = Lease
+    queryset = Lease.objects.select_related('book', 'student')
 
 
 @group_required('Librarian')
@@ -527,13 +634,9 @@ def return_lease(request, lease_id):
     if request.method == 'POST':
         lease.return_date = timezone.now()
         lease.save()
-        LogEntry.objects.log_action(
-            request.user.id,
-            ContentType.objects.get(app_label='main', model='lease').id,
-            lease_id,
-            repr(lease),
-            action_flag=CHANGE,
-            change_message=gettext_lazy("Lease returned"))
+        audit(
+            request.user, lease, CHANGE,
+            gettext_lazy("Lease returned"))
         return redirect('main:librarian')
 
     return render(request, 'main/return_lease.html', {
@@ -542,15 +645,196 @@ def return_lease(request, lease_id):
 
 
 @group_required('Librarian')
-def xlsx_report(request):
+def bulk_return(request):
     """
-    Returnes XLSX report file for download.
+    Page that allows to return many leases by scanned lease IDs or ISBNs
+    and shows result of every code. JSON request with "codes" list and
+    optional "student" id gets results as JSON.
     """
-    response = HttpResponse(content_type='application/vnd.ms-excel')
+    is_json = (
+        request.method == 'POST'
+        and request.content_type == 'application/json')
+    results = None
+    if request.method == 'POST':
+        if is_json:
+            try:
+                data = json.loads(request.body)
+                form = BulkReturnForm({
+                    'codes': '\n'.join(data['codes']),
+                    'student': data.get('student')})
+            except (ValueError, KeyError, TypeError):
+                return HttpResponseBadRequest(_("Invalid request"))
+        else:
+            form = BulkReturnForm(request.POST)
+        if form.is_valid():
+            results = return_leases(
+                form.cleaned_data['codes'], form.cleaned_data['student'])
+            audit_many(
+                request.user,
+                [result.lease for result in results
+                 if result.status == RETURNED],
+                CHANGE, gettext_lazy("Lease returned"))
+            form = BulkReturnForm(
+                initial={'student': form.cleaned_data['student']})
+        elif is_json:
+            return JsonResponse({'errors': form.errors}, status=400)
+    else:
+        form = BulkReturnForm()
+
+    if is_json:
+        return JsonResponse({'results': [{
+            'code': result.code,
+            'status': result.status,
+            'lease': result.lease and result.lease.pk,
+        } for result in results]})
+    return render(request, 'main/bulk_return.html', {
+        'form': form,
+        'results': results,
+    })
+
+
+def xlsx_response(since=None, until=None):
+    """
+    Returnes response with XLSX report file.
+    """
+    report_file = tempfile.TemporaryFile()
+    build_xlsx(since, until).save(report_file)
+    size = report_file.tell()
+    report_file.seek(0)
+
+    response = FileResponse(
+        report_file, content_type='application/vnd.ms-excel')
+    response['Content-Length'] = size
     response['Content-Disposition'] = (
         'attachment; filename = "Report.xlsx"')
 
-    workbook = build_xlsx()
-    workbook.save(response)
+    return response
+
+
+@group_required('Librarian')
+def xlsx_report(request):
+    """
+    Returnes XLSX report file for download.
+    """
+    return xlsx_response()
+
+
+@group_required('Librarian')
+def report(request):
+    """
+    Returnes report file in requested format for download. XLSX report
+    contains all data sets, CSV and NDJSON reports contain one data set
+    and are streamed while rows are read from database. If since
+    timestamp or cursor is given, only rows changed since then and
+    before report watermark are returned. Cursor for the next
+    incremental report is returned in X-Report-Cursor header. Deleted
+    rows are never exported, so full report is needed to notice them.
+    """
+    report_format = request.GET.get('format', 'xlsx')
+    dataset = request.GET.get('dataset', 'books')
+    if report_format != 'xlsx' and report_format not in STREAMING_FORMATS:
+        return HttpResponseBadRequest(_("Unknown report format"))
+    if dataset not in REPORT_DATASETS:
+        return HttpResponseBadRequest(_("Unknown report data set"))
+    try:
+        since = parse_report_since(
+            request.GET.get('since'), request.GET.get('cursor'))
+    except ValueError:
+        return HttpResponseBadRequest(_("Invalid report watermark"))
+    until = report_watermark()
+
+    if report_format == 'xlsx':
+        response = xlsx_response(since, until)
+    else:
+        content_type, stream = STREAMING_FORMATS[report_format]
+        response = StreamingHttpResponse(
+            stream(dataset, since, until), content_type=content_type)
+        response['Content-Disposition'] = (
+            'attachment; filename = "{}.{}"'.format(
+                dataset.capitalize(), report_format))
+    response['X-Report-Cursor'] = make_report_cursor(until)
 
     return response
+
+
+def autocomplete_limit(request):
+    """
+    Returns number of suggestions requested by limit parameter. Raises
+    ValueError if it is invalid.
+    """
+    limit = int(request.GET.get('limit', AUTOCOMPLETE_LIMIT))
+    if not 0 < limit <= AUTOCOMPLETE_MAX_LIMIT:
+        raise ValueError(limit)
+    return limit
+
+
+@group_required('Librarian')
+@cache_control(private=True, max_age=AUTOCOMPLETE_MAX_AGE)
+def autocomplete_book(request):
+    """
+    Returnes JSON list of books with ISBN or name starting with query.
+    """
+    try:
+        limit = autocomplete_limit(request)
+    except ValueError:
+        return HttpResponseBadRequest(_("Invalid limit"))
+    books = autocomplete_books(request.GET.get('q', ''), limit)
+    return JsonResponse({'results': [{
+        'isbn': book.isbn,
+        'name': book.name,
+        'authors': book.authors,
+        'available': book.available_count(),
+    } for book in books]})
+
+
+@group_required('Librarian')
+@cache_control(private=True, max_age=AUTOCOMPLETE_MAX_AGE)
+def autocomplete_student(request):
+    """
+    Returnes JSON list of students with id equal to query or username or
+    last name starting with query.
+    """
+    try:
+        limit = autocomplete_limit(request)
+    except ValueError:
+        return HttpResponseBadRequest(_("Invalid limit"))
+    students = autocomplete_students(request.GET.get('q', ''), limit)
+    return JsonResponse({'results': [{
+        'id': student.pk,
+        'username': student.username,
+        'name': student.get_full_name(),
+    } for student in students]})
+
+
+@group_required('Librarian')
+@require_POST
+def request_report_job(request):
+    """
+    Queues report generation and redirects to job status page.
+    """
+    job = request_report(request.user)
+    return redirect('main:report_job', pk=job.id)
+
+
+@method_decorator(group_required('Librarian'), name='dispatch')
+class ReportJobView(generic.DetailView):
+    """
+    Page that shows report generation status and download link.
+    """
+    model = ReportJob
+    template_name = 'main/report_job.html'
+
+
+@group_required('Librarian')
+def download_report(request, pk):
+    """
+    Returnes generated report file for download.
+    """
+    job = get_object_or_404(ReportJob, pk=pk, status=ReportJob.Status.DONE)
+    try:
+        report_file = open(report_path(job), 'rb')
+    except FileNotFoundError:
+        raise Http404 from None
+    return FileResponse(
+        report_file, as_attachment=True,
+        filename='Report.{}'.format(job.report_format))